@@ -0,0 +1,194 @@
+"""
+Local Activity Store for Parsed FIT Files
+
+Keeps parsed FIT activities on local disk, one directory per activity:
+
+    <root>/<activity_id>/summary.json   Strava-format summary (laps, splits, zones, ...)
+    <root>/<activity_id>/track.npz      Columnar GPS/sensor track (compressed NumPy arrays)
+
+Activity ids for imported files are derived from the file contents
+(fit_<sha256 prefix>), so importing the same file twice overwrites one entry
+instead of creating a duplicate.
+
+USAGE:
+======
+    store = LocalActivityStore('activity_store/alice')
+    activity_id = store.save(strava_format, content_hash=sha256_hex)
+
+    store.list_activities()          # [summary, ...] (newest first)
+    store.load_summary(activity_id)  # dict
+    store.load_track(activity_id)    # fit_track.Track
+
+In-memory store for the activity currently being analyzed (uploads):
+    recent = TTLActivityStore(ttl_seconds=6 * 3600, max_entries=100)
+    recent.put(activity['id'], activity)   # full strava_format, gps_track included
+    recent.get(activity_id)                # None once expired or evicted
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from fit_track import Track
+
+SUMMARY_FILENAME = 'summary.json'
+TRACK_FILENAME = 'track.npz'
+
+
+def activity_id_for_hash(content_hash):
+    """Stable activity id for a file's SHA-256 hex digest"""
+    return f"fit_{content_hash[:16]}"
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return [None if item != item else item for item in value.tolist()]
+    return str(value)
+
+
+class LocalActivityStore:
+    """Directory-per-activity store for parsed FIT summaries and tracks"""
+
+    def __init__(self, root):
+        """
+        Args:
+            root (str): Store directory (created if missing)
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _activity_dir(self, activity_id):
+        # Ids come from file hashes or fit_parser ("fit_<timestamp>"); never allow path traversal
+        safe_id = os.path.basename(str(activity_id))
+        if not safe_id or safe_id in ('.', '..'):
+            raise ValueError(f"Invalid activity id: {activity_id!r}")
+        return os.path.join(self.root, safe_id)
+
+    def save(self, strava_format, content_hash=None, source_name=None):
+        """Write an activity summary and its track
+
+        Args:
+            strava_format (dict): fit_parser strava_format (gps_track is stored separately)
+            content_hash (str, optional): SHA-256 of the FIT file, used for the activity id
+            source_name (str, optional): Original file name, kept in the summary
+
+        Returns:
+            str: Activity id
+        """
+        summary = {key: value for key, value in strava_format.items() if key != 'gps_track'}
+        if content_hash:
+            summary['id'] = activity_id_for_hash(content_hash)
+            summary['content_hash'] = content_hash
+        if source_name:
+            summary['source_file'] = source_name
+
+        track = strava_format.get('gps_track')
+        summary['track_points'] = len(track) if track is not None else 0
+
+        activity_dir = self._activity_dir(summary['id'])
+        os.makedirs(activity_dir, exist_ok=True)
+
+        # Write to temp names and rename so readers never see half-written files
+        summary_path = os.path.join(activity_dir, SUMMARY_FILENAME)
+        with open(summary_path + '.tmp', 'w') as f:
+            json.dump(summary, f, default=_json_default)
+        os.replace(summary_path + '.tmp', summary_path)
+
+        if isinstance(track, Track) and track:
+            track_path = os.path.join(activity_dir, TRACK_FILENAME)
+            with open(track_path + '.tmp', 'wb') as f:
+                np.savez_compressed(f, **track.columns)
+            os.replace(track_path + '.tmp', track_path)
+
+        return summary['id']
+
+    def exists(self, activity_id):
+        return os.path.exists(os.path.join(self._activity_dir(activity_id), SUMMARY_FILENAME))
+
+    def load_summary(self, activity_id):
+        """Return the stored summary dict, or None if the activity is unknown"""
+        path = os.path.join(self._activity_dir(activity_id), SUMMARY_FILENAME)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def load_track(self, activity_id):
+        """Return the stored Track (empty Track if the activity has none)"""
+        path = os.path.join(self._activity_dir(activity_id), TRACK_FILENAME)
+        if not os.path.exists(path):
+            return Track()
+        with np.load(path) as columns:
+            return Track(**{name: columns[name] for name in columns.files})
+
+    def list_activities(self):
+        """Return all stored summaries, newest start date first"""
+        summaries = []
+        for entry in os.listdir(self.root):
+            summary = self.load_summary(entry) if os.path.isdir(os.path.join(self.root, entry)) else None
+            if summary:
+                summaries.append(summary)
+        summaries.sort(key=lambda summary: summary.get('start_date') or '', reverse=True)
+        return summaries
+
+
+class TTLActivityStore:
+    """Thread-safe in-memory activity store with a sliding TTL and an entry limit
+
+    Holds full parsed activities (including the columnar track) server side so
+    only the activity id has to travel in the session cookie.
+    """
+
+    def __init__(self, ttl_seconds=6 * 3600, max_entries=100):
+        """
+        Args:
+            ttl_seconds (float): Seconds an entry is kept after its last access
+            max_entries (int): Max activities kept; the least recently used is evicted first
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # activity_id -> (expires_at, activity)
+        self._lock = threading.Lock()
+
+    def _purge_expired(self, now):
+        expired = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+
+    def put(self, activity_id, activity):
+        now = time.monotonic()
+        with self._lock:
+            self._purge_expired(now)
+            self._entries[activity_id] = (now + self.ttl_seconds, activity)
+            self._entries.move_to_end(activity_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, activity_id):
+        """Return the activity (refreshing its TTL), or None if unknown or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(activity_id)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[activity_id]
+                return None
+            self._entries[activity_id] = (now + self.ttl_seconds, entry[1])
+            self._entries.move_to_end(activity_id)
+            return entry[1]
+
+    def pop(self, activity_id):
+        with self._lock:
+            entry = self._entries.pop(activity_id, None)
+        return entry[1] if entry else None
+
+    def __len__(self):
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            return len(self._entries)
@@ -11,10 +11,26 @@ import markdown2
 import json
 import time
 import threading
+import hashlib
+import re
+import shutil
+import tempfile
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from werkzeug.utils import secure_filename
-from fit_parser import parse_fit_file, validate_fit_file
+from fit_parser import (spool_fit_stream, downsample_track, apply_athlete_zones, zones_from_bounds,
+                        STRAVA_MESSAGE_TYPES)
+from fit_cache import FitResultCache, hash_fit_source
+from fit_track import has_structured_laps
+from fit_pool import FitParsePool, bulk_import
+from activity_store import LocalActivityStore, TTLActivityStore
+from llm_router import LLMRouter
+from llm_throttle import AdmissionController, ThrottleTimeout
+from prompts import get_system_prompt, build_user_prompt
+from workout_metrics import build_fact_sheet
 
 load_dotenv()
 
@@ -72,6 +88,36 @@ NUM_ANALYSIS_OPENAI = int(os.getenv('NUM_ANALYSIS_OPENAI', '0'))  # 0 = unlimite
 NUM_ANALYSIS_GROQ = int(os.getenv('NUM_ANALYSIS_GROQ', '0'))  # 0 = unlimited
 NUM_ANALYSIS_GEMINI = int(os.getenv('NUM_ANALYSIS_GEMINI', '0'))  # 0 = unlimited
 DEBUG_SKIP_LLM = os.getenv('DEBUG_SKIP_LLM', 'false').lower() == 'true'
+# LLM_FACT_SHEET: Send locally computed metrics (US units, pacing CV, HR drift, decoupling)
+# instead of the raw activity JSON
+LLM_FACT_SHEET = os.getenv('LLM_FACT_SHEET', 'true').lower() == 'true'
+# FAKE_LLM_URL: Send every provider's calls to a local fake_llm_server.py (offline load testing)
+FAKE_LLM_URL = os.getenv('FAKE_LLM_URL', '').rstrip('/')
+
+# Map-reduce list analysis configuration
+# Activity lists whose prompt exceeds LIST_ANALYSIS_CHUNK_TOKENS are split into chunks,
+# analyzed in parallel, then combined in a final synthesis pass
+LIST_ANALYSIS_CHUNK_TOKENS = int(os.getenv('LIST_ANALYSIS_CHUNK_TOKENS', '6000'))
+LIST_ANALYSIS_MAX_WORKERS = int(os.getenv('LIST_ANALYSIS_MAX_WORKERS', '4'))
+LIST_ANALYSIS_CACHE_SIZE = int(os.getenv('LIST_ANALYSIS_CACHE_SIZE', '256'))  # 0 = no caching
+
+# Provider routing configuration (failover + hedged requests)
+LLM_FAILOVER_ENABLED = os.getenv('LLM_FAILOVER_ENABLED', 'true').lower() == 'true'
+LLM_HEDGING_ENABLED = os.getenv('LLM_HEDGING_ENABLED', 'true').lower() == 'true'
+LLM_HEDGE_DELAY_SECONDS = float(os.getenv('LLM_HEDGE_DELAY_SECONDS', '8'))
+LLM_STATS_WINDOW = int(os.getenv('LLM_STATS_WINDOW', '50'))
+
+# Per-provider admission control (0 = unlimited). Excess calls queue up to LLM_QUEUE_TIMEOUT_SECONDS.
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv('LLM_QUEUE_TIMEOUT_SECONDS', '30'))
+LLM_MAX_CONCURRENT_GROQ = int(os.getenv('LLM_MAX_CONCURRENT_GROQ', '4'))
+LLM_RPM_GROQ = int(os.getenv('LLM_RPM_GROQ', '30'))
+LLM_TPM_GROQ = int(os.getenv('LLM_TPM_GROQ', '12000'))
+LLM_MAX_CONCURRENT_OPENAI = int(os.getenv('LLM_MAX_CONCURRENT_OPENAI', '8'))
+LLM_RPM_OPENAI = int(os.getenv('LLM_RPM_OPENAI', '0'))
+LLM_TPM_OPENAI = int(os.getenv('LLM_TPM_OPENAI', '0'))
+LLM_MAX_CONCURRENT_GEMINI = int(os.getenv('LLM_MAX_CONCURRENT_GEMINI', '4'))
+LLM_RPM_GEMINI = int(os.getenv('LLM_RPM_GEMINI', '15'))
+LLM_TPM_GEMINI = int(os.getenv('LLM_TPM_GEMINI', '1000000'))
 TOKEN_FILE = 'token_store.json'
 GOOGLE_SHEETS_CREDENTIALS_FILE = 'njmaniacs-485422-8e16104bb447.json'
 GOOGLE_SHEET_ID = '1POa75jrHHYwyfBAC0aObgc01HEFPnjl7ongLAJhqfa0'
@@ -83,14 +129,68 @@ AI_ANALYSIS_SHEET_NAME = 'AI Analysis'
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'fit'}
 MAX_UPLOAD_SIZE = 50 * 1024 * 1024  # 50 MB
+# Uploads are parsed straight from the request stream; non-seekable streams are buffered
+# in memory up to this size and spooled to an anonymous temp file above it
+FIT_SPOOL_THRESHOLD_BYTES = int(os.getenv('FIT_SPOOL_THRESHOLD_BYTES', str(8 * 1024 * 1024)))
+# FIT parsing process pool (keeps CPU-bound decoding of large files off the request thread)
+FIT_PARSE_WORKERS = int(os.getenv('FIT_PARSE_WORKERS', '2'))  # 0 = parse inline
+FIT_PARSE_TIMEOUT_SECONDS = float(os.getenv('FIT_PARSE_TIMEOUT_SECONDS', '60'))
+FIT_PARSE_MEMORY_LIMIT_MB = int(os.getenv('FIT_PARSE_MEMORY_LIMIT_MB', '1024'))  # 0 = no limit
+FIT_PARSE_INLINE_MAX_BYTES = int(os.getenv('FIT_PARSE_INLINE_MAX_BYTES', str(256 * 1024)))
+# Decode record messages with the NumPy bulk decoder (fit_decoder.py); fitparse handles the rest
+FIT_FAST_DECODER = os.getenv('FIT_FAST_DECODER', 'true').lower() == 'true'
+# Files at least this large are parsed in bounded-memory mode (fit_stream.py; 0 = never)
+FIT_BOUNDED_MIN_BYTES = int(os.getenv('FIT_BOUNDED_MIN_BYTES', str(8 * 1024 * 1024)))
+# Athlete zones for time-in-zone when a FIT file has no hr_zone / power_zone messages:
+# ascending zone boundaries, e.g. 130,145,160,175 = five zones (empty = file zones only)
+ATHLETE_HR_ZONES = zones_from_bounds([float(v) for v in os.getenv('ATHLETE_HR_ZONES', '').split(',') if v.strip()])
+ATHLETE_POWER_ZONES = zones_from_bounds([float(v) for v in os.getenv('ATHLETE_POWER_ZONES', '').split(',') if v.strip()])
+# Parsed FIT results cached by file SHA-256 so re-uploads skip the parse (0 = no caching)
+FIT_CACHE_DIR = os.getenv('FIT_CACHE_DIR', 'fit_cache')
+FIT_CACHE_MAX_MB = int(os.getenv('FIT_CACHE_MAX_MB', '256'))
+# Uploaded FIT activities awaiting analysis are held server side for this long after last use
+FIT_ACTIVITY_TTL_SECONDS = int(os.getenv('FIT_ACTIVITY_TTL_SECONDS', str(6 * 3600)))
+FIT_ACTIVITY_STORE_MAX = int(os.getenv('FIT_ACTIVITY_STORE_MAX', '100'))
+# Parsed activities from bulk (zip) imports: one subdirectory per athlete
+ACTIVITY_STORE_DIR = os.getenv('ACTIVITY_STORE_DIR', 'activity_store')
+MAX_BULK_UPLOAD_SIZE = int(os.getenv('MAX_BULK_UPLOAD_SIZE', str(500 * 1024 * 1024)))  # 500 MB
+# Bulk imports run as background jobs on their own pool (default one worker per core)
+FIT_BULK_IMPORT_WORKERS = int(os.getenv('FIT_BULK_IMPORT_WORKERS', str(os.cpu_count() or 1)))
+BULK_IMPORT_JOBS_MAX = 50  # Finished bulk import jobs kept for status polling
 
 # Create upload folder if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # Configure Flask app for file uploads
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Single-upload limit for every route; bulk_import_fit_files raises it for its own request
 app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_SIZE
 
+# Worker processes are started on the first large upload, not at import time
+fit_parse_pool = FitParsePool(
+    max_workers=FIT_PARSE_WORKERS,
+    timeout=FIT_PARSE_TIMEOUT_SECONDS,
+    memory_limit_mb=FIT_PARSE_MEMORY_LIMIT_MB,
+    inline_threshold_bytes=FIT_PARSE_INLINE_MAX_BYTES,
+    message_types=STRAVA_MESSAGE_TYPES,  # uploads only use the Strava-format summary and track
+    fast=FIT_FAST_DECODER,
+    bounded_min_bytes=FIT_BOUNDED_MIN_BYTES
+)
+# Bulk imports get their own pool so a large archive never queues interactive uploads
+fit_bulk_pool = FitParsePool(
+    max_workers=FIT_BULK_IMPORT_WORKERS,
+    timeout=FIT_PARSE_TIMEOUT_SECONDS,
+    memory_limit_mb=FIT_PARSE_MEMORY_LIMIT_MB,
+    inline_threshold_bytes=0,
+    message_types=STRAVA_MESSAGE_TYPES,
+    fast=FIT_FAST_DECODER,
+    bounded_min_bytes=FIT_BOUNDED_MIN_BYTES
+)
+bulk_import_jobs = OrderedDict()  # job_id -> status dict, oldest first
+bulk_import_jobs_lock = threading.Lock()
+fit_activity_store = TTLActivityStore(ttl_seconds=FIT_ACTIVITY_TTL_SECONDS, max_entries=FIT_ACTIVITY_STORE_MAX)
+fit_result_cache = FitResultCache(FIT_CACHE_DIR, max_bytes=FIT_CACHE_MAX_MB * 1024 * 1024)
+
 # Token management functions
 def save_tokens(access_token, refresh_token, expires_at):
     """Save tokens to persistent storage"""
@@ -342,6 +442,148 @@ def get_model_provider(model_name):
     else:
         return 'groq'
 
+# Admission control in front of each provider (semaphore + RPM/TPM token buckets)
+llm_admission = AdmissionController(max_wait=LLM_QUEUE_TIMEOUT_SECONDS)
+llm_admission.configure('groq', LLM_MAX_CONCURRENT_GROQ, LLM_RPM_GROQ, LLM_TPM_GROQ)
+llm_admission.configure('openai', LLM_MAX_CONCURRENT_OPENAI, LLM_RPM_OPENAI, LLM_TPM_OPENAI)
+llm_admission.configure('gemini', LLM_MAX_CONCURRENT_GEMINI, LLM_RPM_GEMINI, LLM_TPM_GEMINI)
+
+def call_llm(provider, model, system_prompt, prompt):
+    """Send a system + user prompt to the given provider and return the response text
+
+    The call waits for an admission slot for the provider first and raises
+    ThrottleTimeout if none frees up within LLM_QUEUE_TIMEOUT_SECONDS.
+
+    Args:
+        provider (str): 'openai', 'groq', or 'gemini'
+        model (str): Model identifier
+        system_prompt (str): System instructions
+        prompt (str): User message
+
+    Returns:
+        str: Stripped response text
+    """
+    estimated_tokens = estimate_tokens(system_prompt) + estimate_tokens(prompt)
+    with llm_admission.admit(provider, estimated_tokens) as ticket:
+        if ticket.wait_seconds > 1:
+            print(f"[LLM Throttle] {provider} request queued for {ticket.wait_seconds:.1f}s")
+        text, ticket.actual_tokens = _call_llm_provider(provider, model, system_prompt, prompt)
+        return text
+
+def _call_llm_provider(provider, model, system_prompt, prompt):
+    """Make the provider API call
+
+    Returns:
+        tuple: (response_text, total_tokens or None if the provider did not report usage)
+    """
+    if FAKE_LLM_URL:
+        # Offline load testing: every provider speaks the OpenAI shape to the fake server
+        llm_client = openai.OpenAI(api_key='fake', base_url=f"{FAKE_LLM_URL}/v1", max_retries=0)
+    elif provider == 'gemini':
+        # Gemini API format - combine system and user prompts (system first keeps the cacheable prefix)
+        llm_client = genai.GenerativeModel(model)
+        response = llm_client.generate_content(f"{system_prompt}\n\n{prompt}")
+        total_tokens = record_token_usage(provider, model, response)
+        return response.text.strip(), total_tokens
+    # OpenAI/Groq API format
+    elif provider == 'openai':
+        llm_client = openai.OpenAI(api_key=OPENAI_API_KEY)
+    else:
+        llm_client = Groq(api_key=GROQ_API_KEY)
+    response = llm_client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+    )
+    total_tokens = record_token_usage(provider, model, response)
+    return response.choices[0].message.content.strip(), total_tokens
+
+def record_token_usage(provider, model, response):
+    """Record provider-reported prompt, cached and completion token counts
+
+    OpenAI and Groq report cached prompt tokens in usage.prompt_tokens_details.cached_tokens,
+    Gemini in usage_metadata.cached_content_token_count.
+
+    Returns:
+        int: prompt + completion tokens, or None if usage was not reported
+    """
+    try:
+        if hasattr(response, 'usage_metadata'):
+            # Gemini response
+            usage = response.usage_metadata
+            if usage is None:
+                return None
+            prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+            cached_tokens = getattr(usage, 'cached_content_token_count', 0) or 0
+            completion_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+        else:
+            usage = getattr(response, 'usage', None)
+            if usage is None:
+                return None
+            prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+            completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+            details = getattr(usage, 'prompt_tokens_details', None)
+            cached_tokens = (getattr(details, 'cached_tokens', 0) or 0) if details else 0
+
+        llm_router.record_usage(provider, model, prompt_tokens, cached_tokens, completion_tokens)
+        print(f"[LLM Usage] {provider}/{model}: prompt={prompt_tokens}, cached={cached_tokens}, completion={completion_tokens}")
+        return prompt_tokens + completion_tokens
+    except Exception as e:
+        print(f"Error recording token usage: {e}")
+        return None
+
+# Routes analysis calls across providers with rolling latency/error stats
+llm_router = LLMRouter(
+    hedge_delay=LLM_HEDGE_DELAY_SECONDS,
+    hedging_enabled=LLM_HEDGING_ENABLED,
+    failover_enabled=LLM_FAILOVER_ENABLED,
+    window_size=LLM_STATS_WINDOW
+)
+
+def get_candidate_models(provider, model, client_ip=None):
+    """List (provider, model) pairs to try for a request, selected model first
+
+    Fallbacks are the default models of the other providers that have an API key
+    and, for a rate-limited request, daily quota left for the client.
+
+    Args:
+        provider (str): Provider of the selected model
+        model (str): Selected model
+        client_ip (str, optional): Client whose per-provider daily limits apply to fallbacks
+
+    Returns:
+        list: (provider, model) tuples
+    """
+    candidates = [(provider, model)]
+    available_defaults = [
+        ('groq', GROQ_DEFAULT_MODEL, GROQ_API_KEY),
+        ('gemini', GEMINI_DEFAULT_MODEL, GEMINI_API_KEY),
+        ('openai', OPENAI_DEFAULT_MODEL, OPENAI_API_KEY)
+    ]
+    for fallback_provider, fallback_model, api_key in available_defaults:
+        if not (api_key or FAKE_LLM_URL) or fallback_provider == provider:
+            continue
+        if client_ip is not None and not check_analysis_limit(client_ip, fallback_provider)[0]:
+            # Failover or a hedge would be charged to this provider (update_analysis_provider)
+            print(f"[LLM Router] Skipping fallback {fallback_provider}: daily limit reached or disabled")
+            continue
+        candidates.append((fallback_provider, fallback_model))
+    return candidates
+
+def generate_analysis(provider, model, system_prompt, prompt, client_ip=None):
+    """Call the selected model, failing over / hedging to other providers
+
+    Args:
+        client_ip (str, optional): Only fail over to providers with daily quota left for this client
+
+    Returns:
+        tuple: (analysis_text, provider_used, model_used)
+    """
+    candidates = get_candidate_models(provider, model, client_ip)
+    return llm_router.route(candidates, call_llm, system_prompt, prompt)
+
 def get_client_ip():
     """Get client IP address, handling proxies"""
     if request.headers.get('X-Forwarded-For'):
@@ -435,6 +677,9 @@ def log_analysis_request(ip_address, athlete_name=None, activity_id=None, provid
         activity_id (str, optional): Activity ID analyzed
         provider (str): 'openai', 'groq', or 'gemini'
         model (str, optional): Specific model used
+
+    Returns:
+        int or None: Sheet row of the logged request (None if logging failed)
     """
     try:
         service = get_sheets_service(readonly=False)
@@ -468,9 +713,39 @@ def log_analysis_request(ip_address, athlete_name=None, activity_id=None, provid
         ).execute()
 
         print(f"[Rate Limit Log] Successfully logged: IP={ip_address}, Provider={provider}, Model={model}, Date={date}, Athlete={athlete_name}, Activity={activity_id}")
-        return True
+        row_match = re.search(r'(\d+)$', result.get('updates', {}).get('updatedRange', ''))
+        return int(row_match.group(1)) if row_match else None
     except Exception as e:
         print(f"Error logging analysis request: {e}")
+        return None
+
+def update_analysis_provider(row_number, provider, model):
+    """Re-attribute a logged analysis request to the provider/model that served it
+
+    Failover can serve a request from another provider; the daily limit in
+    check_analysis_limit is counted per provider from column F.
+
+    Args:
+        row_number (int): Sheet row returned by log_analysis_request
+        provider (str): 'openai', 'groq', or 'gemini'
+        model (str): Model that produced the analysis
+
+    Returns:
+        bool: True if the row was updated
+    """
+    try:
+        service = get_sheets_service(readonly=False)
+        service.spreadsheets().values().update(
+            spreadsheetId=GOOGLE_SHEET_ID,
+            range=f'{AI_ANALYSIS_SHEET_NAME}!F{row_number}:G{row_number}',
+            valueInputOption='RAW',
+            body={'values': [[provider, model or '']]}
+        ).execute()
+
+        print(f"[Rate Limit Log] Row {row_number} re-attributed to Provider={provider}, Model={model}")
+        return True
+    except Exception as e:
+        print(f"Error updating analysis request provider: {e}")
         return False
 
 def strip_activity_data(activity):
@@ -491,7 +766,6 @@ def strip_activity_data(activity):
         'total_photo_count',  # Photo count
         'map',  # Map contains polyline and image URLs - usually very large
         'segment_efforts',  # Can be very large, not needed for general analysis
-        'best_efforts',  # Can be large
         'laps',  # Can be large, usually redundant with splits
         'splits_metric',  # Keep splits_standard (miles), remove metric (km)
         'athlete',  # Athlete profile data not needed
@@ -505,8 +779,149 @@ def strip_activity_data(activity):
     for field in fields_to_remove:
         cleaned_activity.pop(field, None)
 
+    # Best efforts are useful but carry a lot of nested metadata; keep the numbers only
+    if activity.get('best_efforts'):
+        cleaned_activity['best_efforts'] = [
+            {key: effort.get(key) for key in ('name', 'distance', 'elapsed_time', 'moving_time', 'pr_rank')}
+            for effort in activity['best_efforts']
+        ]
+
     return cleaned_activity
 
+# Chunk analysis cache for map-reduce list analysis (LRU, keyed by prompt hash)
+chunk_analysis_cache = OrderedDict()
+chunk_analysis_cache_lock = threading.Lock()
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token for English/JSON text)"""
+    return len(text) // 4 + 1
+
+def chunk_activities(activities, token_budget=None):
+    """Split activities into consecutive chunks that each fit a token budget
+
+    Args:
+        activities (list): Cleaned activity dicts, in chronological order
+        token_budget (int, optional): Max estimated tokens per chunk
+
+    Returns:
+        list: List of activity lists. An activity larger than the budget gets its own chunk.
+    """
+    token_budget = token_budget or LIST_ANALYSIS_CHUNK_TOKENS
+    chunks = []
+    current_chunk = []
+    current_tokens = 0
+
+    for act in activities:
+        act_tokens = estimate_tokens(str(act))
+        if current_chunk and current_tokens + act_tokens > token_budget:
+            chunks.append(current_chunk)
+            current_chunk = []
+            current_tokens = 0
+        current_chunk.append(act)
+        current_tokens += act_tokens
+
+    if current_chunk:
+        chunks.append(current_chunk)
+
+    return chunks
+
+def build_list_prompt(activities, analysis_query=''):
+    """User prompt for analyzing a list of activities in one pass"""
+    return build_user_prompt(
+        activities,
+        'list of Strava activities',
+        analysis_query=analysis_query,
+        task='Analyze this list of Strava activities and the trends across them.'
+    )
+
+def _chunk_cache_key(provider, model, system_prompt, prompt):
+    return hashlib.sha256(
+        f"{provider}\n{model}\n{system_prompt}\n{prompt}".encode('utf-8')
+    ).hexdigest()
+
+def analyze_chunk_cached(provider, model, system_prompt, prompt):
+    """Call the LLM for one chunk, reusing a cached result for an identical prompt
+
+    Results are cached under the provider/model that served them, so a failover
+    answer is never returned later as the requested model's output.
+    """
+    if LIST_ANALYSIS_CACHE_SIZE > 0:
+        cache_key = _chunk_cache_key(provider, model, system_prompt, prompt)
+        with chunk_analysis_cache_lock:
+            if cache_key in chunk_analysis_cache:
+                chunk_analysis_cache.move_to_end(cache_key)
+                return chunk_analysis_cache[cache_key]
+
+    result, used_provider, used_model = generate_analysis(provider, model, system_prompt, prompt)
+
+    if LIST_ANALYSIS_CACHE_SIZE > 0:
+        cache_key = _chunk_cache_key(used_provider, used_model, system_prompt, prompt)
+        with chunk_analysis_cache_lock:
+            chunk_analysis_cache[cache_key] = result
+            chunk_analysis_cache.move_to_end(cache_key)
+            while len(chunk_analysis_cache) > LIST_ANALYSIS_CACHE_SIZE:
+                chunk_analysis_cache.popitem(last=False)
+
+    return result
+
+def analyze_activities_map_reduce(activities, system_prompt, provider, model, analysis_query=''):
+    """Analyze a list of activities, using map-reduce when it exceeds one chunk
+
+    Map: each token-budgeted chunk is summarized in parallel (results are cached).
+    Reduce: a final synthesis pass turns the chunk summaries into one analysis.
+
+    Args:
+        activities (list): Cleaned activity dicts, in chronological order
+        system_prompt (str): System prompt for the final analysis
+        provider (str): 'openai', 'groq', or 'gemini'
+        model (str): Model identifier
+        analysis_query (str, optional): User focus for the analysis
+
+    Returns:
+        str: Analysis text
+    """
+    chunks = chunk_activities(activities)
+
+    if len(chunks) <= 1:
+        prompt = build_list_prompt(activities, analysis_query)
+        analysis, _, _ = generate_analysis(provider, model, system_prompt, prompt)
+        return analysis
+
+    chunk_system_prompt = get_system_prompt('list_chunk')
+
+    chunk_prompts = []
+    for idx, chunk in enumerate(chunks, start=1):
+        chunk_prompts.append(build_user_prompt(
+            chunk,
+            'list of Strava activities',
+            analysis_query=analysis_query,
+            task=f"Summarize block {idx} of {len(chunks)} ({len(chunk)} activities) of a longer training period."
+        ))
+
+    print(f"[Map-Reduce] {len(activities)} activities split into {len(chunks)} chunks")
+
+    max_workers = max(1, min(LIST_ANALYSIS_MAX_WORKERS, len(chunks)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        chunk_summaries = list(executor.map(
+            lambda chunk_prompt: analyze_chunk_cached(provider, model, chunk_system_prompt, chunk_prompt),
+            chunk_prompts
+        ))
+
+    summaries_text = "\n\n".join(
+        f"## Block {idx} of {len(chunks)}\n{summary}"
+        for idx, summary in enumerate(chunk_summaries, start=1)
+    )
+    prompt = build_user_prompt(
+        summaries_text,
+        'list of Strava activities',
+        analysis_query=analysis_query,
+        task=(f"Analyze this training period of {len(activities)} Strava activities. "
+              f"The activities were summarized in {len(chunks)} chronological blocks.")
+    )
+
+    analysis, _, _ = generate_analysis(provider, model, system_prompt, prompt)
+    return analysis
+
 def get_athlete_token(athlete_name):
     """Get valid token for a specific athlete, refreshing if necessary"""
     creds = get_athlete_credentials(athlete_name)
@@ -672,45 +1087,16 @@ def activity_detail(activity_id):
             # Use default model (prefer Groq if available)
             provider = get_model_provider(DEFAULT_MODEL)
 
-            # Initialize appropriate client
-            if provider == 'openai':
-                llm_client = openai.OpenAI(api_key=OPENAI_API_KEY)
-            elif provider == 'gemini':
-                llm_client = genai.GenerativeModel(DEFAULT_MODEL)
-            else:
-                llm_client = Groq(api_key=GROQ_API_KEY)
-
-            system_prompt = """You are a fitness data analyst.
-
-CRITICAL - STRAVA API DATA FORMAT:
-- ALL distances in the JSON are in METERS (not miles or kilometers)
-- ALL elevations in the JSON are in METERS (not feet)
-- ALL speeds are in METERS PER SECOND (not mph or min/mile)
-- ALL temperatures are in CELSIUS (not Fahrenheit)
-- Times are in SECONDS
-
-REQUIRED CONVERSIONS FOR YOUR ANALYSIS:
-- Distance: divide meters by 1609.34 to get miles
-- Elevation: divide meters by 0.3048 to get feet
-- Pace: (moving_time_seconds / distance_meters) * 26.8224 = minutes per mile
-- Speed: multiply meters/second by 2.23694 to get mph
-- Temperature: (celsius × 9/5) + 32 = Fahrenheit
-
-OUTPUT FORMAT - USE US UNITS:
-- Display all distances in MILES (e.g., "5.2 miles")
-- Display all elevations in FEET (e.g., "450 feet")
-- Display pace in MINUTES PER MILE (e.g., "8:30 min/mi")
-- Display temperatures in FAHRENHEIT (e.g., "72°F")
-- Display splits in miles unless the activity has custom kilometer splits
-
-Provide clear, actionable insights based on properly converted data."""
+            # Static, cacheable system prompt; per-request data goes in the user message
+            system_prompt = get_system_prompt('default')
 
-            # Strip out images and unnecessary data to save tokens
-            cleaned_activity = strip_activity_data(activity)
+            if LLM_FACT_SHEET:
+                cleaned_activity = {'fact_sheet': build_fact_sheet(activity)}
+            else:
+                # Strip out images and unnecessary data to save tokens
+                cleaned_activity = strip_activity_data(activity)
 
-            prompt = f"Analyze this Strava activity in detail: {cleaned_activity}"
-            if analysis_query:
-                prompt += f"\nFocus on: {analysis_query}"
+            prompt = build_user_prompt(cleaned_activity, 'Strava activity', analysis_query=analysis_query)
 
             # Check if debug mode is enabled
             if DEBUG_SKIP_LLM:
@@ -763,22 +1149,8 @@ To make actual API calls, set `DEBUG_SKIP_LLM=false` in your .env file.
 """
                 analysis_html = markdown2.markdown(analysis)
             else:
-                # Call LLM API (OpenAI, Groq, or Gemini)
-                if provider == 'gemini':
-                    # Gemini API format
-                    full_prompt = f"{system_prompt}\n\n{prompt}"
-                    response = llm_client.generate_content(full_prompt)
-                    analysis = response.text.strip()
-                else:
-                    # OpenAI/Groq API format
-                    response = llm_client.chat.completions.create(
-                        model=DEFAULT_MODEL,
-                        messages=[
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": prompt}
-                        ]
-                    )
-                    analysis = response.choices[0].message.content.strip()
+                # Call LLM API (OpenAI, Groq, or Gemini) with failover to other providers
+                analysis, _, _ = generate_analysis(provider, DEFAULT_MODEL, system_prompt, prompt)
 
                 analysis_html = markdown2.markdown(analysis)
         except Exception as e:
@@ -811,6 +1183,7 @@ def api_analyze_activity(activity_id):
     # Initialize for test message display
     current_count = 0
     limit = 0
+    log_row = None
 
     # Check if analysis is blocked entirely (rate_limit=-1)
     if rate_limit == -1:
@@ -837,22 +1210,22 @@ def api_analyze_activity(activity_id):
             # Log the analysis request immediately within the lock
             # This ensures the count is incremented before the next request can check
             athlete_name = session.get('athlete_name', None)
-            log_analysis_request(client_ip, athlete_name, activity_id, provider, selected_model)
+            log_row = log_analysis_request(client_ip, athlete_name, activity_id, provider, selected_model)
     else:
         # rate_limit=0 means unlimited
         limit = 'unlimited'
 
     # Check if this is a FIT file activity (ID starts with "fit_")
     if str(activity_id).startswith('fit_'):
-        # Get comprehensive FIT activity from session
-        print(f"[DEBUG] Looking for FIT activity in session...")
-        print(f"[DEBUG] Session keys: {list(session.keys())}")
+        # The full activity lives in the server-side store; the session only says which
+        # activity this browser uploaded (ids are random per upload and must match the session)
+        fit_activity = fit_activity_store.get(activity_id) if session.get('fit_activity_id') == activity_id else None
+        print(f"[DEBUG] Got FIT activity from store: {fit_activity is not None}")
 
-        comprehensive_data = session.get('fit_activity_comprehensive')
-        print(f"[DEBUG] Got comprehensive_data: {comprehensive_data is not None}")
+        if not fit_activity:
+            return jsonify({'error': 'FIT file activity not found or expired. Please upload the file again.'}), 404
 
-        if not comprehensive_data:
-            return jsonify({'error': 'FIT file activity not found in session. Please upload the file again.'}), 404
+        comprehensive_data = compact_fit_activity(fit_activity)
 
         # Get analysis query from session
         analysis_query = session.get('analysis_query', '')
@@ -860,21 +1233,31 @@ def api_analyze_activity(activity_id):
 
         # For FIT files, send comprehensive data to LLM including laps, segments, intervals
         # This gives the LLM full context about the workout structure
-        # Note: comprehensive_data is now just the strava_format dict
-        cleaned_activity = {
-            'activity_summary': comprehensive_data,
-            'laps': comprehensive_data.get('laps', []),
-            'segments': comprehensive_data.get('segments', []),
-            'gps_track_summary': {
-                'total_points': len(comprehensive_data.get('gps_track', [])),
-                'has_gps': len(comprehensive_data.get('gps_track', [])) > 0
-            },
-            'zones': comprehensive_data.get('zones', {}),
-            'device_info': {
-                'manufacturer': comprehensive_data.get('device_manufacturer'),
-                'model': comprehensive_data.get('device_name')
+        # Note: comprehensive_data is the compact strava_format summary (no per-point track)
+        if LLM_FACT_SHEET:
+            # Pre-computed metrics (splits, laps, drift) replace the raw summary and lap arrays
+            cleaned_activity = {
+                'fact_sheet': build_fact_sheet(fit_activity),
+                'segments': comprehensive_data.get('segments', []),
+                'gps_track_summary': comprehensive_data.get('gps_track_summary', {}),
+                'zones': comprehensive_data.get('zones', {}),
+                'device_info': {
+                    'manufacturer': comprehensive_data.get('device_manufacturer'),
+                    'model': comprehensive_data.get('device_name')
+                }
+            }
+        else:
+            cleaned_activity = {
+                'activity_summary': comprehensive_data,
+                'laps': comprehensive_data.get('laps', []),
+                'segments': comprehensive_data.get('segments', []),
+                'gps_track_summary': comprehensive_data.get('gps_track_summary', {}),
+                'zones': comprehensive_data.get('zones', {}),
+                'device_info': {
+                    'manufacturer': comprehensive_data.get('device_manufacturer'),
+                    'model': comprehensive_data.get('device_name')
+                }
             }
-        }
     else:
         # This is a Strava activity - fetch from API
         token = session.get('athlete_token')
@@ -893,201 +1276,22 @@ def api_analyze_activity(activity_id):
 
         activity = resp.json()
 
-        # Strip out images and unnecessary data to save tokens
-        cleaned_activity = strip_activity_data(activity)
+        if LLM_FACT_SHEET:
+            cleaned_activity = {'fact_sheet': build_fact_sheet(activity)}
+        else:
+            # Strip out images and unnecessary data to save tokens
+            cleaned_activity = strip_activity_data(activity)
 
     # Analyze with selected provider (OpenAI, Groq, or Gemini)
     try:
-        # Initialize appropriate client based on provider
-        if provider == 'openai':
-            llm_client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        elif provider == 'gemini':
-            llm_client = genai.GenerativeModel(selected_model)
-        else:
-            llm_client = Groq(api_key=GROQ_API_KEY)
-
-        # Define system prompts based on analysis mode
-        if analysis_mode == 'maniac':
-            system_prompt = """You are my over-achieving endurance coach in "maniac mode."
-
-CRITICAL - DATA FORMAT (Strava or FIT file):
-- ALL distances in the JSON are in METERS (not miles or kilometers)
-- ALL elevations in the JSON are in METERS (not feet)
-- ALL speeds are in METERS PER SECOND
-- ALL temperatures are in CELSIUS (not Fahrenheit)
-- Times are in SECONDS
-- CONVERT TO US UNITS: meters ÷ 1609.34 = miles | meters ÷ 0.3048 = feet | (moving_time_sec / distance_m) × 26.8224 = min/mile | (celsius × 9/5) + 32 = °F
-
-FIT FILE DATA STRUCTURE (when available):
-- "activity_summary" contains overall metrics
-- "laps" array contains interval/segment data with:
-  - distance, elapsed_time, moving_time for each lap
-  - average_speed, max_speed, average_heartrate, max_heartrate, average_watts, average_cadence
-  - intensity: "active" (work interval) or "rest"/"recovery"
-  - lap_trigger: how the lap was created (manual, distance, time, etc.)
-- "segments" array contains named segments
-- Analyze lap-by-lap data for interval workouts to assess pacing consistency and execution quality
-
-Analyze this activity with brutal honesty. Assume I want to be faster, stronger, and more disciplined than 99% of athletes.
-
-Rules:
-- Be blunt, direct, and unsympathetic to excuses
-- Call out inefficiencies, laziness, poor pacing, weak execution, and missed opportunities
-- Point out where I left performance on the table
-- If something was good, acknowledge it briefly, then push for a higher standard
-- Compare my execution against what an elite amateur or competitive age-grouper would do
-
-Analyze:
-- Pacing discipline (splits, variability, fade)
-- Effort vs outcome (did I earn the result?)
-- Training intent vs actual execution
-- Strengths I am under-leveraging
-- Specific, uncomfortable improvements I must make
-
-Output format:
-- One-sentence harsh summary
-- What I did wrong (bullet points, no sugarcoating)
-- What I did right (short)
-- What a serious athlete would do differently next time
-- One non-negotiable action item for my next workout
-
-Display all metrics in US units (miles, feet, min/mile pace).
-
-Do not motivate me emotionally. Fix me."""
-
-        elif analysis_mode == 'nice':
-            system_prompt = """You are my supportive endurance coach in "nice guy mode."
-
-CRITICAL - DATA FORMAT (Strava or FIT file):
-- ALL distances in the JSON are in METERS (not miles or kilometers)
-- ALL elevations in the JSON are in METERS (not feet)
-- ALL speeds are in METERS PER SECOND
-- ALL temperatures are in CELSIUS (not Fahrenheit)
-- Times are in SECONDS
-- CONVERT TO US UNITS: meters ÷ 1609.34 = miles | meters ÷ 0.3048 = feet | (moving_time_sec / distance_m) × 26.8224 = min/mile | (celsius × 9/5) + 32 = °F
-
-FIT FILE DATA STRUCTURE (when available):
-- "activity_summary" contains overall metrics
-- "laps" array contains interval/segment data with detailed metrics per lap
-- "segments" array contains named segments
-- Use lap data to analyze pacing consistency and workout structure
-
-Analyze this activity with a balanced, encouraging, and constructive tone. Assume I am committed and consistent, and I want to improve sustainably.
-
-Guidelines:
-- Start with what went well and why it matters
-- Frame weaknesses as opportunities, not failures
-- Focus on learning and long-term progression
-- Avoid harsh language or shaming
-
-Analyze:
-- Overall effort and pacing quality
-- Alignment with training intent
-- Signs of improving fitness or durability
-- Small adjustments that could make this workout better next time
-
-Output format:
-- Positive summary of the session
-- Key strengths from this activity
-- Areas to gently improve
-- One or two actionable suggestions for the next similar workout
-- What this workout contributes to my broader training
-
-Display all metrics in US units (miles, feet, min/mile pace).
-
-Keep it honest, but kind."""
-
-        elif analysis_mode == 'nerd':
-            system_prompt = """You are my sports science–oriented data analyst in "data nerd mode."
-
-CRITICAL - DATA FORMAT (Strava or FIT file):
-- ALL distances in the JSON are in METERS (not miles or kilometers)
-- ALL elevations in the JSON are in METERS (not feet)
-- ALL speeds are in METERS PER SECOND
-- ALL temperatures are in CELSIUS (not Fahrenheit)
-- Times are in SECONDS
-- CONVERT TO US UNITS: meters ÷ 1609.34 = miles | meters ÷ 0.3048 = feet | (moving_time_sec / distance_m) × 26.8224 = min/mile | (celsius × 9/5) + 32 = °F
-
-FIT FILE DATA STRUCTURE (when available):
-- "activity_summary" contains overall metrics
-- "laps" array contains interval/segment data - USE THIS for detailed interval analysis
-- Calculate coefficient of variation across laps to assess pacing consistency
-- Analyze HR trends across intervals to detect fatigue/cardiac drift
-- Compare work vs recovery intervals when intensity field is available
-
-Analyze this activity purely through data, physiology, and execution quality. Assume I want objective insights, not motivation.
-
-Rules:
-- Be precise, quantitative, and evidence-based
-- Avoid hype, emotion, or moral judgment
-- If data is missing, state assumptions explicitly
-- Distinguish correlation vs causation
-
-Analyze:
-- Pacing metrics (splits, variance, coefficient of variation if possible)
-- Intensity distribution (time in zones, HR–pace decoupling, drift)
-- Efficiency indicators (pace vs HR, cadence trends, stride consistency if available)
-- Fatigue signals (late-run fade, HR drift, power drop if applicable)
-- Execution vs stated training intent
-
-Derived insights:
-- What this workout implies about current fitness
-- Whether this session was optimally stressful, undercooked, or excessive
-- What adaptations this workout is likely to drive
-
-Output format:
-- Data summary (key metrics only)
-- Observed patterns and anomalies
-- Interpretation (what the data suggests, with confidence level)
-- Limitations of this analysis
-- One data-backed recommendation for future sessions
-
-Display all metrics in US units (miles, feet, min/mile pace).
-
-Do not coach emotionally. Let the data speak."""
-
-        else:
-            # Fallback for any unexpected mode
-            system_prompt = """You are a fitness data analyst.
-
-CRITICAL - DATA FORMAT (Strava or FIT file):
-- ALL distances in the JSON are in METERS (not miles or kilometers)
-- ALL elevations in the JSON are in METERS (not feet)
-- ALL speeds are in METERS PER SECOND (not mph or min/mile)
-- ALL temperatures are in CELSIUS (not Fahrenheit)
-- Times are in SECONDS
-
-FIT FILE DATA STRUCTURE (when available):
-- "activity_summary" contains overall metrics
-- "laps" array contains interval/segment data with detailed per-lap metrics
-- "segments" array contains named segments
-- Use lap data to analyze workout structure and pacing
-
-REQUIRED CONVERSIONS FOR YOUR ANALYSIS:
-- Distance: divide meters by 1609.34 to get miles
-- Elevation: divide meters by 0.3048 to get feet
-- Pace: (moving_time_seconds / distance_meters) * 26.8224 = minutes per mile
-- Speed: multiply meters/second by 2.23694 to get mph
-- Temperature: (celsius × 9/5) + 32 = Fahrenheit
-
-OUTPUT FORMAT - USE US UNITS:
-- Display all distances in MILES (e.g., "5.2 miles")
-- Display all elevations in FEET (e.g., "450 feet")
-- Display pace in MINUTES PER MILE (e.g., "8:30 min/mi")
-- Display temperatures in FAHRENHEIT (e.g., "72°F")
-- Display splits in miles unless the activity has custom kilometer splits
-
-Provide clear, actionable insights based on properly converted data."""
+        # Stable-prefix layout: static system prompt per mode (cacheable by the provider),
+        # then the per-request source, intent, query and data in a fixed order
+        system_prompt = get_system_prompt(analysis_mode)
 
         # Determine if this is a FIT file or Strava activity for the prompt
         activity_source = "FIT file activity" if str(activity_id).startswith('fit_') else "Strava activity"
 
-        prompt = f"Analyze this {activity_source} in detail: {cleaned_activity}"
-        if training_intent:
-            prompt += f"\n\nStated training intent: {training_intent}"
-            prompt += "\nEvaluate whether the execution matched the stated training intent."
-        if analysis_query:
-            prompt += f"\nFocus on: {analysis_query}"
+        prompt = build_user_prompt(cleaned_activity, activity_source, training_intent, analysis_query)
 
         # Check if debug mode is enabled
         if DEBUG_SKIP_LLM:
@@ -1145,21 +1349,15 @@ To make actual API calls, set `DEBUG_SKIP_LLM=false` in your .env file.
             analysis_html = markdown2.markdown(analysis)
         else:
             # Call LLM API (OpenAI, Groq, or Gemini based on selected model)
-            if provider == 'gemini':
-                # Gemini API format - combine system and user prompts
-                full_prompt = f"{system_prompt}\n\n{prompt}"
-                response = llm_client.generate_content(full_prompt)
-                analysis = response.text.strip()
-            else:
-                # OpenAI/Groq API format
-                response = llm_client.chat.completions.create(
-                    model=selected_model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": prompt}
-                    ]
-                )
-                analysis = response.choices[0].message.content.strip()
+            # Slow requests are hedged and errors fail over to the other configured providers
+            analysis, used_provider, used_model = generate_analysis(
+                provider, selected_model, system_prompt, prompt, client_ip=client_ip
+            )
+            if used_model != selected_model:
+                print(f"[LLM Router] Requested {provider}/{selected_model}, served by {used_provider}/{used_model}")
+                if log_row:
+                    # The request was charged up front; move it to the quota of the provider that served it
+                    update_analysis_provider(log_row, used_provider, used_model)
 
             analysis_html = markdown2.markdown(analysis)
 
@@ -1168,9 +1366,31 @@ To make actual API calls, set `DEBUG_SKIP_LLM=false` in your .env file.
             'analysis': analysis,
             'analysis_html': analysis_html
         })
+    except ThrottleTimeout as e:
+        return jsonify({'error': f'AI analysis is busy right now, please try again in a minute. ({e})'}), 503
     except Exception as e:
         return jsonify({'error': f'LLM API error: {str(e)}'}), 500
 
+@app.route('/api/llm_stats')
+def api_llm_stats():
+    """Rolling latency/error stats per LLM provider/model and admission queue metrics"""
+    return jsonify({
+        'hedging_enabled': LLM_HEDGING_ENABLED,
+        'failover_enabled': LLM_FAILOVER_ENABLED,
+        'hedge_delay_seconds': LLM_HEDGE_DELAY_SECONDS,
+        'providers': llm_router.get_stats(),
+        'admission': llm_admission.get_metrics()
+    })
+
+@app.route('/api/fit_stats')
+def api_fit_stats():
+    """FIT parse pool counters (uploads and bulk imports) and parsed-result cache hit rate/size"""
+    return jsonify({
+        'parse_pool': fit_parse_pool.get_stats(),
+        'bulk_pool': fit_bulk_pool.get_stats(),
+        'result_cache': fit_result_cache.get_stats()
+    })
+
 @app.route('/analyze_list', methods=['GET', 'POST'])
 def analyze_list():
     token = get_token()
@@ -1229,45 +1449,16 @@ def analyze_list():
         # Use default model (prefer Groq if available)
         provider = get_model_provider(DEFAULT_MODEL)
 
-        # Initialize appropriate client
-        if provider == 'openai':
-            llm_client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        elif provider == 'gemini':
-            llm_client = genai.GenerativeModel(DEFAULT_MODEL)
-        else:
-            llm_client = Groq(api_key=GROQ_API_KEY)
-
-        system_prompt = """You are a fitness data analyst.
+        system_prompt = get_system_prompt('list')
 
-CRITICAL - STRAVA API DATA FORMAT:
-- ALL distances in the JSON are in METERS (not miles or kilometers)
-- ALL elevations in the JSON are in METERS (not feet)
-- ALL speeds are in METERS PER SECOND (not mph or min/mile)
-- ALL temperatures are in CELSIUS (not Fahrenheit)
-- Times are in SECONDS
-
-REQUIRED CONVERSIONS FOR YOUR ANALYSIS:
-- Distance: divide meters by 1609.34 to get miles
-- Elevation: divide meters by 0.3048 to get feet
-- Pace: (moving_time_seconds / distance_meters) * 26.8224 = minutes per mile
-- Speed: multiply meters/second by 2.23694 to get mph
-- Temperature: (celsius × 9/5) + 32 = Fahrenheit
-
-OUTPUT FORMAT - USE US UNITS:
-- Display all distances in MILES (e.g., "5.2 miles")
-- Display all elevations in FEET (e.g., "450 feet")
-- Display pace in MINUTES PER MILE (e.g., "8:30 min/mi")
-- Display temperatures in FAHRENHEIT (e.g., "72°F")
-- Display splits in miles unless the activity has custom kilometer splits
-
-Provide clear, actionable insights and trends across all activities based on properly converted data."""
-
-        # Strip out images and unnecessary data from each activity to save tokens
-        cleaned_activities = [strip_activity_data(act) for act in activities]
+        if LLM_FACT_SHEET:
+            # Compact per-activity totals in US units (list endpoint has no splits/laps)
+            cleaned_activities = [build_fact_sheet(act, include_splits=False, include_laps=False) for act in activities]
+        else:
+            # Strip out images and unnecessary data from each activity to save tokens
+            cleaned_activities = [strip_activity_data(act) for act in activities]
 
-        prompt = f"Analyze this list of Strava activities: {cleaned_activities}"
-        if analysis_query:
-            prompt += f"\nFocus on: {analysis_query}"
+        prompt = build_list_prompt(cleaned_activities, analysis_query)
         try:
             # Check if debug mode is enabled
             if DEBUG_SKIP_LLM:
@@ -1320,22 +1511,11 @@ To make actual API calls, set `DEBUG_SKIP_LLM=false` in your .env file.
 """
                 analysis_html = markdown2.markdown(analysis)
             else:
-                # Call LLM API (OpenAI, Groq, or Gemini)
-                if provider == 'gemini':
-                    # Gemini API format
-                    full_prompt = f"{system_prompt}\n\n{prompt}"
-                    response = llm_client.generate_content(full_prompt)
-                    analysis = response.text.strip()
-                else:
-                    # OpenAI/Groq API format
-                    response = llm_client.chat.completions.create(
-                        model=DEFAULT_MODEL,
-                        messages=[
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": prompt}
-                        ]
-                    )
-                    analysis = response.choices[0].message.content.strip()
+                # Call LLM API (OpenAI, Groq, or Gemini), splitting long lists into
+                # parallel chunk analyses plus a synthesis pass
+                analysis = analyze_activities_map_reduce(
+                    cleaned_activities, system_prompt, provider, DEFAULT_MODEL, analysis_query
+                )
 
                 analysis_html = markdown2.markdown(analysis)
         except Exception as e:
@@ -1578,6 +1758,49 @@ def fetch_athlete_activities(athlete_name):
                          gemini_models=GEMINI_MODELS,
                          default_model=DEFAULT_MODEL)
 
+def compact_fit_activity(activity):
+    """Summary fields of a parsed FIT activity sent to the LLM (gps_track replaced by a point count)"""
+    return {
+        'id': activity['id'],
+        'name': activity['name'],
+        'type': activity['type'],
+        'start_date': activity['start_date'],
+        'start_date_local': activity['start_date_local'],
+        'distance': activity['distance'],
+        'moving_time': activity['moving_time'],
+        'elapsed_time': activity['elapsed_time'],
+        'total_elevation_gain': activity['total_elevation_gain'],
+        'elev_high': activity['elev_high'],
+        'elev_low': activity['elev_low'],
+        'average_speed': activity['average_speed'],
+        'max_speed': activity['max_speed'],
+        'average_heartrate': activity['average_heartrate'],
+        'max_heartrate': activity['max_heartrate'],
+        'average_cadence': activity['average_cadence'],
+        'average_watts': activity.get('average_watts'),
+        'max_watts': activity.get('max_watts'),
+        'weighted_average_watts': activity.get('weighted_average_watts'),
+        'average_temp': activity.get('average_temp'),
+        'has_heartrate': activity['has_heartrate'],
+        'has_power': activity.get('has_power', False),
+        'calories': activity['calories'],
+        'laps': activity.get('laps', []),  # Include all laps
+        # Work/recovery blocks found in the power/speed stream, only when the laps are auto laps
+        'detected_intervals': [] if has_structured_laps(activity.get('laps') or [])
+                              else activity.get('detected_intervals', []),
+        'segments': activity.get('segments', []),  # Include segments
+        'splits_standard': activity.get('splits_standard', []),
+        'splits_metric': activity.get('splits_metric', []),
+        'zones': activity.get('zones', {}),
+        'time_in_zones': activity.get('time_in_zones', {}),  # Seconds per zone (laps carry their own)
+        'best_efforts': activity.get('best_efforts', []),
+        'mean_max': activity.get('mean_max', {}),
+        'device_name': activity.get('device_name'),
+        'device_manufacturer': activity.get('device_manufacturer'),
+        # Fixed-size downsampled HR/pace/power series and route instead of the full GPS track
+        'gps_track_summary': activity.get('gps_track_summary') or downsample_track(activity.get('gps_track'))
+    }
+
 @app.route('/athlete/<athlete_name>/upload_fit', methods=['POST'])
 def upload_fit_file(athlete_name):
     """Handle FIT file upload and convert to activity data for analysis"""
@@ -1612,42 +1835,43 @@ def upload_fit_file(athlete_name):
                              error='Invalid file type. Only .fit files are accepted.')
 
     try:
-        # Save uploaded file temporarily
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        unique_filename = f"{athlete_name}_{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(filepath)
-
-        # Validate FIT file
-        is_valid, error_message = validate_fit_file(filepath)
-        if not is_valid:
-            # Clean up invalid file
-            os.remove(filepath)
-            athletes_data = get_athletes_data()
-            athlete_summary = next((a for a in athletes_data if a['athlete'] == athlete_name), None)
-            return render_template('athlete_profile.html',
-                                 athlete=athlete_summary,
-                                 athlete_name=athlete_name,
-                                 error=f'Invalid FIT file: {error_message}')
-
-        # Parse FIT file with comprehensive data (includes all laps, segments, GPS tracks)
-        comprehensive_data = parse_fit_file(filepath, comprehensive=True)
-
-        # Clean up file after parsing
-        os.remove(filepath)
+        # Parse directly from the upload stream (no save to uploads/ and re-open by path)
+        upload_stream = spool_fit_stream(file.stream, FIT_SPOOL_THRESHOLD_BYTES)
+
+        # Same bytes as an earlier upload: reuse that parse (a few ms instead of a full decode).
+        # Cached entries carry no per-upload identity (the cache issues a fresh id on each hit)
+        content_hash = hash_fit_source(upload_stream)
+        comprehensive_data, error_message = fit_result_cache.get(content_hash), None
+
+        if comprehensive_data is None:
+            # Validate and parse in a single decode (header/size checked up front, CRC and
+            # message structure verified by the parse itself). Large files are decoded in a
+            # worker process so they don't block other requests; tiny ones are parsed inline.
+            comprehensive_data, error_message = fit_parse_pool.parse(
+                upload_stream, filename=secure_filename(file.filename)
+            )
+            if comprehensive_data and not error_message:
+                fit_result_cache.put(content_hash, comprehensive_data)
+        else:
+            print(f"[DEBUG] FIT cache hit for {content_hash[:16]}")
 
-        if not comprehensive_data:
+        if error_message or not comprehensive_data:
             athletes_data = get_athletes_data()
             athlete_summary = next((a for a in athletes_data if a['athlete'] == athlete_name), None)
             return render_template('athlete_profile.html',
                                  athlete=athlete_summary,
                                  athlete_name=athlete_name,
-                                 error='Failed to parse FIT file. The file may be corrupted or in an unsupported format.')
+                                 error=f'Invalid FIT file: {error_message}' if error_message else
+                                       'Failed to parse FIT file. The file may be corrupted or in an unsupported format.')
 
         # Extract strava_format for display purposes
         activity_display = comprehensive_data['strava_format']
 
+        # Time in zones against the athlete's zones when the file defines none (after caching,
+        # so changing the configured zones never needs a re-parse)
+        apply_athlete_zones(activity_display, ATHLETE_HR_ZONES, ATHLETE_POWER_ZONES,
+                            track_stride=comprehensive_data['metadata'].get('track_stride', 1))
+
         # Debug: Print what we're storing
         print(f"[DEBUG] Parsed FIT file successfully")
         print(f"[DEBUG] Activity ID: {activity_display.get('id')}")
@@ -1673,50 +1897,15 @@ def upload_fit_file(athlete_name):
             activity_display['distance_miles'] = 0
             activity_display['pace_min_per_mile'] = 'N/A'
 
-        # Store COMPREHENSIVE data in session for LLM analysis
-        # Note: Flask cookie-based sessions have size limits (~4KB)
-        # Create compact version without full GPS track (too large for session cookies)
-        compact_data = {
-            'id': activity_display['id'],
-            'name': activity_display['name'],
-            'type': activity_display['type'],
-            'start_date': activity_display['start_date'],
-            'start_date_local': activity_display['start_date_local'],
-            'distance': activity_display['distance'],
-            'moving_time': activity_display['moving_time'],
-            'elapsed_time': activity_display['elapsed_time'],
-            'total_elevation_gain': activity_display['total_elevation_gain'],
-            'elev_high': activity_display['elev_high'],
-            'elev_low': activity_display['elev_low'],
-            'average_speed': activity_display['average_speed'],
-            'max_speed': activity_display['max_speed'],
-            'average_heartrate': activity_display['average_heartrate'],
-            'max_heartrate': activity_display['max_heartrate'],
-            'average_cadence': activity_display['average_cadence'],
-            'average_watts': activity_display.get('average_watts'),
-            'max_watts': activity_display.get('max_watts'),
-            'weighted_average_watts': activity_display.get('weighted_average_watts'),
-            'average_temp': activity_display.get('average_temp'),
-            'has_heartrate': activity_display['has_heartrate'],
-            'has_power': activity_display.get('has_power', False),
-            'calories': activity_display['calories'],
-            'laps': activity_display.get('laps', []),  # Include all laps
-            'segments': activity_display.get('segments', []),  # Include segments
-            'splits_standard': activity_display.get('splits_standard', []),
-            'splits_metric': activity_display.get('splits_metric', []),
-            'zones': activity_display.get('zones', {}),
-            'device_name': activity_display.get('device_name'),
-            'device_manufacturer': activity_display.get('device_manufacturer'),
-            'gps_track_summary': {  # Summary instead of full GPS track
-                'total_points': len(activity_display.get('gps_track', [])),
-                'has_gps': len(activity_display.get('gps_track', [])) > 0
-            }
-        }
-
-        session['fit_activity_comprehensive'] = compact_data
+        # Keep the full activity (laps, splits, columnar track) server side; the session cookie
+        # only carries its id (whole activities overflowed the ~4 KB cookie limit). Every upload
+        # gets its own random id: uploads of the same file must not share (or overwrite) an entry
+        activity_display['id'] = f"fit_{uuid.uuid4().hex}"
+        fit_activity_store.put(activity_display['id'], activity_display)
+        session.pop('fit_activity_comprehensive', None)
+        session['fit_activity_id'] = activity_display['id']
         session['selected_athlete'] = athlete_name
-        print(f"[DEBUG] Stored compact data in session (no full GPS track)")
-        print(f"[DEBUG] Laps: {len(compact_data['laps'])}, Segments: {len(compact_data['segments'])}")
+        print(f"[DEBUG] Stored FIT activity {activity_display['id']} server side ({len(fit_activity_store)} held)")
 
         # Get athlete summary data
         athletes_data = get_athletes_data()
@@ -1733,10 +1922,6 @@ def upload_fit_file(athlete_name):
                              default_model=DEFAULT_MODEL)
 
     except Exception as e:
-        # Clean up file if error occurred
-        if os.path.exists(filepath):
-            os.remove(filepath)
-
         athletes_data = get_athletes_data()
         athlete_summary = next((a for a in athletes_data if a['athlete'] == athlete_name), None)
         return render_template('athlete_profile.html',
@@ -1744,5 +1929,83 @@ def upload_fit_file(athlete_name):
                              athlete_name=athlete_name,
                              error=f'Error processing FIT file: {str(e)}')
 
+def run_bulk_import_job(job_id, archive_file, store):
+    """Background thread body of a bulk import: parse the archive and keep the job status current"""
+    job = bulk_import_jobs[job_id]
+
+    def progress(report):
+        with bulk_import_jobs_lock:
+            job['progress'] = {key: report[key] for key in ('files', 'imported', 'failed', 'points')}
+
+    try:
+        report = bulk_import(archive_file, store, pool=fit_bulk_pool, progress=progress)
+        print(f"[FIT Bulk Import] {job['athlete']}: {report['imported']}/{report['files']} files in "
+              f"{report['seconds']:.2f}s ({report['files_per_second']} files/s, {report['points_per_second']} points/s)")
+        with bulk_import_jobs_lock:
+            job['status'] = 'done'
+            job['report'] = report
+    except Exception as e:
+        with bulk_import_jobs_lock:
+            job['status'] = 'failed'
+            job['error'] = f'Error importing FIT archive: {str(e)}'
+    finally:
+        archive_file.close()
+
+@app.route('/athlete/<athlete_name>/bulk_import_fit', methods=['POST'])
+def bulk_import_fit_files(athlete_name):
+    """Start importing every FIT file in an uploaded zip archive into the athlete's activity store
+
+    The import runs in a background job on its own pool (fit_bulk_pool), one worker per
+    core by default; poll the returned status_url for progress and the final report.
+    One bad file is reported in 'errors' without failing the rest of the import.
+    """
+    # Only this route accepts archives above MAX_UPLOAD_SIZE (set before the form is parsed)
+    request.max_content_length = MAX_BULK_UPLOAD_SIZE
+    if 'fit_archive' not in request.files or request.files['fit_archive'].filename == '':
+        return jsonify({'error': 'No archive uploaded. Please select a .zip file of FIT files.'}), 400
+
+    archive = request.files['fit_archive']
+    if not archive.filename.lower().endswith('.zip'):
+        return jsonify({'error': 'Invalid file type. Only .zip archives are accepted.'}), 400
+
+    try:
+        # The upload is closed when the request ends: copy it for the job (memory first,
+        # temp file above the threshold; zipfile needs a seekable file)
+        archive_file = tempfile.SpooledTemporaryFile(max_size=FIT_SPOOL_THRESHOLD_BYTES, mode='w+b')
+        shutil.copyfileobj(archive.stream, archive_file, 1024 * 1024)
+        archive_file.seek(0)
+        store = LocalActivityStore(os.path.join(ACTIVITY_STORE_DIR, secure_filename(athlete_name) or 'unknown'))
+    except Exception as e:
+        return jsonify({'error': f'Error importing FIT archive: {str(e)}'}), 500
+
+    job_id = uuid.uuid4().hex
+    with bulk_import_jobs_lock:
+        bulk_import_jobs[job_id] = {
+            'job_id': job_id,
+            'athlete': athlete_name,
+            'status': 'running',
+            'progress': {'files': 0, 'imported': 0, 'failed': 0, 'points': 0}
+        }
+        # Forget the oldest finished jobs
+        finished = [key for key, job in bulk_import_jobs.items() if job['status'] != 'running']
+        for key in finished[:max(0, len(bulk_import_jobs) - BULK_IMPORT_JOBS_MAX)]:
+            del bulk_import_jobs[key]
+
+    threading.Thread(target=run_bulk_import_job, args=(job_id, archive_file, store), daemon=True).start()
+    return jsonify({
+        'job_id': job_id,
+        'status': 'running',
+        'status_url': url_for('bulk_import_status', athlete_name=athlete_name, job_id=job_id)
+    }), 202
+
+@app.route('/athlete/<athlete_name>/bulk_import_fit/<job_id>')
+def bulk_import_status(athlete_name, job_id):
+    """Status of a bulk import job: running with progress, or done with the import report"""
+    with bulk_import_jobs_lock:
+        job = bulk_import_jobs.get(job_id)
+        if not job or job['athlete'] != athlete_name:
+            return jsonify({'error': 'Bulk import job not found.'}), 404
+        return jsonify(dict(job))
+
 if __name__ == '__main__':
     app.run(debug=True, port=4200, host='localhost')
@@ -0,0 +1,318 @@
+"""
+Fake LLM Provider for Offline Load Testing
+
+A local stand-in for the OpenAI / Groq chat-completions API. It answers with
+canned analyses after a configurable latency, reports token usage (including
+simulated prompt-cache hits), supports streaming and injects errors, so the
+whole analysis path can be load-tested without network access or API cost.
+
+Endpoints (same request/response shape as the real APIs):
+    POST /v1/chat/completions          (OpenAI SDK, base_url=http://host:port/v1)
+    POST /openai/v1/chat/completions   (Groq SDK, base_url=http://host:port)
+    GET  /stats                        (requests served, errors injected, in flight)
+
+USAGE:
+======
+Command Line:
+    python fake_llm_server.py --port 8089 --latency lognormal:2.0:0.5 --error-rate 0.05
+
+    Then run the app with FAKE_LLM_URL=http://localhost:8089 - all providers
+    (including Gemini) are sent to the fake server.
+
+In-process:
+    server = start_fake_llm_server(port=0, latency='uniform:0.5:1.5')
+    url = f"http://localhost:{server.server_address[1]}"
+    ...
+    server.shutdown()
+
+Latency distributions (seconds):
+    fixed:<s>                 e.g. fixed:1.5
+    uniform:<low>:<high>      e.g. uniform:0.5:3
+    normal:<mean>:<stddev>    e.g. normal:2:0.5 (clamped at 0)
+    lognormal:<median>:<sigma> e.g. lognormal:2:0.6 (long tail, closest to real providers)
+    exponential:<mean>        e.g. exponential:1.5
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+CANNED_ANALYSIS = """# Fake LLM Analysis
+
+This response was generated by the local fake LLM server (`fake_llm_server.py`).
+
+- **Summary:** Solid, evenly paced session.
+- **Pacing:** Splits were consistent with a slight negative split.
+- **Heart rate:** Mild cardiac drift in the second half.
+- **Recommendation:** Repeat this workout next week at the same effort."""
+
+
+def parse_latency_spec(spec):
+    """Parse a latency spec like 'lognormal:2:0.5' into a sampling function
+
+    Args:
+        spec (str): Distribution spec (see module docstring)
+
+    Returns:
+        callable: Function returning a latency in seconds
+    """
+    parts = spec.split(':')
+    kind = parts[0].lower()
+    args = [float(p) for p in parts[1:]]
+
+    if kind == 'fixed':
+        return lambda: args[0]
+    if kind == 'uniform':
+        return lambda: random.uniform(args[0], args[1])
+    if kind == 'normal':
+        return lambda: max(0.0, random.gauss(args[0], args[1]))
+    if kind == 'lognormal':
+        import math
+        mu = math.log(args[0])
+        return lambda: random.lognormvariate(mu, args[1])
+    if kind == 'exponential':
+        return lambda: random.expovariate(1.0 / args[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+class FakeLLMConfig:
+    """Behavior of the fake provider (shared by all handler threads)"""
+
+    def __init__(self, latency='lognormal:1.5:0.5', error_rate=0.0, error_statuses=(429, 500, 503),
+                 completion_tokens=350, stream_chunk_delay=0.02, response_text=CANNED_ANALYSIS):
+        """
+        Args:
+            latency (str): Time-to-first-token distribution spec
+            error_rate (float): Fraction of requests (0-1) answered with an injected error
+            error_statuses (tuple): HTTP statuses to pick from for injected errors
+            completion_tokens (int): Completion tokens reported in usage
+            stream_chunk_delay (float): Seconds between streamed chunks
+            response_text (str): Content returned for every completion
+        """
+        self.latency_spec = latency
+        self.sample_latency = parse_latency_spec(latency)
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.completion_tokens = completion_tokens
+        self.stream_chunk_delay = stream_chunk_delay
+        self.response_text = response_text
+
+        self.lock = threading.Lock()
+        self.seen_prefixes = set()  # Simulated provider prompt cache (hash of system prompt)
+        self.stats = {'requests': 0, 'errors_injected': 0, 'streamed': 0, 'in_flight': 0, 'max_in_flight': 0}
+
+    def cached_tokens_for(self, messages):
+        """Report the system prompt as cached once it has been seen before"""
+        system_text = ''.join(m.get('content') or '' for m in messages if m.get('role') == 'system')
+        if not system_text:
+            return 0
+        prefix_hash = hashlib.sha256(system_text.encode('utf-8')).hexdigest()
+        with self.lock:
+            if prefix_hash in self.seen_prefixes:
+                return estimate_tokens(system_text)
+            self.seen_prefixes.add(prefix_hash)
+        return 0
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """Handle OpenAI/Groq-shaped chat completion requests"""
+
+    protocol_version = 'HTTP/1.1'
+    config = None  # Set on the subclass created by make_server
+
+    def log_message(self, format, *args):
+        # Silence per-request logging (load tests would flood stdout)
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            with self.config.lock:
+                stats = dict(self.config.stats)
+            stats['latency'] = self.config.latency_spec
+            stats['error_rate'] = self.config.error_rate
+            self._send_json(200, stats)
+        else:
+            self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            request_body = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            self._send_json(400, {'error': {'message': 'Invalid JSON body', 'type': 'invalid_request_error'}})
+            return
+
+        config = self.config
+        with config.lock:
+            config.stats['requests'] += 1
+            config.stats['in_flight'] += 1
+            config.stats['max_in_flight'] = max(config.stats['max_in_flight'], config.stats['in_flight'])
+
+        try:
+            time.sleep(config.sample_latency())
+
+            if config.error_rate and random.random() < config.error_rate:
+                status = random.choice(config.error_statuses)
+                with config.lock:
+                    config.stats['errors_injected'] += 1
+                headers = {'Retry-After': '1'} if status == 429 else None
+                self._send_json(status, {'error': {
+                    'message': f'Injected error ({status}) from fake LLM server',
+                    'type': 'rate_limit_error' if status == 429 else 'server_error'
+                }}, headers)
+                return
+
+            messages = request_body.get('messages', [])
+            model = request_body.get('model', 'fake-model')
+            prompt_tokens = sum(estimate_tokens(m.get('content') or '') for m in messages)
+            usage = {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': config.completion_tokens,
+                'total_tokens': prompt_tokens + config.completion_tokens,
+                'prompt_tokens_details': {'cached_tokens': config.cached_tokens_for(messages)}
+            }
+            completion_id = f"chatcmpl-fake-{uuid.uuid4().hex[:12]}"
+
+            if request_body.get('stream'):
+                with config.lock:
+                    config.stats['streamed'] += 1
+                self._stream_completion(completion_id, model, usage)
+            else:
+                self._send_json(200, {
+                    'id': completion_id,
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': model,
+                    'choices': [{
+                        'index': 0,
+                        'message': {'role': 'assistant', 'content': config.response_text},
+                        'finish_reason': 'stop'
+                    }],
+                    'usage': usage
+                })
+        finally:
+            with config.lock:
+                config.stats['in_flight'] -= 1
+
+    def _stream_completion(self, completion_id, model, usage):
+        """Send the response as server-sent events, one word per chunk"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def send_event(payload):
+            self.wfile.write(f"data: {payload}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        words = self.config.response_text.split(' ')
+        for idx, word in enumerate(words):
+            delta = {'content': word if idx == 0 else ' ' + word}
+            if idx == 0:
+                delta['role'] = 'assistant'
+            send_event(json.dumps({
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]
+            }))
+            time.sleep(self.config.stream_chunk_delay)
+
+        send_event(json.dumps({
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+            'usage': usage
+        }))
+        send_event('[DONE]')
+
+
+def make_server(host='localhost', port=8089, **config_kwargs):
+    """Create (but do not start) a fake LLM HTTP server
+
+    Args:
+        host (str): Interface to bind
+        port (int): Port to bind (0 = pick a free port)
+        **config_kwargs: Passed to FakeLLMConfig
+
+    Returns:
+        ThreadingHTTPServer: Server with a `fake_config` attribute
+    """
+    config = FakeLLMConfig(**config_kwargs)
+    handler = type('ConfiguredFakeLLMHandler', (FakeLLMHandler,), {'config': config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.fake_config = config
+    return server
+
+
+def start_fake_llm_server(host='localhost', port=0, **config_kwargs):
+    """Start a fake LLM server on a background thread
+
+    Returns:
+        ThreadingHTTPServer: Running server (call .shutdown() to stop)
+    """
+    server = make_server(host, port, **config_kwargs)
+    thread = threading.Thread(target=server.serve_forever, name='fake-llm-server', daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fake OpenAI/Groq chat-completions server for load testing')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', default='lognormal:1.5:0.5',
+                        help='Latency distribution, e.g. fixed:1, uniform:0.5:3, normal:2:0.5, lognormal:2:0.6, exponential:1.5')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail (0-1)')
+    parser.add_argument('--error-statuses', default='429,500,503', help='Comma-separated HTTP statuses for injected errors')
+    parser.add_argument('--completion-tokens', type=int, default=350)
+    parser.add_argument('--stream-chunk-delay', type=float, default=0.02)
+    args = parser.parse_args()
+
+    server = make_server(
+        args.host,
+        args.port,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        error_statuses=[int(s) for s in args.error_statuses.split(',') if s],
+        completion_tokens=args.completion_tokens,
+        stream_chunk_delay=args.stream_chunk_delay
+    )
+    print(f"Fake LLM server listening on http://{args.host}:{server.server_address[1]}")
+    print(f"  latency={args.latency} error_rate={args.error_rate}")
+    print(f"  Run the app with FAKE_LLM_URL=http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+        server.shutdown()
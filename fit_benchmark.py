@@ -0,0 +1,444 @@
+"""
+FIT Parser Benchmarks
+
+Compares parse time and peak memory of the fit_parser code paths, and writes
+synthetic FIT activity files of any length so long (multi-hour, 1 Hz) files
+can be benchmarked without real device exports.
+
+Each parser runs in a fresh process so peak RSS (ru_maxrss) and the tracemalloc
+peak are measured for that parser alone.
+
+USAGE:
+======
+Command Line:
+    # Benchmark the comprehensive, streaming, selective and fast parsers on real files
+    python fit_benchmark.py activity1.fit activity2.fit
+
+    # fitparse streaming vs the bulk record decoder (fit_decoder.py) over a corpus directory
+    python fit_benchmark.py fit_corpus/ --parsers streaming,fast,upload,upload_fast
+
+    # Upload pipeline: validate-then-parse (two decodes) vs single-parse validation
+    python fit_benchmark.py --synthetic-hours 4 --parsers upload_legacy,upload
+
+    # Peak RSS of the bounded-memory parser (fit_stream.py) on a synthetic multi-day ultra
+    python fit_benchmark.py --synthetic-hours 72 --parsers fast,bounded --repeat 1
+
+    # Generate a synthetic 6 hour file and benchmark it
+    python fit_benchmark.py --synthetic-hours 6
+
+    # Interval detection time on long files (linear: 72 h should take ~12x the 6 h time)
+    python fit_benchmark.py --synthetic-hours 6 --parsers fast --intervals
+    python fit_benchmark.py --synthetic-hours 72 --parsers fast --intervals
+
+    # Also compare export formats (JSON vs columnar npz): size, export and reload time
+    python fit_benchmark.py --synthetic-hours 4 --parsers streaming --export
+
+In code:
+    write_synthetic_fit('long_run.fit', duration_seconds=6 * 3600)
+    results = benchmark_file('long_run.fit', ['comprehensive', 'streaming', 'selective'])
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import resource
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import fit_parser
+from fit_track import detect_intervals
+
+FIT_EPOCH_OFFSET = 631065600  # Seconds between the Unix epoch and the FIT epoch (1989-12-31)
+
+# FIT base type name -> (base type byte, struct format)
+BASE_TYPES = {
+    'enum': (0x00, 'B'),
+    'uint8': (0x02, 'B'),
+    'uint16': (0x84, 'H'),
+    'sint32': (0x85, 'i'),
+    'uint32': (0x86, 'I'),
+    'uint32z': (0x8C, 'I')
+}
+
+DEFAULT_PARSERS = ['comprehensive', 'streaming', 'selective', 'fast']
+ALL_PARSERS = ['comprehensive', 'streaming', 'selective', 'fast', 'bounded', 'upload_legacy', 'upload',
+               'upload_fast']
+
+
+def write_synthetic_fit(filepath, duration_seconds=3600, start_epoch=1700000000, interval_seconds=300, seed=42):
+    """Write a synthetic 1 Hz running activity as a valid FIT file
+
+    The run alternates work/recovery blocks of `interval_seconds` (one lap each)
+    with GPS, altitude, heart rate, cadence, speed and power on every record.
+
+    Args:
+        filepath (str): Output path
+        duration_seconds (int): Number of 1 Hz records
+        start_epoch (int): Start time as Unix epoch seconds
+        interval_seconds (int): Length of each work/recovery lap
+        seed (int): Random seed (same seed -> byte-identical file)
+
+    Returns:
+        int: Size of the written file in bytes
+    """
+    rng = random.Random(seed)
+    body = bytearray()
+
+    def define(local_num, global_num, fields):
+        body.append(0x40 | local_num)
+        body.extend(struct.pack('<BBHB', 0, 0, global_num, len(fields)))
+        fmt = '<'
+        for field_num, base_type in fields:
+            type_byte, type_fmt = BASE_TYPES[base_type]
+            body.extend(struct.pack('<BBB', field_num, struct.calcsize(type_fmt), type_byte))
+            fmt += type_fmt
+        return struct.Struct(fmt)
+
+    def write_data(local_num, fmt, values):
+        body.append(local_num)
+        body.extend(fmt.pack(*values))
+
+    start = start_epoch - FIT_EPOCH_OFFSET
+
+    file_id = define(0, 0, [(0, 'enum'), (1, 'uint16'), (2, 'uint16'), (3, 'uint32z'), (4, 'uint32')])
+    write_data(0, file_id, [4, 1, 3121, 12345, start])  # activity file, Garmin
+
+    record = define(1, 20, [(253, 'uint32'), (0, 'sint32'), (1, 'sint32'), (2, 'uint16'), (3, 'uint8'),
+                            (4, 'uint8'), (5, 'uint32'), (6, 'uint16'), (7, 'uint16')])
+    lap = define(2, 19, [(253, 'uint32'), (2, 'uint32'), (7, 'uint32'), (8, 'uint32'), (9, 'uint32'),
+                         (13, 'uint16'), (15, 'uint8'), (23, 'enum'), (24, 'enum')])
+
+    distance = 0.0
+    lat, lng = 40.0, -74.0
+    lap_start, lap_distance = 0, 0.0
+    semicircles = 2**31 / 180.0
+
+    for second in range(duration_seconds):
+        work = (second // interval_seconds) % 2 == 0
+        speed = (3.6 if work else 2.6) + rng.uniform(-0.1, 0.1)
+        distance += speed
+        lat += speed / 111000.0 * 0.7
+        lng += speed / 85000.0 * 0.7
+        altitude = 50 + 20 * math.sin(second / 600.0)
+        heartrate = int(130 + (25 if work else 0) + second / duration_seconds * 10)
+
+        write_data(1, record, [
+            start + second, int(lat * semicircles), int(lng * semicircles), int((altitude + 500) * 5),
+            heartrate, 85, int(distance * 100), int(speed * 1000), 250 if work else 180
+        ])
+
+        if (second + 1) % interval_seconds == 0 or second == duration_seconds - 1:
+            elapsed = second + 1 - lap_start
+            lap_meters = distance - lap_distance
+            write_data(2, lap, [
+                start + second, start + lap_start, elapsed * 1000, elapsed * 1000, int(lap_meters * 100),
+                int(lap_meters / elapsed * 1000), heartrate, 0 if work else 1, 0  # intensity active/rest
+            ])
+            lap_start, lap_distance = second + 1, distance
+
+    session = define(3, 18, [(253, 'uint32'), (2, 'uint32'), (5, 'enum'), (7, 'uint32'), (8, 'uint32'),
+                             (9, 'uint32'), (14, 'uint16'), (16, 'uint8'), (17, 'uint8'), (22, 'uint16'),
+                             (11, 'uint16')])
+    write_data(3, session, [
+        start + duration_seconds, start, 1, duration_seconds * 1000, duration_seconds * 1000,
+        int(distance * 100), int(distance / duration_seconds * 1000), 145, 175, 120, 800
+    ])
+
+    header = struct.pack('<BBHI4s', 14, 0x10, 2093, len(body), b'.FIT')
+    header += struct.pack('<H', fit_parser.fit_crc16(header))
+    content = header + bytes(body)
+    content += struct.pack('<H', fit_parser.fit_crc16(content))
+
+    with open(filepath, 'wb') as f:
+        f.write(content)
+    return len(content)
+
+
+def _run_parser(parser_name):
+    """Return a callable that runs one fit_parser code path on a file"""
+    def upload_legacy(path):
+        # Previous upload route: full-decode validation, then a second full parse
+        is_valid, _ = fit_parser.validate_fit_file(path, full_decode=True)
+        return fit_parser.parse_fit_file(path, comprehensive=True, streaming=True) if is_valid else None
+
+    parsers = {
+        'comprehensive': lambda path: fit_parser.parse_fit_file(path, comprehensive=True),
+        'streaming': lambda path: fit_parser.parse_fit_file(path, comprehensive=True, streaming=True),
+        'selective': lambda path: fit_parser.parse_fit_file(path, message_types=fit_parser.STRAVA_MESSAGE_TYPES),
+        'fast': lambda path: fit_parser.parse_fit_file(path, comprehensive=True, streaming=True, fast=True),
+        'bounded': lambda path: fit_parser.parse_fit_file(path, comprehensive=True, bounded=True),
+        'upload_legacy': upload_legacy,
+        'upload': lambda path: fit_parser.parse_fit_file_validated(
+            path, message_types=fit_parser.STRAVA_MESSAGE_TYPES)[0],
+        'upload_fast': lambda path: fit_parser.parse_fit_file_validated(
+            path, message_types=fit_parser.STRAVA_MESSAGE_TYPES, fast=True)[0]
+    }
+    return parsers[parser_name]
+
+
+def _benchmark_worker(parser_name, filepath, trace_memory, queue):
+    """Child process body: parse once and report time and memory"""
+    parse = _run_parser(parser_name)
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = parse(filepath)
+    elapsed = time.perf_counter() - start
+    traced_peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+
+    queue.put({
+        'ok': result is not None,
+        'seconds': elapsed,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'baseline_rss_kb': baseline_rss,
+        'traced_peak_bytes': traced_peak,
+        # Records decoded (the bounded parser keeps only a decimated gps_track)
+        'points': (result['metadata'].get('record_count') or len(result['strava_format']['gps_track'])
+                   if result else 0)
+    })
+
+
+def run_isolated(parser_name, filepath, trace_memory=False):
+    """Run one parser on one file in a fresh process
+
+    Args:
+        parser_name (str): Name of the code path (see _run_parser)
+        filepath (str): FIT file to parse
+        trace_memory (bool): Also measure the tracemalloc peak (slows parsing down)
+
+    Returns:
+        dict: seconds, peak_rss_kb, baseline_rss_kb, traced_peak_bytes, points, ok
+    """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_benchmark_worker, args=(parser_name, filepath, trace_memory, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def benchmark_file(filepath, parsers=None, repeat=3):
+    """Benchmark parsers on one file (best time of `repeat` runs, memory from a traced run)
+
+    Args:
+        filepath (str): FIT file to parse
+        parsers (list, optional): Parser names, defaults to DEFAULT_PARSERS
+        repeat (int): Timed runs per parser
+
+    Returns:
+        dict: {parser_name: {'seconds', 'peak_rss_mb', 'rss_growth_mb', 'traced_peak_mb', 'points'}}
+    """
+    results = {}
+    for parser_name in parsers or DEFAULT_PARSERS:
+        timed_runs = [run_isolated(parser_name, filepath) for _ in range(repeat)]
+        traced_run = run_isolated(parser_name, filepath, trace_memory=True)
+        best = min(timed_runs, key=lambda run: run['seconds'])
+        results[parser_name] = {
+            'ok': all(run['ok'] for run in timed_runs),
+            'seconds': round(best['seconds'], 3),
+            'peak_rss_mb': round(best['peak_rss_kb'] / 1024, 1),
+            'rss_growth_mb': round((best['peak_rss_kb'] - best['baseline_rss_kb']) / 1024, 1),
+            'traced_peak_mb': round(traced_run['traced_peak_bytes'] / (1024 * 1024), 1),
+            'points': best['points']
+        }
+    return results
+
+
+EXPORT_FORMATS = ['json', 'npz', 'npz_mmap']
+
+
+def benchmark_export(filepath, repeat=3):
+    """Compare export formats: file size, export time and reload time
+
+    Reload time covers everything needed before the data can be used: json.load
+    for JSON, load_columnar (+ reading the heart rate column) for the columnar
+    formats.
+
+    Args:
+        filepath (str): FIT file to parse and export
+        repeat (int): Timed runs per step (best is reported)
+
+    Returns:
+        dict: {format: {'bytes', 'export_seconds', 'load_seconds'}}
+    """
+    data = fit_parser.parse_fit_file(filepath, comprehensive=True, streaming=True)
+    temp_dir = tempfile.mkdtemp(prefix='fit_export_')
+    results = {}
+
+    def load_json(path):
+        with open(path) as f:
+            loaded = json.load(f)
+        return [point.get('heartrate') for point in loaded['strava_format']['gps_track']]
+
+    def load_columnar(path):
+        loaded = fit_parser.load_columnar(path)
+        return float(np.nanmean(loaded['records']['heartrate']))
+
+    try:
+        for export_format in EXPORT_FORMATS:
+            path = os.path.join(temp_dir, 'activity' + ('.json' if export_format == 'json' else '.npz'))
+            export_times, load_times = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fit_parser.export_comprehensive_data(data, path, format=export_format)
+                export_times.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                (load_json if export_format == 'json' else load_columnar)(path)
+                load_times.append(time.perf_counter() - start)
+
+            written = [os.path.join(temp_dir, name) for name in os.listdir(temp_dir)]
+            results[export_format] = {
+                'bytes': sum(os.path.getsize(name) for name in written),
+                'export_seconds': round(min(export_times), 4),
+                'load_seconds': round(min(load_times), 4)
+            }
+            for name in written:
+                os.remove(name)
+    finally:
+        os.rmdir(temp_dir)
+    return results
+
+
+def benchmark_intervals(filepath, repeat=3):
+    """Time interval detection (fit_track.detect_intervals) on each signal of a file's track
+
+    Args:
+        filepath (str): FIT file to parse
+        repeat (int): Timed runs per signal (best is reported)
+
+    Returns:
+        dict: {signal: {'points', 'seconds', 'work', 'blocks'}} for 'watts' and 'speed'
+    """
+    track = fit_parser.parse_fit_file(filepath, streaming=True, fast=True)['strava_format']['gps_track']
+    results = {}
+    for column in ('watts', 'speed'):
+        if not track.has(column) and not (column == 'speed' and track.has('distance')):
+            continue
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            blocks = detect_intervals(track, column)
+            timings.append(time.perf_counter() - start)
+        results[column] = {
+            'points': len(track),
+            'seconds': round(min(timings), 4),
+            'work': sum(1 for block in blocks if block['intensity'] == 'active'),
+            'blocks': len(blocks)
+        }
+    return results
+
+
+def print_intervals_report(filepath, results):
+    """Print interval detection time per signal for one file"""
+    print(f"\n{filepath} interval detection")
+    print(f"  {'signal':<10}{'points':>10}{'time (s)':>10}{'pts/s':>12}{'work':>6}{'blocks':>8}")
+    for column, stats in results.items():
+        print(f"  {column:<10}{stats['points']:>10}{stats['seconds']:>10.4f}"
+              f"{stats['points'] / max(stats['seconds'], 1e-9):>12.0f}{stats['work']:>6}{stats['blocks']:>8}")
+
+
+def print_export_report(filepath, results):
+    """Print an export format comparison table for one file"""
+    fit_size = os.path.getsize(filepath)
+    print(f"\n{filepath} export formats (FIT file: {fit_size / 1024:.0f} KB)")
+    print(f"  {'format':<12}{'size':>12}{'x FIT':>8}{'export (s)':>12}{'load (s)':>10}")
+    for export_format, stats in results.items():
+        print(f"  {export_format:<12}{stats['bytes'] / 1024:>10.0f}KB{stats['bytes'] / fit_size:>8.1f}"
+              f"{stats['export_seconds']:>12.3f}{stats['load_seconds']:>10.4f}")
+
+
+def print_report(filepath, results):
+    """Print a benchmark table for one file"""
+    size_mb = os.path.getsize(filepath) / (1024 * 1024)
+    print(f"\n{filepath} ({size_mb:.1f} MB)")
+    print(f"  {'parser':<16}{'points':>9}{'time (s)':>10}{'pts/s':>10}{'peak RSS':>11}{'RSS growth':>12}{'traced peak':>13}")
+    for parser_name, stats in results.items():
+        points_per_second = stats['points'] / stats['seconds'] if stats['seconds'] else 0
+        print(f"  {parser_name:<16}{stats['points']:>9}{stats['seconds']:>10.3f}{points_per_second:>10.0f}"
+              f"{stats['peak_rss_mb']:>9.1f}MB{stats['rss_growth_mb']:>10.1f}MB{stats['traced_peak_mb']:>11.1f}MB"
+              f"{'' if stats['ok'] else '  FAILED'}")
+
+
+def print_corpus_report(file_results):
+    """Print per-parser totals over every benchmarked file
+
+    Args:
+        file_results (list): benchmark_file results, one per file
+    """
+    print(f"\nCorpus ({len(file_results)} files)")
+    print(f"  {'parser':<16}{'points':>9}{'time (s)':>10}{'pts/s':>10}{'files/s':>9}")
+    for parser_name in file_results[0]:
+        points = sum(results[parser_name]['points'] or 0 for results in file_results)
+        seconds = sum(results[parser_name]['seconds'] for results in file_results)
+        print(f"  {parser_name:<16}{points:>9}{seconds:>10.3f}{points / seconds if seconds else 0:>10.0f}"
+              f"{len(file_results) / seconds if seconds else 0:>9.1f}")
+
+
+def expand_corpus(paths):
+    """FIT files from a list of files and directories (directories are searched recursively)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith('.fit'))
+        else:
+            files.append(path)
+    return files
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description='Benchmark fit_parser parse time and peak memory')
+    arg_parser.add_argument('files', nargs='*', help='FIT files or directories of FIT files to benchmark')
+    arg_parser.add_argument('--synthetic-hours', type=float, default=None,
+                            help='Also generate and benchmark a synthetic 1 Hz file of this many hours')
+    arg_parser.add_argument('--parsers', default=','.join(DEFAULT_PARSERS),
+                            help=f"Comma-separated parsers to compare ({', '.join(ALL_PARSERS)})")
+    arg_parser.add_argument('--repeat', type=int, default=3, help='Timed runs per parser (best is reported)')
+    arg_parser.add_argument('--intervals', action='store_true',
+                            help='Also time interval detection (detect_intervals) on the power and speed streams')
+    arg_parser.add_argument('--export', action='store_true',
+                            help=f"Also compare export formats ({', '.join(EXPORT_FORMATS)}): size, export and load time")
+    args = arg_parser.parse_args()
+
+    files = expand_corpus(args.files)
+    temp_dir = None
+    if args.synthetic_hours:
+        temp_dir = tempfile.mkdtemp(prefix='fit_benchmark_')
+        synthetic_path = os.path.join(temp_dir, f"synthetic_{args.synthetic_hours:g}h.fit")
+        write_synthetic_fit(synthetic_path, duration_seconds=int(args.synthetic_hours * 3600))
+        files.append(synthetic_path)
+
+    if not files:
+        arg_parser.print_help()
+        sys.exit(1)
+
+    parsers = [name for name in args.parsers.split(',') if name]
+    try:
+        file_results = []
+        for filepath in files:
+            file_results.append(benchmark_file(filepath, parsers, repeat=args.repeat))
+            print_report(filepath, file_results[-1])
+            if args.intervals:
+                print_intervals_report(filepath, benchmark_intervals(filepath, repeat=args.repeat))
+            if args.export:
+                print_export_report(filepath, benchmark_export(filepath, repeat=args.repeat))
+        if len(file_results) > 1:
+            print_corpus_report(file_results)
+    finally:
+        if temp_dir:
+            for name in os.listdir(temp_dir):
+                os.remove(os.path.join(temp_dir, name))
+            os.rmdir(temp_dir)
@@ -0,0 +1,246 @@
+"""
+Content-Hash Cache of Parsed FIT Results
+
+Re-uploading the same FIT file (after a failed analysis, or to try another
+model) used to repeat the whole decode. FitResultCache stores each parse
+result under the SHA-256 of the file bytes, so a repeat upload is a file read
+instead of a parse.
+
+FORMAT:
+=======
+One uncompressed .npz file per entry (<cache_dir>/<sha256>.npz):
+
+    track_<column>   float64 track columns (fit_track.Track)
+    summary          UTF-8 JSON of strava_format (minus gps_track) and metadata,
+                     without per-upload fields (activity id, file name, parse time)
+
+Entries load in a few milliseconds (no decompression, no per-point objects).
+
+EVICTION:
+=========
+The cache is bounded by total size on disk (`max_bytes`). Hits refresh the
+entry's modification time and the least recently used entries are deleted
+when a write pushes the cache over the limit. The directory may be shared by
+several worker processes; each keeps its own size index and re-scans the
+directory when evicting.
+
+USAGE:
+======
+    cache = FitResultCache('fit_cache', max_bytes=256 * 1024 * 1024)
+
+    content_hash = hash_fit_source(upload_stream)   # stream is rewound afterwards
+    data = cache.get(content_hash)
+    if data is None:
+        data, error = parse_fit_file_validated(upload_stream)
+        if data:
+            cache.put(content_hash, data)
+
+    cache.get_stats()   # {'hits', 'misses', 'writes', 'evictions', 'entries', 'bytes', ...}
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from fit_track import Track
+
+CACHE_SUFFIX = '.npz'
+HASH_CHUNK_SIZE = 1024 * 1024
+# Per-upload identity, never shared between uploads of the same file: dropped on put,
+# and every hit gets a fresh activity id
+PER_UPLOAD_STRAVA_FIELDS = ('id',)
+PER_UPLOAD_METADATA_FIELDS = ('file_path', 'parsed_at', 'parse_seconds')
+
+
+def hash_fit_source(source):
+    """SHA-256 hex digest of a FIT file given as a path, bytes-like object or seekable stream
+
+    Streams are read in chunks and rewound to where they started.
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    else:
+        start = source.tell()
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+        source.seek(start)
+    return digest.hexdigest()
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+class FitResultCache:
+    """Size-bounded on-disk cache of parsed FIT results keyed by file SHA-256"""
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024):
+        """
+        Args:
+            cache_dir (str): Cache directory (created if missing)
+            max_bytes (int): Max total size of cached entries (0 = caching disabled)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes = {}
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0, 'errors': 0}
+
+        if self.max_bytes:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._sizes = self._scan()
+
+    def _path(self, content_hash):
+        if not content_hash or not all(c in '0123456789abcdef' for c in content_hash):
+            raise ValueError(f"Invalid content hash: {content_hash!r}")
+        return os.path.join(self.cache_dir, content_hash + CACHE_SUFFIX)
+
+    def _scan(self):
+        """{content_hash: (size, mtime)} for the entries currently on disk"""
+        entries = {}
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(CACHE_SUFFIX):
+                stat = entry.stat()
+                entries[entry.name[:-len(CACHE_SUFFIX)]] = (stat.st_size, stat.st_mtime)
+        return entries
+
+    def get(self, content_hash):
+        """Return a cached result or None
+
+        Returns:
+            dict or None: {'strava_format': {...}, 'metadata': {...}, 'raw_data': {}}
+                          with strava_format['gps_track'] as a Track and a new
+                          strava_format['id'] (fit_<uuid>) on every hit
+        """
+        if not self.max_bytes:
+            return None
+        path = self._path(content_hash)
+        try:
+            with np.load(path) as entry:
+                summary = json.loads(entry['summary'].tobytes().decode('utf-8'))
+                track = Track(**{name[len('track_'):]: entry[name]
+                                 for name in entry.files if name.startswith('track_')})
+            os.utime(path)  # LRU: a hit makes the entry the most recently used
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            # Truncated or corrupt entry: drop it and parse again
+            print(f"[FIT Cache] Discarding unreadable entry {content_hash[:16]}: {e}")
+            self._remove(content_hash)
+            self._count('misses')
+            return None
+
+        self._count('hits')
+        summary['strava_format']['gps_track'] = track
+        summary['strava_format']['id'] = f"fit_{uuid.uuid4().hex}"
+        return {'strava_format': summary['strava_format'], 'metadata': summary.get('metadata', {}), 'raw_data': {}}
+
+    def put(self, content_hash, comprehensive_data):
+        """Store a parse result (the output of fit_parser.parse_fit_file_validated)
+
+        Args:
+            content_hash (str): SHA-256 hex digest of the FIT file
+            comprehensive_data (dict): Parse result with strava_format (and metadata)
+
+        Returns:
+            bool: True if the entry was written
+        """
+        if not self.max_bytes or not comprehensive_data:
+            return False
+
+        strava_format = comprehensive_data['strava_format']
+        track = strava_format.get('gps_track')
+        if not isinstance(track, Track):
+            track = Track.from_dicts(track or [])
+        summary = {
+            'strava_format': {key: value for key, value in strava_format.items()
+                              if key != 'gps_track' and key not in PER_UPLOAD_STRAVA_FIELDS},
+            'metadata': {key: value for key, value in comprehensive_data.get('metadata', {}).items()
+                         if key not in PER_UPLOAD_METADATA_FIELDS}
+        }
+        summary_bytes = json.dumps(summary, default=_json_default).encode('utf-8')
+
+        path = self._path(content_hash)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                np.savez(f, summary=np.frombuffer(summary_bytes, dtype=np.uint8),
+                         **{f"track_{name}": values for name, values in track.columns.items()})
+            size = os.path.getsize(temp_path)
+            if size > self.max_bytes:
+                os.remove(temp_path)
+                return False
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"[FIT Cache] Could not write entry {content_hash[:16]}: {e}")
+            self._count('errors')
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+        with self._lock:
+            self._sizes[content_hash] = (size, time.time())
+            self.stats['writes'] += 1
+            over_limit = sum(entry_size for entry_size, _ in self._sizes.values()) > self.max_bytes
+        if over_limit:
+            self._evict()
+        return True
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            # Other processes may have added or removed entries since our last scan
+            self._sizes = self._scan()
+            total = sum(size for size, _ in self._sizes.values())
+            for content_hash, (size, _) in sorted(self._sizes.items(), key=lambda item: item[1][1]):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(self._path(content_hash))
+                except FileNotFoundError:
+                    pass
+                del self._sizes[content_hash]
+                total -= size
+                self.stats['evictions'] += 1
+
+    def _remove(self, content_hash):
+        try:
+            os.remove(self._path(content_hash))
+        except OSError:
+            pass
+        with self._lock:
+            self._sizes.pop(content_hash, None)
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def clear(self):
+        """Delete every cached entry"""
+        if not self.max_bytes:
+            return
+        for content_hash in list(self._scan()):
+            self._remove(content_hash)
+
+    def get_stats(self):
+        """Return JSON-serializable cache counters and current size"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._sizes)
+            stats['bytes'] = sum(size for size, _ in self._sizes.values())
+        stats['max_bytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else None
+        return stats
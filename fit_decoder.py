@@ -0,0 +1,366 @@
+"""
+Fast FIT Record Decoder
+
+fitparse decodes every field of every message in pure Python, building a
+FieldData object per field. Record messages (one per second of activity) are
+almost the whole file, so that per-field work dominates parse time.
+
+This decoder walks the raw message stream once and only does per-message work
+that is unavoidable (reading the header byte, tracking definitions and the
+compressed-timestamp state). Each record definition is compiled once into a
+NumPy structured dtype (the equivalent of a struct.Struct for a whole
+message); all record messages that use it are then unpacked in bulk into
+columns, with invalid-value masking, scale and offset applied vectorized.
+
+Everything that is not a record message (file_id, session, lap, event, ...)
+is copied, with its definitions, into a small FIT file of its own that
+fitparse decodes as usual, so those messages keep fitparse's exact output.
+
+Files using features the decoder does not handle (chained FIT files,
+compressed-timestamp headers on non-record messages, "system time"
+timestamps, record fields such as compressed_speed_distance that fitparse
+expands into speed / distance) raise UnsupportedFitFeature; callers fall back
+to fitparse.
+
+USAGE:
+======
+    from fit_decoder import decode_fit_records, UnsupportedFitFeature
+
+    try:
+        records, record_count, other_fit = decode_fit_records(fit_bytes)
+        # records: {'time': ndarray, 'heartrate': ndarray, ...} (same as RecordColumnBuilder)
+        # other_fit: bytes of a valid FIT file with every non-record message
+    except UnsupportedFitFeature:
+        ...  # decode with fitparse instead
+
+    # Bounded memory: at most chunk_records records decoded at a time
+    other = bytearray()
+    for chunk in iter_record_chunks(fit_bytes, chunk_records=65536, other_messages=other):
+        ...
+    other_fit = pack_fit_messages(fit_bytes, other)
+
+In fit_parser: parse_fit_file(path, streaming=True, fast=True)
+"""
+import struct
+
+import numpy as np
+from fitparse.profile import MESSAGE_TYPES
+
+from fit_parser import FIT_EPOCH_OFFSET, GPS_FIELD_MAP, SEMICIRCLES_TO_DEGREES, SYSTEM_TIME_LIMIT, fit_crc16
+from fit_track import TRACK_COLUMNS
+
+RECORD_MESG_NUM = 20
+TIMESTAMP_FIELD_NUM = 253
+
+# FIT base type byte -> (NumPy type code, struct code, invalid value)
+BASE_TYPES = {
+    0x00: ('u1', 'B', 0xFF),                # enum
+    0x01: ('i1', 'b', 0x7F),                # sint8
+    0x02: ('u1', 'B', 0xFF),                # uint8
+    0x83: ('i2', 'h', 0x7FFF),              # sint16
+    0x84: ('u2', 'H', 0xFFFF),              # uint16
+    0x85: ('i4', 'i', 0x7FFFFFFF),          # sint32
+    0x86: ('u4', 'I', 0xFFFFFFFF),          # uint32
+    0x0A: ('u1', 'B', 0x00),                # uint8z
+    0x8B: ('u2', 'H', 0x0000),              # uint16z
+    0x8C: ('u4', 'I', 0x00000000),          # uint32z
+    0x8E: ('i8', 'q', 0x7FFFFFFFFFFFFFFF),  # sint64
+    0x8F: ('u8', 'Q', 0xFFFFFFFFFFFFFFFF),  # uint64
+    0x90: ('u8', 'Q', 0x0000000000000000),  # uint64z
+}
+
+_RECORD_FIELDS = {num: field for num, field in MESSAGE_TYPES[RECORD_MESG_NUM].fields.items()
+                  if field.name in GPS_FIELD_MAP}
+# Other record fields that fitparse expands into track fields (e.g. 8 compressed_speed_distance
+# -> speed, distance); the decoder does not expand components
+_COMPONENT_RECORD_FIELDS = {
+    num for num, field in MESSAGE_TYPES[RECORD_MESG_NUM].fields.items()
+    if num not in _RECORD_FIELDS and any(
+        component.name in GPS_FIELD_MAP
+        for owner in [field] + list(field.subfields or [])
+        for component in (owner.components or [])
+    )
+}
+_HEADER = struct.Struct('<BBHI4s')
+
+
+class UnsupportedFitFeature(Exception):
+    """The file uses a FIT feature the fast decoder does not implement (use fitparse)"""
+
+
+class _Definition:
+    """One local message definition, compiled for bulk decoding"""
+
+    __slots__ = ('mesg_num', 'size', 'timestamp', 'dtype', 'fields', 'offsets', 'ordinals')
+
+    def __init__(self, mesg_num, endian, field_defs, dev_size):
+        self.mesg_num = mesg_num
+        self.size = sum(size for _, size, _ in field_defs) + dev_size
+        self.timestamp = None  # struct.Struct reading the timestamp field (and its offset)
+        self.dtype = None
+        self.fields = []       # (dtype field name, profile field, invalid value)
+        self.offsets = []      # Start of each data message using this definition (record only)
+        self.ordinals = []     # Record number of each of those messages
+
+        names, formats, offsets = [], [], []
+        offset = 0
+        for field_num, size, base_type in field_defs:
+            type_code, struct_code, invalid = BASE_TYPES.get(base_type, (None, None, None))
+            is_single_value = type_code is not None and size == int(type_code[1])
+
+            if field_num == TIMESTAMP_FIELD_NUM and is_single_value:
+                self.timestamp = (struct.Struct(endian + struct_code), offset, invalid)
+
+            if mesg_num == RECORD_MESG_NUM and field_num in _COMPONENT_RECORD_FIELDS:
+                name = MESSAGE_TYPES[RECORD_MESG_NUM].fields[field_num].name
+                raise UnsupportedFitFeature(f"record field {field_num} ({name}) with components")
+            if mesg_num == RECORD_MESG_NUM and field_num in _RECORD_FIELDS:
+                if type_code is None:
+                    raise UnsupportedFitFeature(f"record field {field_num} with base type 0x{base_type:02X}")
+                # Array fields decode to tuples in fitparse, which the track ignores too
+                if is_single_value:
+                    name = f"f{field_num}"
+                    names.append(name)
+                    formats.append(endian + type_code)
+                    offsets.append(offset)
+                    self.fields.append((name, _RECORD_FIELDS[field_num], invalid))
+            offset += size
+
+        if mesg_num == RECORD_MESG_NUM:
+            self.dtype = np.dtype({'names': names, 'formats': formats, 'offsets': offsets,
+                                   'itemsize': max(self.size, 1)})
+
+
+def _parse_definition(data, pos):
+    """Parse a definition message at `pos` (the header byte); returns (_Definition, end position)"""
+    header = data[pos]
+    endian = '>' if data[pos + 2] else '<'
+    mesg_num = int.from_bytes(data[pos + 3:pos + 5], 'big' if endian == '>' else 'little')
+    field_count = data[pos + 5]
+    end = pos + 6 + field_count * 3
+    field_defs = [(data[i], data[i + 1], data[i + 2]) for i in range(pos + 6, end, 3)]
+
+    dev_size = 0
+    if header & 0x20:  # Developer data fields: only their sizes matter here
+        dev_count = data[end]
+        dev_end = end + 1 + dev_count * 3
+        dev_size = sum(data[i + 1] for i in range(end + 1, dev_end, 3))
+        end = dev_end
+    return _Definition(mesg_num, endian, field_defs, dev_size), end
+
+
+def _accumulate_timestamp(time_offset, last_timestamp):
+    """FIT compressed timestamp: 5-bit offset rolled over onto the last full timestamp"""
+    timestamp = time_offset + (last_timestamp & ~0x1F)
+    if time_offset < (last_timestamp & 0x1F):
+        timestamp += 0x20
+    return timestamp
+
+
+def decode_fit_records(data, check_crc=True):
+    """Decode a FIT file's record messages into columns and split off everything else
+
+    Args:
+        data (bytes): Whole FIT file
+        check_crc (bool): Verify the header and file CRCs (fitparse does the same)
+
+    Returns:
+        tuple: (records, record_count, other_fit)
+               records: {column: float64 ndarray} like RecordColumnBuilder.to_numpy()
+               other_fit: bytes of a FIT file with all non-record messages
+
+    Raises:
+        ValueError: Malformed or corrupt file
+        UnsupportedFitFeature: File needs fitparse
+    """
+    other = bytearray()
+    records = next(iter_record_chunks(data, check_crc=check_crc, other_messages=other))
+    return records, len(records['time']), pack_fit_messages(data, other)
+
+
+def iter_record_chunks(data, chunk_records=None, check_crc=True, other_messages=None):
+    """Decode record messages in chunks of at most `chunk_records` records
+
+    Only one chunk of columns (and of message offsets) exists at a time, so
+    memory beyond the file bytes stays bounded however many records the file
+    has. Chunks have the same shape as RecordColumnBuilder.to_numpy() (a
+    column missing from one chunk may exist in another).
+
+    Args:
+        data (bytes): Whole FIT file
+        chunk_records (int, optional): Records per chunk (default: everything in one chunk)
+        check_crc (bool): Verify the header and file CRCs before decoding
+        other_messages (bytearray, optional): Receives the raw bytes of every non-record
+                                              message and definition (see pack_fit_messages)
+
+    Yields:
+        dict: {column: float64 ndarray} per chunk; always at least one (possibly empty) chunk
+
+    Raises:
+        ValueError: Malformed or corrupt file
+        UnsupportedFitFeature: File needs fitparse (may be raised after earlier chunks)
+    """
+    data = bytes(data)
+    if len(data) < 12:
+        raise ValueError("File is too small to be a FIT file")
+    header_size = data[0]
+    if header_size not in (12, 14) or data[8:12] != b'.FIT':
+        raise ValueError("Invalid FIT file header")
+    data_size = int.from_bytes(data[4:8], 'little')
+    end = header_size + data_size
+    if len(data) < end + 2:
+        raise ValueError("FIT file is truncated")
+    if len(data) > end + 2:
+        raise UnsupportedFitFeature("chained FIT files")
+    if check_crc:
+        if header_size == 14:
+            header_crc = int.from_bytes(data[12:14], 'little')
+            if header_crc and header_crc != fit_crc16(data[:12]):
+                raise ValueError("FIT header CRC mismatch")
+        if int.from_bytes(data[end:end + 2], 'little') != fit_crc16(memoryview(data)[:end]):
+            raise ValueError("FIT file CRC mismatch")
+
+    other = other_messages if other_messages is not None else bytearray()
+    definitions = {}
+    record_definitions = []
+    header_times = {}  # record number in the chunk -> timestamp from a compressed-timestamp header
+    last_timestamp = 0
+    chunk_count = 0
+    pos = header_size
+
+    while pos < end:
+        header = data[pos]
+
+        if header & 0x80:  # Compressed-timestamp data message
+            definition = definitions.get((header >> 5) & 0x03)
+            time_offset = header & 0x1F
+        elif header & 0x40:  # Definition message
+            definition, next_pos = _parse_definition(data, pos)
+            definitions[header & 0x0F] = definition
+            if definition.mesg_num == RECORD_MESG_NUM:
+                record_definitions.append(definition)
+            else:
+                other += data[pos:next_pos]
+            pos = next_pos
+            continue
+        else:
+            definition = definitions.get(header & 0x0F)
+            time_offset = None
+
+        if definition is None:
+            raise ValueError(f"Data message with undefined local message type at byte {pos}")
+        next_pos = pos + 1 + definition.size
+        if next_pos > end:
+            raise ValueError("FIT data message runs past the end of the file")
+
+        if definition.timestamp is not None:
+            reader, offset, invalid = definition.timestamp
+            value = reader.unpack_from(data, pos + 1 + offset)[0]
+            if value != invalid:
+                last_timestamp = value
+
+        if definition.mesg_num == RECORD_MESG_NUM:
+            if time_offset is not None:
+                last_timestamp = _accumulate_timestamp(time_offset, last_timestamp)
+                header_times[chunk_count] = last_timestamp
+            definition.offsets.append(pos + 1)
+            definition.ordinals.append(chunk_count)
+            chunk_count += 1
+            if chunk_records and chunk_count >= chunk_records:
+                yield _decode_record_columns(data, record_definitions, chunk_count, header_times)
+                # Start the next chunk with only the definitions still in use
+                for record_definition in record_definitions:
+                    record_definition.offsets.clear()
+                    record_definition.ordinals.clear()
+                record_definitions = [item for item in definitions.values() if item.mesg_num == RECORD_MESG_NUM]
+                header_times = {}
+                chunk_count = 0
+        elif time_offset is not None:
+            raise UnsupportedFitFeature("compressed timestamps on non-record messages")
+        else:
+            other += data[pos:next_pos]
+        pos = next_pos
+
+    if chunk_count or not chunk_records:
+        yield _decode_record_columns(data, record_definitions, chunk_count, header_times)
+
+
+def pack_fit_messages(data, messages):
+    """Wrap raw definition/data message bytes in a FIT header and CRC
+
+    Args:
+        data (bytes): Original FIT file (protocol and profile versions are copied from it)
+        messages (bytes): Message bytes collected by iter_record_chunks(other_messages=...)
+
+    Returns:
+        bytes: A complete FIT file fitparse can decode
+    """
+    header = _HEADER.pack(14, data[1], int.from_bytes(data[2:4], 'little'), len(messages), b'.FIT')
+    header += fit_crc16(header).to_bytes(2, 'little')
+    fit_bytes = header + bytes(messages)
+    return fit_bytes + fit_crc16(fit_bytes).to_bytes(2, 'little')
+
+
+def _decode_record_columns(data, record_definitions, record_count, header_times):
+    """Bulk-decode the record messages of every record definition into track columns"""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    columns = {}
+    enhanced = {}
+
+    for definition in record_definitions:
+        if not definition.offsets:
+            continue
+        starts = np.asarray(definition.offsets, dtype=np.int64)
+        ordinals = np.asarray(definition.ordinals, dtype=np.int64)
+        # Gather every message's bytes into one (messages x size) block, then view it as structs
+        block = buffer[starts[:, None] + np.arange(definition.dtype.itemsize)]
+        messages = np.ascontiguousarray(block).view(definition.dtype).ravel()
+
+        for name, field, invalid in definition.fields:
+            raw = messages[name]
+            values = raw.astype(np.float64)
+            values[raw == invalid] = np.nan
+
+            if field.name == 'timestamp':
+                valid = values[~np.isnan(values)]
+                if valid.size and valid.min() < SYSTEM_TIME_LIMIT:
+                    raise UnsupportedFitFeature("device-relative (system time) timestamps")
+                values += FIT_EPOCH_OFFSET
+            elif field.name in ('position_lat', 'position_long'):
+                values *= SEMICIRCLES_TO_DEGREES
+            else:
+                if field.scale:
+                    values /= field.scale
+                if field.offset:
+                    values -= field.offset
+
+            column = GPS_FIELD_MAP[field.name]
+            target = enhanced if field.name.startswith('enhanced_') else columns
+            if column not in target:
+                target[column] = np.full(record_count, np.nan)
+            target[column][ordinals] = values
+
+    # enhanced_* values win wherever they exist
+    for column, values in enhanced.items():
+        base = columns.setdefault(column, np.full(record_count, np.nan))
+        has_enhanced = ~np.isnan(values)
+        base[has_enhanced] = values[has_enhanced]
+
+    if header_times:
+        if min(header_times.values()) < SYSTEM_TIME_LIMIT:
+            raise UnsupportedFitFeature("device-relative (system time) timestamps")
+        times = columns.setdefault('time', np.full(record_count, np.nan))
+        ordinals = np.fromiter(header_times.keys(), dtype=np.int64, count=len(header_times))
+        stamps = np.fromiter(header_times.values(), dtype=np.float64, count=len(header_times))
+        missing = np.isnan(times[ordinals])
+        times[ordinals[missing]] = stamps[missing] + FIT_EPOCH_OFFSET
+
+    # Same shape as RecordColumnBuilder.to_numpy(): time always, other columns only with data
+    records = {}
+    for column in TRACK_COLUMNS:
+        values = columns.get(column)
+        if column == 'time' and values is None:
+            values = np.full(record_count, np.nan)
+        if values is not None and (column == 'time' or not np.isnan(values).all()):
+            records[column] = values
+    return records
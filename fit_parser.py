@@ -31,14 +31,55 @@ Comprehensive Mode (all data preserved):
     #     'metadata': {...}        # File metadata
     # }
 
+Streaming Mode (single pass, record streams as columns - far less memory):
+    data = parse_fit_file('activity.fit', comprehensive=True, streaming=True)
+    # Same structure, plus data['records'] = {'time': ndarray, 'heartrate': ndarray, ...}
+    # (raw_data['record'] is left empty)
+
+Selective Mode (only the message types/fields you need - fastest, used for uploads):
+    data = parse_fit_file('activity.fit', message_types=STRAVA_MESSAGE_TYPES)
+    data = parse_fit_file('activity.fit', message_types=['session', 'lap'],
+                          fields={'lap': ['start_time', 'total_distance', 'avg_heart_rate']})
+    # Skipped types are decoded on first access: data['raw_data']['hrv'] re-reads the file once
+
+Fast Record Decoder (records unpacked in bulk with NumPy, see fit_decoder.py):
+    data = parse_fit_file('activity.fit', streaming=True, fast=True)
+    # Same output; falls back to fitparse for files the decoder does not support
+
+Bounded Memory (multi-day ultras; records aggregated in chunks, see fit_stream.py):
+    data = parse_fit_file('ultra.fit', bounded=True)
+    # Exact splits, best efforts, elevation and time in zones; gps_track is decimated to
+    # <= BOUNDED_TRACK_POINTS points (data['metadata']['track_stride'])
+
+In-Memory Sources (no temp file needed):
+    data = parse_fit_file(fit_bytes)                        # bytes / bytearray / memoryview
+    data, error = parse_fit_file_validated(spool_fit_stream(upload.stream), filename=upload.filename)
+
 Export Full Data:
     data = parse_fit_file('activity.fit', comprehensive=True)
     export_comprehensive_data(data, 'activity_full.json')
 
+Columnar Export / Reload:
+    export_comprehensive_data(data, 'activity.npz', format='npz')   # or export_columnar(...)
+    data = load_columnar('activity.npz')   # sidecar parsed, record columns read on first access
+    data['records']['heartrate']           # ndarray (memory-mapped for format='npz_mmap')
+
 Extract Specific Data:
     laps = get_all_lap_data(data)
-    intervals = get_interval_data(data)
+    intervals = get_interval_data(data)   # detected work blocks when the file only has auto laps
     gps_track = get_gps_track(data)
+    # gps_track is a columnar fit_track.Track: gps_track.heartrate is an ndarray,
+    # len(gps_track) is the point count, gps_track.to_dicts() gives per-point dicts
+
+Downsampled Track (fixed size, for charts and LLM context):
+    preview = data['strava_format']['gps_track_summary']   # or downsample_track(gps_track)
+    preview['series']['heartrate']    # [[elapsed_min, bpm], ...] (LTTB, <= 60 points)
+    preview['route']                  # [[lat, lng], ...] (Douglas-Peucker, <= 40 points)
+
+Time in Zones (from the file's hr_zone / power_zone messages):
+    data['strava_format']['time_in_zones']             # {'heart_rate': [seconds per zone], 'power': [...]}
+    data['strava_format']['laps'][0]['time_in_zones']  # same, per lap
+    apply_athlete_zones(data['strava_format'], zones_from_bounds([130, 145, 160, 175]))  # files without zones
 
 Command Line:
     # Standard mode
@@ -47,6 +88,24 @@ Command Line:
     # Comprehensive mode with export
     python fit_parser.py activity.fit --comprehensive --export
 
+    # Columnar export (npz arrays + small JSON sidecar; several times smaller, fast to reload)
+    python fit_parser.py activity.fit --comprehensive --streaming --export npz
+
+    # Comprehensive mode using the streaming (columnar) decoder
+    python fit_parser.py activity.fit --comprehensive --streaming
+
+    # ...with record messages unpacked by the bulk decoder (fit_decoder.py)
+    python fit_parser.py activity.fit --comprehensive --fast
+
+    # Bounded-memory mode, prints peak RSS
+    python fit_parser.py ultra.fit --comprehensive --bounded
+
+    # Batch: parse many files in parallel, one NDJSON summary line per file on stdout,
+    # files/s, records/s and p50/p95 per-file time on stderr
+    python fit_parser.py --batch 'exports/**/*.fit' more/ --workers 8 > summaries.ndjson
+
+    # Parse time / peak memory of both decoders: see fit_benchmark.py
+
 IMPROVEMENTS OVER PREVIOUS VERSION:
 ====================================
 1. NO DATA LOSS: All FIT message types are captured and preserved
@@ -61,9 +120,454 @@ IMPROVEMENTS OVER PREVIOUS VERSION:
 10. BACKWARD COMPATIBLE: Existing code continues to work unchanged
 """
 from fitparse import FitFile
+from fitparse.profile import FIELD_TYPE_TIMESTAMP
+from fitparse.records import add_dev_data_id, add_dev_field_description
 from datetime import datetime, timedelta
+from array import array
+from collections.abc import Mapping
+from contextlib import contextmanager
+import io
 import os
 import json
+import struct
+import sys
+import zipfile
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from fit_track import (Track, TRACK_COLUMNS, MAX_SAMPLE_GAP_SECONDS, compute_best_efforts, compute_mean_max,
+                       compute_splits, compute_time_in_zones, detect_intervals, douglas_peucker_indices,
+                       epoch_to_iso, has_structured_laps, lttb_indices)
+
+# FIT record field -> GPS track column (enhanced_* fields win over the plain ones)
+GPS_FIELD_MAP = {
+    'timestamp': 'time',
+    'position_lat': 'lat',
+    'position_long': 'lng',
+    'altitude': 'altitude',
+    'enhanced_altitude': 'altitude',
+    'distance': 'distance',
+    'speed': 'speed',
+    'enhanced_speed': 'speed',
+    'heart_rate': 'heartrate',
+    'cadence': 'cadence',
+    'power': 'watts',
+    'temperature': 'temp',
+    'grade': 'grade'
+}
+
+SEMICIRCLES_TO_DEGREES = 180.0 / 2**31
+FIT_EPOCH_OFFSET = 631065600  # Seconds between the Unix epoch and the FIT epoch (1989-12-31)
+SYSTEM_TIME_LIMIT = 0x10000000  # Smaller date_time values are device-relative, not UTC
+MAX_FIT_FILE_SIZE = 50 * 1024 * 1024  # 50 MB
+FIT_SPOOL_THRESHOLD = 8 * 1024 * 1024  # Non-seekable upload streams larger than this spool to disk
+FIT_SIGNATURE = b'.FIT'
+COLUMNAR_SIDECAR_SUFFIX = '.sidecar.json'  # export_columnar: <name>.npz + <name>.sidecar.json
+TRACK_PREVIEW_POINTS = 60  # downsample_track: points per time series (HR, pace, power)
+ROUTE_PREVIEW_POINTS = 40  # downsample_track: points in the simplified route
+METERS_PER_MILE = 1609.34
+BOUNDED_TRACK_POINTS = 10000  # parse_fit_file_bounded: max points kept in the decimated track
+BOUNDED_CHUNK_RECORDS = 65536  # parse_fit_file_bounded: records decoded and aggregated at a time
+
+# FIT CRC-16 nibble table (FIT SDK) expanded to a 256-entry byte table
+_CRC_NIBBLE_TABLE = [
+    0x0000, 0xCC01, 0xD801, 0x1400, 0xF001, 0x3C00, 0x2800, 0xE401,
+    0xA001, 0x6C00, 0x7800, 0xB401, 0x5000, 0x9C01, 0x8801, 0x4400
+]
+
+
+def _nibble_crc(crc, byte):
+    for nibble in (byte & 0xF, (byte >> 4) & 0xF):
+        tmp = _CRC_NIBBLE_TABLE[crc & 0xF]
+        crc = ((crc >> 4) & 0x0FFF) ^ tmp ^ _CRC_NIBBLE_TABLE[nibble]
+    return crc
+
+
+_CRC_BYTE_TABLE = [_nibble_crc(0, byte) for byte in range(256)]
+_CRC_BYTE_ARRAY = np.array(_CRC_BYTE_TABLE, dtype=np.uint16)
+CRC_VECTOR_MIN_BYTES = 4096  # fit_crc16: inputs from this size use the NumPy lane CRC
+CRC_LANE_BYTES = 32  # fit_crc16: target bytes per lane of the NumPy lane CRC
+UNIX_EPOCH = datetime(1970, 1, 1)
+
+# Message types kept in raw_data (anything else goes to 'other_messages')
+RAW_MESSAGE_TYPES = [
+    'file_id', 'file_creator', 'device_info', 'session', 'lap', 'record', 'event', 'hrv',
+    'segment', 'length', 'hr_zone', 'power_zone', 'sport', 'workout', 'workout_step',
+    'activity', 'climb_pro', 'developer_data', 'field_description'
+]
+
+# Message types _generate_strava_format (and so the web app) actually reads
+STRAVA_MESSAGE_TYPES = [
+    'file_id', 'device_info', 'session', 'lap', 'record', 'segment', 'hr_zone', 'power_zone'
+]
+
+
+@contextmanager
+def _open_fit_source(source):
+    """Open a FIT source as a seekable binary file object positioned at the start
+
+    Args:
+        source: File path, bytes / bytearray / memoryview with the file contents,
+                or a seekable binary file-like object (e.g. an upload stream)
+
+    Yields:
+        file-like: Binary file object (closed on exit only if opened here; note that
+                   fitparse itself closes a stream after decoding it to the end)
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield f
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    elif hasattr(source, 'read') and hasattr(source, 'seek'):
+        source.seek(0)
+        try:
+            yield source
+        finally:
+            # fitparse closes the stream once it has decoded the whole file
+            if not source.closed:
+                source.seek(0)
+    else:
+        raise TypeError(f"Unsupported FIT source type: {type(source).__name__}")
+
+
+def _source_name(source):
+    """Describe a FIT source for metadata (path, file object name or '<bytes>')"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return '<bytes>'
+    name = getattr(source, 'filename', None) or getattr(source, 'name', None)
+    return name if isinstance(name, str) else '<stream>'
+
+
+def _source_size(f):
+    """Size in bytes of a seekable file object (position is restored)"""
+    position = f.tell()
+    size = f.seek(0, os.SEEK_END)
+    f.seek(position)
+    return size
+
+
+def spool_fit_stream(stream, spool_threshold=FIT_SPOOL_THRESHOLD):
+    """Make an upload stream parseable without saving it to the uploads folder
+
+    Seekable streams (BytesIO, or the temp file Werkzeug already spools large
+    request bodies to) are returned as-is. Anything else is copied into a
+    SpooledTemporaryFile that stays in memory up to `spool_threshold` bytes and
+    only rolls over to an anonymous temp file (deleted on close) above it.
+
+    Args:
+        stream: Binary file-like object (e.g. werkzeug FileStorage.stream)
+        spool_threshold (int): Max bytes kept in memory for non-seekable streams
+
+    Returns:
+        file-like: Seekable binary file object
+    """
+    try:
+        if stream.seekable():
+            stream.seek(0)
+            return stream
+    except (AttributeError, OSError, ValueError):
+        pass
+
+    spooled = tempfile.SpooledTemporaryFile(max_size=spool_threshold, mode='w+b')
+    shutil.copyfileobj(stream, spooled, 1024 * 1024)
+    spooled.seek(0)
+    return spooled
+
+
+def _empty_raw_data():
+    """Empty raw_data structure with one list per known message type"""
+    raw_data = {message_type: [] for message_type in RAW_MESSAGE_TYPES}
+    raw_data['other_messages'] = {}
+    return raw_data
+
+
+def _serialize_field_value(field_value):
+    """Convert a fitparse field value to a JSON-serializable value"""
+    # Convert datetime objects to ISO format strings
+    if isinstance(field_value, datetime):
+        return field_value.isoformat()
+
+    # Handle other non-serializable types
+    if not isinstance(field_value, (str, int, float, bool, list, dict, type(None))):
+        return str(field_value)
+
+    return field_value
+
+
+def _message_to_dict(message, field_names=None):
+    """Convert a fitparse message to {field_name: {'value', 'units', 'raw_value'}}
+
+    Args:
+        message: fitparse DataMessage
+        field_names (set, optional): Only convert these fields (default: all)
+    """
+    return {
+        field.name: {
+            'value': _serialize_field_value(field.value),
+            'units': field.units,
+            'raw_value': field.raw_value
+        }
+        for field in message
+        if field_names is None or field.name in field_names
+    }
+
+
+def _store_message(raw_data, message_name, record_dict):
+    """Append a message dict to its raw_data category (or to other_messages)"""
+    if message_name in raw_data:
+        raw_data[message_name].append(record_dict)
+    else:
+        raw_data['other_messages'].setdefault(message_name, []).append(record_dict)
+
+
+def _to_epoch(value):
+    """Convert a timestamp (epoch seconds, datetime or ISO string) to epoch seconds"""
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', ''))
+    if value.tzinfo is not None:
+        return value.timestamp()
+    return (value - UNIX_EPOCH).total_seconds()
+
+
+def _field_epoch(message, field_name):
+    """Epoch seconds of a date_time field in a raw_data message dict, or None
+
+    Uses the field's raw FIT value (seconds since the FIT epoch) so no ISO
+    string has to be parsed back; falls back to the serialized value for
+    dicts that lost raw_value (e.g. hand-written JSON).
+    """
+    field = message.get(field_name)
+    if not field:
+        return None
+    raw_value = field.get('raw_value')
+    if isinstance(raw_value, int) and raw_value >= SYSTEM_TIME_LIMIT:
+        return raw_value + FIT_EPOCH_OFFSET
+    value = field.get('value')
+    if isinstance(value, (str, datetime)):
+        return _to_epoch(value)
+    return None
+
+
+def _iter_data_messages(fitfile, selected=None):
+    """Yield data messages once, without fitparse keeping every decoded message
+
+    FitFile.get_messages() appends each message to an internal list, so a full
+    pass holds the whole decoded file in memory. This drains the decoder
+    directly and drops the internal list as it goes.
+
+    Args:
+        fitfile (FitFile): Decoder positioned at the start of the file
+        selected (set, optional): Message types to decode. Other data messages are
+                                  read past without decoding their fields and
+                                  yielded as their type name (str), so callers can
+                                  still count them.
+    """
+    while not fitfile._complete:
+        if selected is not None and fitfile._bytes_left > 0:
+            message = _next_selected_message(fitfile, selected)
+        else:
+            message = fitfile._parse_message()
+        fitfile._messages.clear()
+        if isinstance(message, str) or (message is not None and message.type == 'data'):
+            yield message
+
+
+def _next_selected_message(fitfile, selected):
+    """fitparse's _parse_message, except unselected data messages skip field decoding
+
+    Their raw bytes are still read (the CRC covers them) and the compressed
+    timestamp state is kept in sync, which is all later messages depend on.
+    """
+    header = fitfile._parse_message_header()
+    if header.is_definition:
+        return fitfile._parse_definition_message(header)
+
+    def_mesg = fitfile._local_mesgs.get(header.local_mesg_num)
+    if def_mesg is None or def_mesg.name in selected or def_mesg.name in ('developer_data_id', 'field_description'):
+        message = fitfile._parse_data_message(header)
+        # Developer field definitions are needed to decode later messages
+        if message.name == 'developer_data_id':
+            add_dev_data_id(message)
+        elif message.name == 'field_description':
+            add_dev_field_description(message)
+        return message
+
+    raw_values = fitfile._parse_raw_values_from_data_message(def_mesg)
+    for field_def, raw_value in zip(def_mesg.field_defs, raw_values):
+        if field_def.def_num == FIELD_TYPE_TIMESTAMP.def_num and raw_value is not None:
+            fitfile._compressed_ts_accumulator = raw_value
+    if header.time_offset is not None:
+        fitfile._compressed_ts_accumulator = fitfile._apply_compressed_accumulation(
+            header.time_offset, fitfile._compressed_ts_accumulator, 5)
+    return def_mesg.name
+
+
+class RecordColumnBuilder:
+    """Append-only typed columns (array('d'), NaN = missing) for record messages"""
+
+    def __init__(self):
+        self.columns = {name: array('d') for name in TRACK_COLUMNS}
+        self.count = 0
+
+    def append(self, values):
+        """Append one record from a {column: value} dict"""
+        nan = float('nan')
+        for name, column in self.columns.items():
+            value = values.get(name)
+            column.append(nan if value is None else value)
+        self.count += 1
+
+    def append_fields(self, fields):
+        """Append one record from (fit_field_name, value) pairs"""
+        values = {}
+        for fit_field, value in fields:
+            column = GPS_FIELD_MAP.get(fit_field)
+            if column is None or value is None:
+                continue
+            if column in values and not fit_field.startswith('enhanced_'):
+                continue
+            if column == 'time':
+                value = _to_epoch(value)
+            elif column in ('lat', 'lng'):
+                value = value * SEMICIRCLES_TO_DEGREES
+            elif not isinstance(value, (int, float)):
+                continue
+            values[column] = value
+        self.append(values)
+
+    def to_numpy(self):
+        """Return {column: float64 ndarray}, dropping columns with no data at all"""
+        records = {}
+        for name, column in self.columns.items():
+            values = np.frombuffer(column, dtype=np.float64) if self.count else np.empty(0)
+            if name == 'time' or not np.isnan(values).all():
+                records[name] = values
+        return records
+
+
+def _records_to_columns(record_dicts):
+    """Convert raw_data['record'] dicts to columnar record streams
+
+    Timestamps come from the raw FIT value (seconds since the FIT epoch), not
+    by parsing the ISO string stored for output back into a datetime.
+    """
+    builder = RecordColumnBuilder()
+    for record in record_dicts:
+        timestamp = record.get('timestamp')
+        epoch = _field_epoch(record, 'timestamp') if timestamp else None
+        builder.append_fields(
+            (name, epoch if field is timestamp else field['value']) for name, field in record.items()
+        )
+    return builder.to_numpy()
+
+
+class LazyRawData(dict):
+    """raw_data from a selective parse: skipped message types are decoded on first access
+
+    Behaves like the raw_data dict of parse_fit_file_comprehensive. Reading a
+    message type the selective parse skipped (raw_data['hrv'], iterating, ...)
+    triggers one extra decode of the original file that fills in every skipped
+    type. Needs the original source: paths are kept, bytes are kept in-process
+    but dropped when the result is pickled (e.g. returned from a worker
+    process), and streams are not kept - without a source, skipped types
+    materialize as empty lists.
+    """
+
+    def __init__(self, data, source=None, skipped_types=()):
+        super().__init__(data)
+        self._source = source
+        self._skipped = set(skipped_types)
+
+    def __missing__(self, key):
+        if key in RAW_MESSAGE_TYPES or key == 'other_messages':
+            self.materialize()
+            return dict.__getitem__(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in RAW_MESSAGE_TYPES or key == 'other_messages'
+
+    def __iter__(self):
+        self.materialize()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self.materialize()
+        return dict.__len__(self)
+
+    def keys(self):
+        self.materialize()
+        return dict.keys(self)
+
+    def values(self):
+        self.materialize()
+        return dict.values(self)
+
+    def items(self):
+        self.materialize()
+        return dict.items(self)
+
+    @property
+    def pending(self):
+        """True while skipped message types have not been decoded yet"""
+        return bool(self._skipped)
+
+    def materialize(self):
+        """Decode every skipped message type now (no-op once done)"""
+        if not self._skipped:
+            return self
+        skipped, self._skipped = self._skipped, set()
+
+        full = _empty_raw_data()
+        source_error = 'the source was a stream or the parse ran in a worker'
+        if self._source is not None:
+            try:
+                with _open_fit_source(self._source) as source:
+                    for message in _iter_data_messages(FitFile(source)):
+                        if message.name in skipped or (message.name not in full and 'other_messages' in skipped):
+                            _store_message(full, message.name, _message_to_dict(message))
+                source_error = None
+            except OSError as e:
+                full = _empty_raw_data()
+                source_error = str(e)
+        if source_error:
+            print(f"[FIT Parser] Warning: cannot re-read the source of a selective parse ({source_error}); "
+                  f"skipped message types are empty: {', '.join(sorted(skipped))}", file=sys.stderr)
+
+        for key, value in full.items():
+            if not dict.__contains__(self, key):
+                dict.__setitem__(self, key, value)
+        self._source = None
+        return self
+
+    def __reduce__(self):
+        # Only paths survive pickling; bytes would double the size of a worker's result
+        source = self._source if isinstance(self._source, (str, os.PathLike)) else None
+        data = {key: dict.__getitem__(self, key) for key in dict.keys(self)}
+        return (LazyRawData, (data, source, self._skipped))
+
+
+def _lazy_source(source):
+    """The part of a FIT source a LazyRawData can re-read later (paths and bytes only)"""
+    if isinstance(source, (str, os.PathLike, bytes)):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return bytes(source)
+    return None
 
 
 def parse_fit_file_comprehensive(filepath):
@@ -81,7 +585,8 @@ def parse_fit_file_comprehensive(filepath):
     - Raw data for custom processing
 
     Args:
-        filepath (str): Path to the .fit file
+        filepath (str, bytes or file-like): Path to the .fit file, or its contents as
+                                           bytes / memoryview / a seekable binary stream
 
     Returns:
         dict: Comprehensive activity data with both raw and processed formats
@@ -92,90 +597,375 @@ def parse_fit_file_comprehensive(filepath):
             }
     """
     try:
-        fitfile = FitFile(filepath)
-
-        # Initialize comprehensive data structure
-        comprehensive_data = {
-            'raw_data': {
-                'file_id': [],
-                'file_creator': [],
-                'device_info': [],
-                'session': [],
-                'lap': [],
-                'record': [],
-                'event': [],
-                'hrv': [],
-                'segment': [],
-                'length': [],  # For swimming
-                'hr_zone': [],
-                'power_zone': [],
-                'sport': [],
-                'workout': [],
-                'workout_step': [],
-                'activity': [],
-                'climb_pro': [],
-                'developer_data': [],
-                'field_description': [],
-                'other_messages': {}
-            },
-            'strava_format': None,  # Will be populated with Strava-compatible data
-            'metadata': {
-                'file_path': filepath,
-                'parsed_at': datetime.now().isoformat(),
-                'message_counts': {}
+        with _open_fit_source(filepath) as source:
+            fitfile = FitFile(source)
+
+            # Initialize comprehensive data structure
+            comprehensive_data = {
+                'raw_data': _empty_raw_data(),
+                'strava_format': None,  # Will be populated with Strava-compatible data
+                'metadata': {
+                    'file_path': _source_name(filepath),
+                    'parsed_at': datetime.now().isoformat(),
+                    'message_counts': {}
+                }
             }
-        }
 
-        # Parse ALL messages and preserve everything
-        for record in fitfile.get_messages():
-            message_name = record.name
+            # Parse ALL messages and preserve everything
+            for record in fitfile.get_messages():
+                message_name = record.name
 
-            # Count message types
-            if message_name not in comprehensive_data['metadata']['message_counts']:
-                comprehensive_data['metadata']['message_counts'][message_name] = 0
-            comprehensive_data['metadata']['message_counts'][message_name] += 1
+                # Count message types
+                if message_name not in comprehensive_data['metadata']['message_counts']:
+                    comprehensive_data['metadata']['message_counts'][message_name] = 0
+                comprehensive_data['metadata']['message_counts'][message_name] += 1
 
-            # Convert record to dict with all fields
-            record_dict = {}
-            for field in record:
-                field_value = field.value
+                # Convert record to dict with all fields and store in appropriate category
+                _store_message(comprehensive_data['raw_data'], message_name, _message_to_dict(record))
 
-                # Convert datetime objects to ISO format strings
-                if isinstance(field_value, datetime):
-                    field_value = field_value.isoformat()
+            # Generate Strava-compatible format using existing parser logic
+            comprehensive_data['strava_format'] = _generate_strava_format(comprehensive_data['raw_data'])
 
-                # Handle other non-serializable types
-                elif not isinstance(field_value, (str, int, float, bool, list, dict, type(None))):
-                    field_value = str(field_value)
+            return comprehensive_data
 
-                record_dict[field.name] = {
-                    'value': field_value,
-                    'units': field.units,
-                    'raw_value': field.raw_value
-                }
+    except Exception as e:
+        print(f"Error parsing FIT file comprehensively: {e}", file=sys.stderr)
+        import traceback
+        traceback.print_exc()
+        return None
 
-            # Store in appropriate category
-            if message_name in comprehensive_data['raw_data']:
-                comprehensive_data['raw_data'][message_name].append(record_dict)
-            else:
-                # Store unknown message types in 'other_messages'
-                if message_name not in comprehensive_data['raw_data']['other_messages']:
-                    comprehensive_data['raw_data']['other_messages'][message_name] = []
-                comprehensive_data['raw_data']['other_messages'][message_name].append(record_dict)
 
-        # Generate Strava-compatible format using existing parser logic
-        comprehensive_data['strava_format'] = _generate_strava_format(comprehensive_data['raw_data'])
+def parse_fit_file_streaming(filepath, fast=False):
+    """
+    Parse a FIT file in a single pass, writing record fields straight into columns.
 
-        return comprehensive_data
+    Record messages (the bulk of any activity file) never become per-field dicts:
+    their values go directly into typed arrays (float64, NaN = missing) with
+    time as epoch seconds and lat/lng in degrees. Every other message type
+    (session, lap, event, device_info, ...) is stored in raw_data exactly as
+    in parse_fit_file_comprehensive, so raw_data['record'] stays empty.
 
+    Args:
+        filepath (str, bytes or file-like): Path to the .fit file, or its contents as
+                                           bytes / memoryview / a seekable binary stream
+        fast (bool): Decode record messages in bulk with fit_decoder (fitparse is
+                     still used for every other message type and as the fallback)
+
+    Returns:
+        dict: Same structure as parse_fit_file_comprehensive plus the record streams
+            {
+                'raw_data': {...},  # All non-record FIT messages
+                'records': {...},  # Record columns: {'time': ndarray, 'heartrate': ndarray, ...}
+                'strava_format': {...},  # Strava-compatible format
+                'metadata': {...}  # File metadata
+            }
+    """
+    try:
+        return _parse_streaming(filepath, fast=fast)
     except Exception as e:
-        print(f"Error parsing FIT file comprehensively: {e}")
+        print(f"Error parsing FIT file (streaming): {e}", file=sys.stderr)
         import traceback
         traceback.print_exc()
         return None
 
 
-def _generate_strava_format(raw_data):
+def parse_fit_file_selective(filepath, message_types=None, fields=None, fast=False):
+    """
+    Parse only the FIT message types (and fields) the caller needs.
+
+    Single pass like parse_fit_file_streaming, but messages of any other type
+    are only counted: no per-field dicts are built for them. They are still
+    available through raw_data, which is a LazyRawData that decodes the
+    skipped types on first access.
+
+    Args:
+        filepath (str, bytes or file-like): Path to the .fit file, or its contents as
+                                           bytes / memoryview / a seekable binary stream
+        message_types (list, optional): Message types to keep (default: STRAVA_MESSAGE_TYPES,
+                                        everything the Strava format is built from).
+                                        'record' is decoded into columns.
+        fields (dict, optional): {message_type: [field names]} to keep per type
+                                 (types not listed keep all their fields)
+        fast (bool): Decode records with the bulk decoder in fit_decoder
+
+    Returns:
+        dict: Same structure as parse_fit_file_streaming; raw_data is a LazyRawData
+    """
+    try:
+        return _parse_streaming(filepath, message_types=message_types or STRAVA_MESSAGE_TYPES, fields=fields,
+                                fast=fast)
+    except Exception as e:
+        print(f"Error parsing FIT file (selective): {e}", file=sys.stderr)
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def _read_fit_bytes(filepath):
+    """Whole FIT file as bytes (sources are at most MAX_FIT_FILE_SIZE)"""
+    if isinstance(filepath, bytes):
+        return filepath
+    if isinstance(filepath, (bytearray, memoryview)):
+        return bytes(filepath)
+    with _open_fit_source(filepath) as f:
+        content = f.read()
+        f.seek(0)
+    return content
+
+
+def _decode_records_fast(filepath):
+    """Run fit_decoder on a source; returns (records, record_count, other_fit) or None to use fitparse"""
+    from fit_decoder import decode_fit_records, UnsupportedFitFeature
+    try:
+        return decode_fit_records(_read_fit_bytes(filepath))
+    except UnsupportedFitFeature as e:
+        print(f"[FIT Parser] Fast decoder does not support this file ({e}); using fitparse", file=sys.stderr)
+        return None
+
+
+def _parse_streaming(filepath, message_types=None, fields=None, fast=False):
+    """parse_fit_file_streaming / parse_fit_file_selective without error handling
+
+    Args:
+        filepath: FIT source (see parse_fit_file_streaming)
+        message_types (list, optional): Keep only these message types (None = all)
+        fields (dict, optional): {message_type: [field names]} to keep per type
+        fast (bool): Decode record messages with fit_decoder (bulk, vectorized) and
+                     only the remaining messages with fitparse
+    """
+    raw_data = _empty_raw_data()
+    message_counts = {}
+    builder = RecordColumnBuilder()
+    selected = set(message_types) if message_types is not None else None
+    field_names = {name: set(names) for name, names in (fields or {}).items()}
+
+    fast_result = _decode_records_fast(filepath) if fast else None
+    if fast_result is not None:
+        fast_records, record_count, other_fit = fast_result
+        if record_count:
+            message_counts['record'] = record_count
+
+    with _open_fit_source(other_fit if fast_result is not None else filepath) as source:
+        fitfile = FitFile(source)
+
+        for message in _iter_data_messages(fitfile, selected):
+            if isinstance(message, str):  # Not selected: only counted
+                message_counts[message] = message_counts.get(message, 0) + 1
+                continue
+            message_name = message.name
+            message_counts[message_name] = message_counts.get(message_name, 0) + 1
+
+            if selected is not None and message_name not in selected:
+                continue
+            if message_name == 'record':
+                builder.append_fields((field.name, field.value) for field in message.fields)
+            else:
+                _store_message(raw_data, message_name, _message_to_dict(message, field_names.get(message_name)))
+
+    if fast_result is None or (selected is not None and 'record' not in selected):
+        records = builder.to_numpy()
+    else:
+        records, builder.count = fast_records, record_count
+
+    if selected is not None:
+        raw_data, strava_raw = _selective_raw_data(raw_data, selected, message_counts, _lazy_source(filepath))
+    else:
+        strava_raw = raw_data
+
+    return {
+        'raw_data': raw_data,
+        'records': records,
+        'strava_format': _generate_strava_format(strava_raw, records),
+        'metadata': {
+            'file_path': _source_name(filepath),
+            'parsed_at': datetime.now().isoformat(),
+            'message_counts': message_counts,
+            'record_count': builder.count
+        }
+    }
+
+
+def _selective_raw_data(raw_data, selected, message_counts, source):
+    """Wrap the message types a selective parse kept in a LazyRawData
+
+    Returns:
+        tuple: (LazyRawData, plain dict of the kept types for _generate_strava_format)
+    """
+    skipped = [name for name in RAW_MESSAGE_TYPES if name not in selected]
+    kept = {name: raw_data[name] for name in RAW_MESSAGE_TYPES if name in selected}
+    if any(name not in raw_data for name in message_counts if name not in selected):
+        skipped.append('other_messages')
+    else:
+        kept['other_messages'] = raw_data['other_messages']
+    # _generate_strava_format reads the Strava types directly; never trigger the lazy decode
+    return LazyRawData(kept, source, skipped), {name: kept.get(name, []) for name in RAW_MESSAGE_TYPES}
+
+
+def parse_fit_file_bounded(filepath, max_track_points=BOUNDED_TRACK_POINTS, chunk_records=BOUNDED_CHUNK_RECORDS):
+    """
+    Parse a FIT file with memory bounded by the file size, not the record count.
+
+    Records are decoded in chunks of `chunk_records` (fit_decoder, or fitparse
+    as the fallback) and streamed through the fit_stream aggregators: splits,
+    best efforts, elevation and time in zones are exact, while only a
+    decimated track of at most `max_track_points` points is kept. Only the
+    Strava message types are decoded (raw_data is a LazyRawData without a
+    source: other types are empty). Mean-max curves need the full 1 Hz
+    stream and are left empty when the track had to be decimated.
+
+    Args:
+        filepath (str, bytes or file-like): Path to the .fit file, or its contents as
+                                           bytes / memoryview / a seekable binary stream
+        max_track_points (int): Max points kept in strava_format['gps_track'] and records
+        chunk_records (int): Records decoded and aggregated at a time
+
+    Returns:
+        dict: Same structure as parse_fit_file_streaming; metadata['track_stride'] is the
+              decimation step of the kept track (1 = every record)
+    """
+    from fit_decoder import UnsupportedFitFeature, iter_record_chunks, pack_fit_messages
+    from fit_stream import BoundedActivityAggregator
+
+    raw_data = _empty_raw_data()
+    message_counts = {}
+    selected = set(STRAVA_MESSAGE_TYPES)
+    aggregator = BoundedActivityAggregator(max_track_points)
+
+    source = filepath
+    try:
+        data = _read_fit_bytes(filepath)
+        other_messages = bytearray()
+        for chunk in iter_record_chunks(data, chunk_records, other_messages=other_messages):
+            aggregator.update(chunk)
+        source = pack_fit_messages(data, other_messages)
+        if aggregator.record_count:
+            message_counts['record'] = aggregator.record_count
+    except UnsupportedFitFeature as e:
+        print(f"[FIT Parser] Fast decoder does not support this file ({e}); using fitparse", file=sys.stderr)
+        aggregator = BoundedActivityAggregator(max_track_points)
+    data = None  # The file bytes are not needed past this point
+
+    builder = RecordColumnBuilder()
+    with _open_fit_source(source) as fit_source:
+        for message in _iter_data_messages(FitFile(fit_source), selected):
+            message_name = message if isinstance(message, str) else message.name
+            message_counts[message_name] = message_counts.get(message_name, 0) + 1
+            if isinstance(message, str):
+                continue
+            if message_name == 'record':
+                builder.append_fields((field.name, field.value) for field in message.fields)
+                if builder.count >= chunk_records:
+                    aggregator.update(builder.to_numpy())
+                    builder = RecordColumnBuilder()
+            else:
+                _store_message(raw_data, message_name, _message_to_dict(message))
+    if builder.count:
+        aggregator.update(builder.to_numpy())
+
+    raw_data, strava_raw = _selective_raw_data(raw_data, selected, message_counts, None)
+    track = aggregator.track.to_track()
+    records = track.columns
+    strava_format = _generate_strava_format(strava_raw, records)
+
+    # Exact values from the aggregators replace those computed on the decimated track
+    results = aggregator.results(zones=strava_format['zones'])
+    if strava_format['distance'] > 0 and track:
+        strava_format['splits_standard'], strava_format['splits_metric'] = results['splits']
+    strava_format['best_efforts'] = results['best_efforts']
+    strava_format['elev_high'], strava_format['elev_low'] = results['elev_high'], results['elev_low']
+    if results['track_stride'] > 1:
+        strava_format['mean_max'] = {}
+        # Per-lap zone times can only come from the decimated track (approximate)
+        _set_time_in_zones(strava_format, _lap_intervals(strava_raw['lap']), results['track_stride'])
+    strava_format['time_in_zones'] = results['time_in_zones']
+
+    return {
+        'raw_data': raw_data,
+        'records': records,
+        'strava_format': strava_format,
+        'metadata': {
+            'file_path': _source_name(filepath),
+            'parsed_at': datetime.now().isoformat(),
+            'message_counts': message_counts,
+            'record_count': aggregator.record_count,
+            'track_stride': results['track_stride']
+        }
+    }
+
+
+def _lap_intervals(raw_laps):
+    """(start_epoch, end_epoch) of each raw_data lap (None where the device left it out)"""
+    return [(_field_epoch(lap, 'start_time'), _field_epoch(lap, 'timestamp')) for lap in raw_laps]
+
+
+def _set_time_in_zones(activity_data, lap_intervals, track_stride=1):
+    """Fill time_in_zones of a strava_format dict and its laps from its gps_track
+
+    Args:
+        activity_data (dict): strava_format with gps_track, zones and laps
+        lap_intervals (list): (start_epoch, end_epoch) per lap, in lap order
+        track_stride (int): Decimation step of gps_track (bounded mode); each kept
+                            point then stands for up to `track_stride` samples
+    """
+    totals, per_lap = compute_time_in_zones(activity_data['gps_track'], activity_data['zones'], lap_intervals,
+                                            max_gap=MAX_SAMPLE_GAP_SECONDS * track_stride)
+    activity_data['time_in_zones'] = totals
+    for lap_data, lap_zones in zip(activity_data['laps'], per_lap):
+        if any(lap_zones.values()):
+            lap_data['time_in_zones'] = lap_zones
+
+
+def zones_from_bounds(bounds):
+    """Zone dicts (the strava_format['zones'] layout) from ascending zone boundaries
+
+    Args:
+        bounds (list): Upper limits of every zone but the last, e.g. [130, 145, 160, 175]
+
+    Returns:
+        list: [{'min': 0, 'max': 130}, {'min': 130, 'max': 145}, ..., {'min': 175, 'max': None}]
+    """
+    edges = [0] + sorted(bounds)
+    return [{'min': low, 'max': high} for low, high in zip(edges, edges[1:] + [None])] if bounds else []
+
+
+def apply_athlete_zones(strava_format, hr_zones=None, power_zones=None, track_stride=1):
+    """Use athlete zones for the channels the FIT file defines no zones for
+
+    Zones from the file's hr_zone / power_zone messages always win. For each
+    channel that gets athlete zones, time_in_zones (activity and laps) is
+    computed from strava_format['gps_track'].
+
+    Args:
+        strava_format (dict): fit_parser strava_format (gps_track as a Track)
+        hr_zones (list, optional): Heart rate zone dicts (see zones_from_bounds)
+        power_zones (list, optional): Power zone dicts
+        track_stride (int): metadata['track_stride'] of a bounded parse (approximate result)
+
+    Returns:
+        bool: True if any athlete zones were applied
+    """
+    zones = strava_format.setdefault('zones', {'heart_rate': [], 'power': []})
+    added = {name: channel_zones for name, channel_zones in (('heart_rate', hr_zones), ('power', power_zones))
+             if channel_zones and not zones.get(name)}
+    track = strava_format.get('gps_track')
+    if not added or not isinstance(track, Track):
+        return False
+
+    zones.update(added)
+    laps = strava_format.get('laps') or []
+    intervals = [(_to_epoch(lap['start_index']) if lap.get('start_index') is not None else None,
+                  _to_epoch(lap['end_index']) if lap.get('end_index') is not None else None) for lap in laps]
+    totals, per_lap = compute_time_in_zones(track, added, intervals, max_gap=MAX_SAMPLE_GAP_SECONDS * track_stride)
+
+    time_in_zones = strava_format.setdefault('time_in_zones', {'heart_rate': [], 'power': []})
+    for name in added:
+        time_in_zones[name] = totals[name]
+        for lap_data, lap_zones in zip(laps, per_lap):
+            lap_data.setdefault('time_in_zones', {'heart_rate': [], 'power': []})[name] = lap_zones[name]
+    return True
+
+
+def _generate_strava_format(raw_data, records=None):
     """
     Generate Strava-compatible activity format from raw FIT data.
 
@@ -184,6 +974,8 @@ def _generate_strava_format(raw_data):
 
     Args:
         raw_data (dict): Raw FIT message data
+        records (dict, optional): Record columns from the streaming parser.
+                                  Built from raw_data['record'] when omitted.
 
     Returns:
         dict: Strava-compatible activity data
@@ -215,7 +1007,7 @@ def _generate_strava_format(raw_data):
         'splits_metric': [],
         'laps': [],  # NEW: Preserve lap data
         'segments': [],  # NEW: Preserve segment data
-        'gps_track': [],  # NEW: Full GPS track with all data points
+        'gps_track': Track(),  # NEW: Full GPS track (columnar, see fit_track.Track)
         'id': f"fit_{datetime.now().timestamp()}",
         'manual': True,
 
@@ -225,18 +1017,21 @@ def _generate_strava_format(raw_data):
         'zones': {
             'heart_rate': [],
             'power': []
+        },
+        'time_in_zones': {
+            'heart_rate': [],
+            'power': []
         }
     }
 
+    start_epoch = None
+
     # Extract session data (overall activity summary)
     if raw_data['session']:
         session = raw_data['session'][0]  # Usually only one session
 
-        if 'start_time' in session:
-            start_time = session['start_time']['value']
-            if isinstance(start_time, str):
-                activity_data['start_date'] = start_time if start_time.endswith('Z') else start_time + 'Z'
-                activity_data['start_date_local'] = start_time.replace('Z', '')
+        # Timestamps stay epoch seconds; ISO strings are only produced for the output fields
+        start_epoch = _field_epoch(session, 'start_time')
 
         # Extract all session metrics
         field_mapping = {
@@ -284,11 +1079,12 @@ def _generate_strava_format(raw_data):
     # Extract file_id data
     if raw_data['file_id']:
         file_id = raw_data['file_id'][0]
-        if 'time_created' in file_id and not activity_data['start_date']:
-            time_created = file_id['time_created']['value']
-            if isinstance(time_created, str):
-                activity_data['start_date'] = time_created if time_created.endswith('Z') else time_created + 'Z'
-                activity_data['start_date_local'] = time_created.replace('Z', '')
+        if start_epoch is None:
+            start_epoch = _field_epoch(file_id, 'time_created')
+
+    if start_epoch is not None:
+        activity_data['start_date_local'] = epoch_to_iso(start_epoch)
+        activity_data['start_date'] = activity_data['start_date_local'] + 'Z'
 
     # Extract device information
     if raw_data['device_info']:
@@ -302,53 +1098,15 @@ def _generate_strava_format(raw_data):
             break
 
     # Extract GPS track and calculate elevation
-    elevations = []
-    if raw_data['record']:
-        for record in raw_data['record']:
-            gps_point = {}
-
-            # Extract all available fields for this record
-            field_map = {
-                'timestamp': 'time',
-                'position_lat': 'lat',
-                'position_long': 'lng',
-                'altitude': 'altitude',
-                'enhanced_altitude': 'altitude',  # Prefer enhanced if available
-                'distance': 'distance',
-                'speed': 'speed',
-                'enhanced_speed': 'speed',  # Prefer enhanced if available
-                'heart_rate': 'heartrate',
-                'cadence': 'cadence',
-                'power': 'watts',
-                'temperature': 'temp',
-                'grade': 'grade'
-            }
-
-            for fit_field, gps_field in field_map.items():
-                if fit_field in record:
-                    value = record[fit_field]['value']
-
-                    # Convert semicircles to degrees for GPS coordinates
-                    if fit_field in ['position_lat', 'position_long'] and isinstance(value, (int, float)):
-                        value = value * (180.0 / 2**31)
-
-                    # Convert timestamp to ISO string if needed
-                    if fit_field == 'timestamp' and isinstance(value, str):
-                        gps_point[gps_field] = value
-                    else:
-                        gps_point[gps_field] = value
-
-            if gps_point:
-                activity_data['gps_track'].append(gps_point)
-
-                # Track elevations
-                if 'altitude' in gps_point:
-                    elevations.append(gps_point['altitude'])
+    if records is None:
+        records = _records_to_columns(raw_data['record'])
+    gps_track = Track.from_columns(records)
+    activity_data['gps_track'] = gps_track
 
     # Calculate elevation high/low
-    if elevations:
-        activity_data['elev_high'] = max(elevations)
-        activity_data['elev_low'] = min(elevations)
+    if gps_track.has('altitude'):
+        activity_data['elev_high'] = float(np.nanmax(gps_track.altitude))
+        activity_data['elev_low'] = float(np.nanmin(gps_track.altitude))
 
     # Extract lap data (segments/intervals)
     if raw_data['lap']:
@@ -406,18 +1164,34 @@ def _generate_strava_format(raw_data):
             }
             activity_data['zones']['power'].append(zone_data)
 
-    # Calculate splits from GPS track
+    # Seconds in each HR/power zone, for the whole activity and per lap
+    _set_time_in_zones(activity_data, _lap_intervals(raw_data['lap']))
+
+    # Calculate mile and kilometer splits from GPS track (one vectorized pass)
     if activity_data['gps_track'] and activity_data['distance'] > 0:
-        activity_data['splits_standard'] = _calculate_splits_from_gps(
-            activity_data['gps_track'], 1609.34  # Miles
-        )
-        activity_data['splits_metric'] = _calculate_splits_from_gps(
-            activity_data['gps_track'], 1000.0  # Kilometers
+        activity_data['splits_standard'], activity_data['splits_metric'] = compute_splits(
+            activity_data['gps_track'], [METERS_PER_MILE, 1000.0]  # Miles, Kilometers
         )
 
+    # Fastest 400m/1k/mile/5k/10k and best average power/HR per duration. Stored with the
+    # activity, so cached and stored results never recompute them
+    activity_data['best_efforts'] = compute_best_efforts(gps_track)
+    activity_data['mean_max'] = {
+        column: [{'duration': point['duration'], 'value': round(point['value'], 1)}
+                 for point in compute_mean_max(gps_track, column)]
+        for column in ('watts', 'heartrate') if gps_track.has(column)
+    }
+
+    # Work/recovery blocks found in the power or speed stream, as lap dicts. get_interval_data
+    # and the fact sheet use them when the file only has auto (distance/time) laps
+    activity_data['detected_intervals'] = detect_intervals(gps_track)
+
+    # Fixed-size shape of the workout (the full track never goes to the LLM or templates)
+    activity_data['gps_track_summary'] = downsample_track(activity_data['gps_track'])
+
     # Set activity name
-    if activity_data['start_date']:
-        date_str = datetime.fromisoformat(activity_data['start_date'].replace('Z', '')).strftime('%B %d, %Y')
+    if start_epoch is not None:
+        date_str = (UNIX_EPOCH + timedelta(seconds=start_epoch)).strftime('%B %d, %Y')
         activity_data['name'] = f"{activity_data['type']} - {date_str}"
 
     activity_data['description'] = 'Uploaded from FIT file'
@@ -430,88 +1204,51 @@ def _calculate_splits_from_gps(gps_track, split_distance_meters):
     Calculate splits from GPS track data.
 
     Args:
-        gps_track (list): GPS track points with distance and time
+        gps_track (Track or list): GPS track (columnar Track or legacy point dicts)
         split_distance_meters (float): Distance for each split in meters
 
     Returns:
         list: Split data compatible with Strava format
     """
-    splits = []
-    current_split = 1
-    split_start_index = 0
-
-    for i, point in enumerate(gps_track):
-        distance = point.get('distance', 0)
-
-        # Check if we've crossed a split boundary
-        if distance >= current_split * split_distance_meters:
-            if i > 0 and split_start_index < len(gps_track):
-                split_start = gps_track[split_start_index]
-                split_end = point
-
-                # Calculate split metrics
-                split_distance = distance - split_start.get('distance', 0)
-
-                # Calculate elapsed time
-                elapsed_time = 0
-                if 'time' in split_start and 'time' in split_end:
-                    try:
-                        start_time = datetime.fromisoformat(split_start['time'].replace('Z', ''))
-                        end_time = datetime.fromisoformat(split_end['time'].replace('Z', ''))
-                        elapsed_time = (end_time - start_time).total_seconds()
-                    except:
-                        pass
-
-                avg_speed = split_distance / elapsed_time if elapsed_time > 0 else 0
-
-                # Calculate elevation difference
-                elevation_diff = 0
-                if 'altitude' in split_end and 'altitude' in split_start:
-                    elevation_diff = split_end['altitude'] - split_start['altitude']
-
-                # Calculate average HR for this split
-                avg_hr = None
-                hr_values = [p.get('heartrate') for p in gps_track[split_start_index:i+1]
-                            if p.get('heartrate') is not None]
-                if hr_values:
-                    avg_hr = sum(hr_values) / len(hr_values)
-
-                split = {
-                    'distance': split_distance_meters,
-                    'elapsed_time': int(elapsed_time),
-                    'moving_time': int(elapsed_time),
-                    'split': current_split,
-                    'average_speed': avg_speed,
-                    'elevation_difference': elevation_diff,
-                    'average_heartrate': avg_hr,
-                    'pace_zone': 0
-                }
-
-                splits.append(split)
-                split_start_index = i
-                current_split += 1
+    if not isinstance(gps_track, Track):
+        gps_track = Track.from_dicts(gps_track)
+    return compute_splits(gps_track, [split_distance_meters])[0]
 
-    return splits
 
-
-def parse_fit_file(filepath, comprehensive=True):
+def parse_fit_file(filepath, comprehensive=True, streaming=False, message_types=None, fields=None, fast=False,
+                   bounded=False):
     """
     Parse a FIT file and extract activity data in Strava-compatible format.
 
     This function maintains backward compatibility while supporting comprehensive parsing.
 
     Args:
-        filepath (str): Path to the .fit file
+        filepath (str, bytes or file-like): Path to the .fit file, or its contents as
+                                           bytes / memoryview / a seekable binary stream
         comprehensive (bool): If True, return full comprehensive data.
                             If False, return only Strava-compatible format (default).
+        streaming (bool): Decode records straight into columns (parse_fit_file_streaming)
+                          instead of keeping a dict per record field.
+        message_types (list, optional): Only build these message types (parse_fit_file_selective,
+                                        implies streaming); others are decoded lazily on access
+        fields (dict, optional): {message_type: [field names]} to keep (selective mode only)
+        fast (bool): Decode records with the bulk decoder in fit_decoder (implies streaming)
+        bounded (bool): Bounded-memory mode for very large files (see parse_fit_file_bounded)
 
     Returns:
         dict: Activity data in Strava-compatible format, or comprehensive data if requested.
               Returns None if parsing fails.
     """
     try:
-        # Use the comprehensive parser
-        comprehensive_data = parse_fit_file_comprehensive(filepath)
+        # Use the selective, streaming (columnar) or comprehensive (all dicts) parser
+        if bounded:
+            comprehensive_data = parse_fit_file_bounded(filepath)
+        elif message_types:
+            comprehensive_data = parse_fit_file_selective(filepath, message_types, fields, fast=fast)
+        elif streaming or fast:
+            comprehensive_data = parse_fit_file_streaming(filepath, fast=fast)
+        else:
+            comprehensive_data = parse_fit_file_comprehensive(filepath)
 
         if comprehensive_data is None:
             return None
@@ -524,32 +1261,205 @@ def parse_fit_file(filepath, comprehensive=True):
             return comprehensive_data['strava_format']
 
     except Exception as e:
-        print(f"Error parsing FIT file: {e}")
+        print(f"Error parsing FIT file: {e}", file=sys.stderr)
         import traceback
         traceback.print_exc()
         return None
 
 
-def export_comprehensive_data(comprehensive_data, output_filepath):
+def _json_default(value):
+    """JSON encoder hook for columnar data (Track -> point dicts, ndarray -> list with NaN as null)"""
+    if isinstance(value, Track):
+        return value.to_dicts()
+    if isinstance(value, np.ndarray):
+        return [None if item != item else item for item in value.tolist()]
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def export_comprehensive_data(comprehensive_data, output_filepath, format='json'):
     """
     Export comprehensive FIT data to a JSON file.
 
     Args:
         comprehensive_data (dict): Output from parse_fit_file_comprehensive
         output_filepath (str): Path where JSON file should be saved
+        format (str): 'json' (lossless, indented), 'npz' (compressed columnar arrays +
+                      JSON sidecar) or 'npz_mmap' (uncompressed, memory-mappable);
+                      see export_columnar
 
     Returns:
         bool: True if successful, False otherwise
     """
+    if format in ('npz', 'npz_mmap'):
+        return export_columnar(comprehensive_data, output_filepath, compress=(format == 'npz'))
     try:
         with open(output_filepath, 'w') as f:
-            json.dump(comprehensive_data, f, indent=2)
+            json.dump(comprehensive_data, f, indent=2, default=_json_default)
         return True
     except Exception as e:
-        print(f"Error exporting comprehensive data: {e}")
+        print(f"Error exporting comprehensive data: {e}", file=sys.stderr)
         return False
 
 
+def _record_columns(comprehensive_data):
+    """Record streams of a parse result as {column: ndarray}, whichever parser produced it"""
+    if comprehensive_data.get('records') is not None:
+        return dict(comprehensive_data['records'])
+    gps_track = (comprehensive_data.get('strava_format') or {}).get('gps_track')
+    if isinstance(gps_track, Track):
+        return gps_track.columns
+    return _records_to_columns(comprehensive_data['raw_data'].get('record') or [])
+
+
+def export_columnar(comprehensive_data, output_filepath, compress=True):
+    """
+    Export comprehensive FIT data as columnar arrays plus a small JSON sidecar.
+
+    Writes two files:
+        <name>.npz           one float64 array per record stream (time, lat, lng, ...)
+        <name>.sidecar.json  everything else: strava_format (without gps_track), non-record
+                     raw_data messages (session, lap, event, ...) and metadata
+
+    Record streams are stored the way parse_fit_file_streaming keeps them, so
+    record fields outside GPS_FIELD_MAP (and per-field units / raw values) are
+    not exported; use export_comprehensive_data for a lossless JSON dump.
+
+    Args:
+        comprehensive_data (dict): Output of any comprehensive parser
+        output_filepath (str): Path of the .npz file (the sidecar goes next to it)
+        compress (bool): Deflate the arrays (smaller). Uncompressed files can be
+                         memory-mapped by load_columnar instead of read.
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        npz_path, sidecar_path = _columnar_paths(output_filepath)
+        columns = _record_columns(comprehensive_data)
+
+        raw_data = comprehensive_data.get('raw_data') or {}
+        if isinstance(raw_data, LazyRawData):
+            raw_data.materialize()
+        sidecar = {
+            'format': 'fit_columnar',
+            'version': 1,
+            'record_count': len(next(iter(columns.values()))) if columns else 0,
+            'record_columns': list(columns),
+            'metadata': comprehensive_data.get('metadata', {}),
+            'strava_format': {key: value for key, value in (comprehensive_data.get('strava_format') or {}).items()
+                              if key != 'gps_track'},
+            'raw_data': {key: ([] if key == 'record' else value) for key, value in dict.items(raw_data)}
+        }
+
+        with open(npz_path, 'wb') as f:
+            (np.savez_compressed if compress else np.savez)(f, **columns)
+        with open(sidecar_path, 'w') as f:
+            json.dump(sidecar, f, separators=(',', ':'), default=_json_default)
+        return True
+    except Exception as e:
+        print(f"Error exporting columnar data: {e}", file=sys.stderr)
+        return False
+
+
+def _columnar_paths(filepath):
+    """(npz path, sidecar json path) for an export path (.npz, sidecar or no extension)"""
+    base = os.fspath(filepath)
+    for suffix in ('.npz', COLUMNAR_SIDECAR_SUFFIX):
+        if base.lower().endswith(suffix):
+            base = base[:-len(suffix)]
+            break
+    return base + '.npz', base + COLUMNAR_SIDECAR_SUFFIX
+
+
+def _mmap_npz_member(path, info):
+    """Memory-map one uncompressed (ZIP_STORED) .npy member of an .npz file"""
+    with open(path, 'rb') as f:
+        # Local file header: 30 fixed bytes, then the file name and extra field
+        f.seek(info.header_offset)
+        name_length, extra_length = struct.unpack('<HH', f.read(30)[26:30])
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        offset = f.tell()
+    if not np.prod(shape):
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape, order='F' if fortran_order else 'C')
+
+
+class NpzColumns(Mapping):
+    """Read-only {column: ndarray} view of an .npz export; each column is read on first access
+
+    Columns of uncompressed exports are memory-mapped (no read until the data
+    is touched); compressed columns are decompressed on first access.
+    """
+
+    def __init__(self, path, mmap=True):
+        self.path = path
+        self.mmap = mmap
+        self._npz = np.load(path)
+        self._names = [name[:-len('.npy')] for name in self._npz.zip.namelist()]
+        self._loaded = {}
+
+    def __getitem__(self, name):
+        if name not in self._loaded:
+            if name not in self._names:
+                raise KeyError(name)
+            info = self._npz.zip.getinfo(name + '.npy')
+            if self.mmap and info.compress_type == zipfile.ZIP_STORED:
+                self._loaded[name] = _mmap_npz_member(self.path, info)
+            else:
+                self._loaded[name] = self._npz[name]
+        return self._loaded[name]
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __repr__(self):
+        return f"NpzColumns({self.path!r}, columns={self._names}, loaded={list(self._loaded)})"
+
+    def close(self):
+        self._npz.close()
+
+
+def load_columnar(filepath, mmap=True):
+    """
+    Load an export written by export_columnar.
+
+    Only the JSON sidecar is parsed; record streams are not read into memory.
+    data['records'] reads each column on first access, and for uncompressed
+    exports every column (including those behind strava_format['gps_track'])
+    is a memory map, so loading costs the same however long the activity is.
+
+    Args:
+        filepath (str): Path of the .npz file or its .json sidecar
+        mmap (bool): Memory-map columns of uncompressed exports
+
+    Returns:
+        dict: Same structure as parse_fit_file_streaming
+              ({'raw_data', 'records', 'strava_format', 'metadata'})
+    """
+    npz_path, sidecar_path = _columnar_paths(filepath)
+    with open(sidecar_path) as f:
+        sidecar = json.load(f)
+    if sidecar.get('format') != 'fit_columnar':
+        raise ValueError(f"{sidecar_path} is not a columnar FIT export")
+
+    records = NpzColumns(npz_path, mmap=mmap)
+    strava_format = sidecar['strava_format']
+    # Track wraps the arrays without copying (memory maps stay memory maps)
+    strava_format['gps_track'] = Track.from_columns(records)
+    return {
+        'raw_data': sidecar['raw_data'],
+        'records': records,
+        'strava_format': strava_format,
+        'metadata': sidecar['metadata']
+    }
+
+
 def get_all_lap_data(comprehensive_data):
     """
     Extract all lap/segment data from comprehensive FIT data.
@@ -574,19 +1484,97 @@ def get_gps_track(comprehensive_data):
         comprehensive_data (dict): Output from parse_fit_file_comprehensive
 
     Returns:
-        list: GPS track points with all available data
+        Track: Columnar GPS track (iterate or call .to_dicts() for per-point dicts)
     """
     if not comprehensive_data or 'strava_format' not in comprehensive_data:
-        return []
+        return Track()
+
+    return comprehensive_data['strava_format'].get('gps_track', Track())
+
+
+def downsample_track(gps_track, max_points=TRACK_PREVIEW_POINTS, route_points=ROUTE_PREVIEW_POINTS):
+    """
+    Reduce a track to a fixed number of representative points.
+
+    Heart rate, pace and power are downsampled with LTTB (peaks and surges
+    are kept), the route with Douglas-Peucker (corners are kept). The result
+    has the same size for a 20 minute jog and a 10 hour ultra, so it can go
+    into the LLM context or a template at a bounded cost.
+
+    Args:
+        gps_track (Track or list): Columnar Track (or legacy point dicts)
+        max_points (int): Max points per time series
+        route_points (int): Max points in the simplified route
+
+    Returns:
+        dict: JSON-serializable summary
+            {
+                'total_points': int,
+                'has_gps': bool,
+                'series': {'heartrate': [[elapsed_min, bpm], ...],
+                           'pace_min_per_mile': [[elapsed_min, pace], ...],
+                           'watts': [[elapsed_min, watts], ...]},   # channels present only
+                'route': [[lat, lng], ...]
+            }
+    """
+    if gps_track is None:
+        gps_track = Track()
+    elif not isinstance(gps_track, Track):
+        gps_track = Track.from_dicts(gps_track)
+
+    summary = {
+        'total_points': len(gps_track),
+        'has_gps': len(gps_track) > 0,
+        'series': {},
+        'route': []
+    }
+    if not gps_track:
+        return summary
 
-    return comprehensive_data['strava_format'].get('gps_track', [])
+    # x axis: elapsed time (point index when the file has no timestamps)
+    if gps_track.has('time'):
+        elapsed = gps_track.time - gps_track.time[gps_track.mask('time')][0]
+        has_x = gps_track.mask('time')
+    else:
+        elapsed = np.arange(len(gps_track), dtype=np.float64)
+        has_x = np.ones(len(gps_track), dtype=bool)
+
+    channels = [('heartrate', 'heartrate', 0), ('pace_min_per_mile', 'speed', 2), ('watts', 'watts', 0)]
+    for series_name, column, digits in channels:
+        if not gps_track.has(column):
+            continue
+        valid = has_x & gps_track.mask(column)
+        x, y = elapsed[valid], getattr(gps_track, column)[valid]
+        keep = lttb_indices(x, y, max_points)
+        x, y = x[keep], y[keep]
+        if column == 'speed':
+            # LTTB runs on speed (pace explodes near zero); stopped points have no pace
+            with np.errstate(divide='ignore'):
+                y = np.where(y > 0.5, METERS_PER_MILE / 60.0 / y, np.nan)
+        summary['series'][series_name] = [
+            [round(minutes, 1), None if value != value else round(value, digits) if digits else int(round(value))]
+            for minutes, value in zip((x / 60.0).tolist(), y.tolist())
+        ]
+
+    has_position = gps_track.mask('lat') & gps_track.mask('lng')
+    if has_position.any():
+        lat, lng = gps_track.lat[has_position], gps_track.lng[has_position]
+        keep = douglas_peucker_indices(lat, lng, route_points)
+        summary['route'] = [[round(point_lat, 5), round(point_lng, 5)]
+                            for point_lat, point_lng in zip(lat[keep].tolist(), lng[keep].tolist())]
+    else:
+        summary['has_gps'] = False
+
+    return summary
 
 
 def get_interval_data(comprehensive_data):
     """
     Extract interval/segment data specifically for interval training analysis.
 
-    Filters laps that represent intervals (not recovery periods).
+    Filters laps that represent intervals (not recovery periods). Files with
+    only auto laps (lap_trigger distance/time) use the work blocks detected
+    from the power/speed stream (strava_format['detected_intervals']) instead.
 
     Args:
         comprehensive_data (dict): Output from parse_fit_file_comprehensive
@@ -595,6 +1583,8 @@ def get_interval_data(comprehensive_data):
         list: Interval laps (excluding recovery/rest laps)
     """
     laps = get_all_lap_data(comprehensive_data)
+    if not has_structured_laps(laps):
+        laps = (comprehensive_data or {}).get('strava_format', {}).get('detected_intervals') or laps
 
     # Filter for active/work intervals (exclude rest/recovery)
     intervals = [lap for lap in laps if lap.get('intensity', 'active').lower() == 'active']
@@ -602,54 +1592,340 @@ def get_interval_data(comprehensive_data):
     return intervals
 
 
-def validate_fit_file(filepath):
+def _crc16_lanes(buf):
+    """CRC-16 (initial value 0) of a uint8 array, computed over parallel lanes
+
+    The buffer is left-padded with zero bytes (which leave a zero CRC unchanged) and
+    split into a power-of-two number of equal lanes that are stepped together one byte
+    column at a time. Neighbouring lanes are then merged pairwise:
+    crc(A + B) = Z(crc(A)) ^ crc(B), where Z advances a CRC over len(B) zero bytes and
+    is a pair of 256-entry tables for the low and high byte of the state.
+    """
+    size = len(buf)
+    lanes = 1 << max(0, (size // CRC_LANE_BYTES).bit_length() - 1)
+    width = -(-size // lanes)
+    padded = np.zeros(lanes * width, dtype=np.uint8)
+    padded[lanes * width - size:] = buf
+    table = _CRC_BYTE_ARRAY
+
+    state = np.zeros(lanes, dtype=np.uint16)
+    for column in np.ascontiguousarray(padded.reshape(lanes, width).T):
+        state = (state >> 8) ^ table[(state ^ column) & 0xFF]
+
+    low = np.arange(256, dtype=np.uint16)
+    zero_advance = np.concatenate([low, low << 8])
+    for _ in range(width):
+        zero_advance = (zero_advance >> 8) ^ table[zero_advance & 0xFF]
+    z_low, z_high = zero_advance[:256], zero_advance[256:]
+    while len(state) > 1:
+        head = state[0::2]
+        state = z_low[head & 0xFF] ^ z_high[head >> 8] ^ state[1::2]
+        z_low, z_high = (z_low[z_low & 0xFF] ^ z_high[z_low >> 8],
+                         z_low[z_high & 0xFF] ^ z_high[z_high >> 8])
+    return int(state[0])
+
+
+def fit_crc16(data, crc=0):
+    """FIT CRC-16 of a bytes-like object (continue from `crc` for chunked input)
+
+    Inputs of CRC_VECTOR_MIN_BYTES or more are checked with the NumPy lane CRC
+    (_crc16_lanes); the CRC is linear, so a non-zero starting `crc` is folded into the
+    first two bytes instead.
+    """
+    if len(data) >= CRC_VECTOR_MIN_BYTES:
+        buf = np.frombuffer(data, dtype=np.uint8)
+        if crc:
+            buf = buf.copy()
+            buf[0] ^= crc & 0xFF
+            buf[1] ^= crc >> 8
+        return _crc16_lanes(buf)
+
+    table = _CRC_BYTE_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def check_fit_structure(filepath, check_crc=True, chunk_size=1024 * 1024):
+    """Check FIT header, declared data size and CRCs without decoding any message
+
+    Args:
+        filepath (str, bytes or file-like): Path, file contents or seekable binary stream
+        check_crc (bool): Verify the header CRC and the whole-file CRC
+        chunk_size (int): Bytes read at a time for the file CRC
+
+    Returns:
+        tuple: (is_valid (bool), error_message (str or None))
+    """
+    with _open_fit_source(filepath) as f:
+        file_size = _source_size(f)
+        header = f.read(14)
+        if len(header) < 12:
+            return False, "File is too small to be a FIT file"
+
+        header_size = header[0]
+        if header_size not in (12, 14) or len(header) < header_size:
+            return False, f"Invalid FIT header size ({header_size})"
+        header = header[:header_size]
+
+        if header[8:12] != FIT_SIGNATURE:
+            return False, "Missing .FIT signature in header"
+
+        data_size = int.from_bytes(header[4:8], 'little')
+        if data_size == 0:
+            return False, "FIT file contains no data"
+
+        expected_size = header_size + data_size + 2
+        if file_size < expected_size:
+            return False, f"FIT file is truncated ({file_size} of {expected_size} bytes)"
+
+        if not check_crc:
+            return True, None
+
+        # A 14-byte header carries its own CRC (0 = not computed)
+        if header_size == 14:
+            header_crc = int.from_bytes(header[12:14], 'little')
+            if header_crc and header_crc != fit_crc16(header[:12]):
+                return False, "FIT header CRC mismatch"
+
+        # File CRC covers header + data records (chained files: first file only)
+        crc = fit_crc16(header)
+        remaining = data_size
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                return False, "FIT file is truncated"
+            crc = fit_crc16(chunk, crc)
+            remaining -= len(chunk)
+
+        stored_crc = int.from_bytes(f.read(2), 'little')
+        if stored_crc != crc:
+            return False, f"FIT file CRC mismatch (expected 0x{stored_crc:04X}, got 0x{crc:04X})"
+
+    return True, None
+
+
+def validate_fit_file(filepath, check_crc=True, full_decode=False, filename=None):
     """Validate that a file is a valid FIT file
 
+    By default only the header, declared data size and CRC are checked - no
+    message is decoded. Use parse_fit_file_validated to validate and parse in
+    a single decode.
+
     Args:
-        filepath (str): Path to the file
+        filepath (str, bytes or file-like): Path, file contents or seekable binary stream
+        check_crc (bool): Verify the header and file CRCs
+        full_decode (bool): Also decode every message (slow, parses the whole file)
+        filename (str, optional): Original file name for the extension check (non-path sources)
 
     Returns:
         tuple: (is_valid (bool), error_message (str or None))
     """
+    is_valid, error = _check_fit_file_basics(filepath, filename)
+    if not is_valid:
+        return is_valid, error
+
+    # Check the FIT header, data size and CRC
+    try:
+        is_valid, error = check_fit_structure(filepath, check_crc=check_crc)
+    except OSError as e:
+        return False, f"Could not read FIT file: {str(e)}"
+    if not is_valid or not full_decode:
+        return is_valid, error
+
+    # Try to decode every message
+    try:
+        with _open_fit_source(filepath) as source:
+            fitfile = FitFile(source)
+            messages = list(fitfile.get_messages())
+        if not messages:
+            return False, "FIT file contains no data"
+        return True, None
+    except Exception as e:
+        return False, f"Invalid FIT file format: {str(e)}"
+
+
+def _check_fit_file_basics(filepath, filename=None):
+    """Existence, extension and size checks shared by the validators"""
+    is_path = isinstance(filepath, (str, os.PathLike))
+
     # Check file exists
-    if not os.path.exists(filepath):
+    if is_path and not os.path.exists(filepath):
         return False, "File does not exist"
 
     # Check file extension
-    if not filepath.lower().endswith('.fit'):
+    name = filename or (os.fspath(filepath) if is_path else None)
+    if name is not None and not name.lower().endswith('.fit'):
         return False, "File must have .fit extension"
 
     # Check file size (should be reasonable, not too large)
-    file_size = os.path.getsize(filepath)
-    if file_size > 50 * 1024 * 1024:  # 50 MB limit
+    with _open_fit_source(filepath) as f:
+        file_size = _source_size(f)
+    if file_size > MAX_FIT_FILE_SIZE:
         return False, "FIT file is too large (max 50 MB)"
 
     if file_size == 0:
         return False, "FIT file is empty"
 
-    # Try to parse the file header
+    return True, None
+
+
+def parse_fit_file_validated(filepath, streaming=True, filename=None, message_types=None, fast=False,
+                             bounded=False):
+    """Validate and parse a FIT file with a single decode
+
+    Cheap checks (size, header, declared data size) run first; the CRC and the
+    message structure are then verified by the real decode, whose errors are
+    reported as validation failures. Replaces validate_fit_file followed by
+    parse_fit_file, which decoded every upload twice.
+
+    Args:
+        filepath (str, bytes or file-like): Path to the .fit file, or its contents as
+                                           bytes / memoryview / a seekable binary stream
+                                           (see spool_fit_stream for upload streams)
+        streaming (bool): Use the streaming (columnar) parser
+        filename (str, optional): Original file name for the extension check (non-path sources)
+        message_types (list, optional): Only build these message types (see parse_fit_file_selective)
+        fast (bool): Decode records with the bulk decoder in fit_decoder
+        bounded (bool): Bounded-memory parse (parse_fit_file_bounded; implies Strava types only)
+
+    Returns:
+        tuple: (comprehensive_data (dict or None), error_message (str or None));
+               metadata['parse_seconds'] is the wall time of the validation and parse
+    """
+    start = time.perf_counter()
     try:
-        fitfile = FitFile(filepath)
-        # Try to read at least one message
-        messages = list(fitfile.get_messages())
-        if not messages:
-            return False, "FIT file contains no data"
-        return True, None
+        is_valid, error = _check_fit_file_basics(filepath, filename)
+        if is_valid:
+            # fitparse verifies the CRC while decoding, so skip the separate CRC pass
+            is_valid, error = check_fit_structure(filepath, check_crc=False)
+    except OSError as e:
+        return None, f"Could not read FIT file: {str(e)}"
+    if not is_valid:
+        return None, error
+
+    try:
+        if bounded:
+            data = parse_fit_file_bounded(filepath)
+        elif streaming or message_types or fast:
+            data = _parse_streaming(filepath, message_types=message_types, fast=fast)
+        else:
+            data = parse_fit_file_comprehensive(filepath)
+            if data is None:
+                return None, "Failed to parse FIT file"
+    except MemoryError:
+        raise
     except Exception as e:
-        return False, f"Invalid FIT file format: {str(e)}"
+        return None, f"Invalid FIT file format: {str(e)}"
+
+    if not data['metadata']['message_counts']:
+        return None, "FIT file contains no data"
+    if filename:
+        data['metadata']['file_path'] = filename
+    data['metadata']['parse_seconds'] = round(time.perf_counter() - start, 4)
+    return data, None
+
+
+def summarize_parse(name, comprehensive_data, error=None):
+    """One-line, JSON-serializable summary of a parse result (batch mode NDJSON)
+
+    Args:
+        name (str): File name or path to report
+        comprehensive_data (dict or None): parse_fit_file_validated result
+        error (str, optional): Error message of a failed parse
+
+    Returns:
+        dict: file, ok, error or the main activity fields, record count and parse time
+    """
+    if error or not comprehensive_data:
+        return {'file': name, 'ok': False, 'error': error or 'Failed to parse FIT file'}
+
+    activity = comprehensive_data['strava_format']
+    metadata = comprehensive_data.get('metadata', {})
+    summary = {
+        'file': name,
+        'ok': True,
+        'records': metadata.get('record_count', len(activity.get('gps_track') or [])),
+        'parse_seconds': metadata.get('parse_seconds')
+    }
+    for key in ('type', 'start_date', 'distance', 'moving_time', 'elapsed_time', 'average_heartrate',
+                'average_watts', 'total_elevation_gain', 'device_manufacturer', 'device_name'):
+        value = activity.get(key)
+        summary[key] = value.item() if isinstance(value, np.generic) else value
+    summary['laps'] = len(activity.get('laps') or [])
+    return summary
 
 
 if __name__ == "__main__":
     # Test the parser with a sample file
     import sys
 
-    if len(sys.argv) > 1:
+    def _option(name, default=None):
+        return sys.argv[sys.argv.index(name) + 1] if name in sys.argv and sys.argv.index(name) + 1 < len(sys.argv) else default
+
+    if '--batch' in sys.argv:
+        # Imported here: fit_pool imports this module
+        from fit_pool import batch_parse, expand_fit_paths
+
+        batch_paths = expand_fit_paths([arg for idx, arg in enumerate(sys.argv[1:], 1)
+                                        if not arg.startswith('--') and sys.argv[idx - 1] != '--workers'])
+        workers = int(_option('--workers', 0)) or None
+        if not batch_paths:
+            print("No FIT files matched", file=sys.stderr)
+            sys.exit(1)
+
+        # One NDJSON line per file on stdout as it completes; stats go to stderr
+        start = time.perf_counter()
+        file_seconds, records, failed = [], 0, 0
+        for path, data, error in batch_parse(batch_paths, max_workers=workers):
+            summary = summarize_parse(path, data, error)
+            print(json.dumps(summary, default=_json_default), flush=True)
+            if summary['ok']:
+                records += summary['records']
+                file_seconds.append(summary['parse_seconds'])
+            else:
+                failed += 1
+        seconds = time.perf_counter() - start
+
+        p50, p95 = np.percentile(file_seconds, [50, 95]) if file_seconds else (float('nan'), float('nan'))
+        print(f"\nParsed {len(batch_paths) - failed}/{len(batch_paths)} files ({failed} failed) in {seconds:.2f}s",
+              file=sys.stderr)
+        print(f"Throughput: {len(batch_paths) / seconds:.2f} files/s, {records / seconds:.0f} records/s",
+              file=sys.stderr)
+        print(f"Per-file parse time: p50 {p50:.3f}s, p95 {p95:.3f}s", file=sys.stderr)
+        sys.exit(1 if failed else 0)
+
+    elif '--bulk' in sys.argv:
+        # Imported here: fit_pool imports this module
+        from activity_store import LocalActivityStore
+        from fit_pool import bulk_import
+
+        bulk_source = _option('--bulk')
+        store_dir = _option('--store', 'activity_store')
+        workers = int(_option('--workers', 0)) or None
+        print(f"Bulk importing {bulk_source} into {store_dir}")
+
+        report = bulk_import(bulk_source, LocalActivityStore(store_dir), max_workers=workers)
+        for failure in report['errors']:
+            print(f"  ✗ {failure['file']}: {failure['error']}")
+        print(f"\nImported {report['imported']}/{report['files']} files ({report['failed']} failed) "
+              f"in {report['seconds']:.2f}s")
+        print(f"Throughput: {report['files_per_second']} files/s, {report['points_per_second']} points/s")
+
+    elif len(sys.argv) > 1:
         fit_file_path = sys.argv[1]
         print(f"Parsing FIT file: {fit_file_path}")
 
         # Check for comprehensive mode flag
         comprehensive_mode = '--comprehensive' in sys.argv or '-c' in sys.argv
         export_json = '--export' in sys.argv or '-e' in sys.argv
+        export_flag = '--export' if '--export' in sys.argv else '-e'
+        export_format = _option(export_flag, 'json') if export_json else 'json'
+        if export_format not in ('json', 'npz', 'npz_mmap'):
+            export_format = 'json'  # next argument is another flag
+        streaming_mode = '--streaming' in sys.argv or '-s' in sys.argv
+        fast_mode = '--fast' in sys.argv
+        bounded_mode = '--bounded' in sys.argv
 
         # Validate first
         is_valid, error = validate_fit_file(fit_file_path)
@@ -660,7 +1936,8 @@ if __name__ == "__main__":
         # Parse the file
         if comprehensive_mode:
             print("\n=== COMPREHENSIVE MODE ===")
-            data = parse_fit_file(fit_file_path, comprehensive=True)
+            data = parse_fit_file(fit_file_path, comprehensive=True, streaming=streaming_mode, fast=fast_mode,
+                                  bounded=bounded_mode)
 
             if data:
                 print("\n--- Message Type Summary ---")
@@ -720,12 +1997,18 @@ if __name__ == "__main__":
 
                 # GPS Track
                 print(f"\nGPS Track Points: {len(activity['gps_track'])}")
+                if bounded_mode:
+                    print(f"Records: {data['metadata']['record_count']} "
+                          f"(track stride {data['metadata']['track_stride']})")
 
                 # Export to JSON if requested
                 if export_json:
-                    json_path = fit_file_path.replace('.fit', '_comprehensive.json')
-                    if export_comprehensive_data(data, json_path):
-                        print(f"\n✓ Comprehensive data exported to: {json_path}")
+                    extension = '.json' if export_format == 'json' else '.npz'
+                    export_path = fit_file_path.replace('.fit', '_comprehensive' + extension)
+                    if export_comprehensive_data(data, export_path, format=export_format):
+                        print(f"\n✓ Comprehensive data exported to: {export_path}")
+                        if export_format != 'json':
+                            print(f"  (plus sidecar {export_path[:-4]}{COLUMNAR_SIDECAR_SUFFIX}; reload with load_columnar)")
 
             else:
                 print("Failed to parse FIT file")
@@ -733,7 +2016,8 @@ if __name__ == "__main__":
         else:
             # Standard mode (backward compatible)
             print("\n=== STANDARD MODE ===")
-            activity = parse_fit_file(fit_file_path)
+            activity = parse_fit_file(fit_file_path, comprehensive=False, streaming=streaming_mode,
+                                      bounded=bounded_mode)
 
             if activity:
                 print("\n=== Activity Data ===")
@@ -765,8 +2049,20 @@ if __name__ == "__main__":
                     print(f"GPS Track Points: {len(activity['gps_track'])}")
             else:
                 print("Failed to parse FIT file")
+
+        if bounded_mode:
+            import resource
+            # ru_maxrss is in kilobytes on Linux, bytes on macOS
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            print(f"\nPeak RSS: {peak / (1024 * 1024 if sys.platform == 'darwin' else 1024):.1f} MB")
     else:
-        print("Usage: python fit_parser.py <path_to_fit_file> [--comprehensive/-c] [--export/-e]")
+        print("Usage: python fit_parser.py <path_to_fit_file> [--comprehensive/-c] [--export/-e] [--streaming/-s]")
         print("\nOptions:")
         print("  --comprehensive, -c  Parse with full comprehensive data")
-        print("  --export, -e         Export comprehensive data to JSON file")
+        print("  --export, -e [FMT]   Export comprehensive data: json (default), npz (compressed")
+        print("                       columnar arrays + JSON sidecar) or npz_mmap (memory-mappable)")
+        print("  --streaming, -s      Decode records straight into columns (single pass, low memory)")
+        print("  --fast               Unpack record messages with the bulk decoder (fit_decoder.py)")
+        print("  --bounded            Bounded-memory parse for very large files; prints peak RSS")
+        print("\nBulk import: python fit_parser.py --bulk <archive.zip|directory> [--store DIR] [--workers N]")
+        print("Batch (NDJSON): python fit_parser.py --batch <files|dirs|globs...> [--workers N]")
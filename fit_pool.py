@@ -0,0 +1,577 @@
+"""
+Process Pool for FIT Parsing
+
+FIT decoding is CPU-bound pure Python, so parsing a large upload inside the
+request thread holds the GIL and stalls every other request in the worker.
+FitParsePool moves large files to a small pool of warm worker processes:
+
+- WARM WORKERS: fit_parser (fitparse + NumPy) is imported in each worker when
+  the pool starts, so a job never pays the import cost
+- TIMEOUTS: each job is interrupted inside the worker after `timeout` seconds
+  (SIGALRM); a worker that does not come back within a grace period of the
+  job's start (not its submission: time spent queued never counts) is hung,
+  and only then is the pool restarted
+- MEMORY LIMITS: each worker's address space is capped at `memory_limit_mb`
+  above its post-import size, so a pathological file raises MemoryError in the
+  worker instead of taking the host down
+- INLINE FALLBACK: files below `inline_threshold_bytes` are parsed in the
+  calling thread (the IPC round trip would cost more than the parse)
+
+Results are the same (comprehensive_data, error_message) tuples as
+fit_parser.parse_fit_file_validated.
+
+USAGE:
+======
+    pool = FitParsePool(max_workers=2, timeout=60, memory_limit_mb=1024)
+    data, error = pool.parse(upload_stream, filename='run.fit')
+
+    futures = [pool.submit(path) for path in paths]   # parallel, for batch jobs
+    pool.get_stats()
+    pool.shutdown()
+
+Bulk import (zip archive or directory -> LocalActivityStore):
+    report = bulk_import('old_watch_export.zip', LocalActivityStore('activity_store/alice'))
+    report['files_per_second'], report['points_per_second'], report['errors']
+    bulk_import(archive, store, pool=bulk_pool, progress=lambda report: print(report['files']))
+
+Batch parsing (results in completion order, e.g. for NDJSON output):
+    for path, data, error in batch_parse(expand_fit_paths(['exports/**/*.fit'])):
+        ...
+"""
+import glob
+import hashlib
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import uuid
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from fit_parser import parse_fit_file_validated, MAX_FIT_FILE_SIZE, STRAVA_MESSAGE_TYPES
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Extra seconds the parent waits past the in-worker timeout before killing the pool
+TIMEOUT_GRACE_SECONDS = 5.0
+# How often the parent checks whether a queued job has started
+JOB_START_POLL_SECONDS = 1.0
+
+_job_starts = None  # Worker side: queue of (job_id, start time) for the parent
+
+
+class FitParseTimeout(BaseException):
+    """Raised inside a worker when a parse exceeds its time budget
+
+    Derives from BaseException so the parser's own `except Exception`
+    handlers do not swallow it.
+    """
+
+
+def _current_address_space():
+    """Virtual memory size of this process in bytes (Linux), or None"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[0])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _init_worker(memory_limit_bytes, job_starts=None):
+    """Worker initializer: preload the parser and apply the memory limit"""
+    global _job_starts
+    _job_starts = job_starts
+
+    # Imported for its side effect: fitparse profiles, NumPy and fit_track are loaded once per worker
+    import fit_parser  # noqa: F401
+
+    # Worker diagnostics (ours and fitparse's) go to stderr: the parent's stdout may be a
+    # data stream, e.g. the NDJSON of fit_parser --batch
+    sys.stdout = sys.stderr
+
+    # Ignore Ctrl+C in workers; the parent shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    if memory_limit_bytes and resource is not None:
+        baseline = _current_address_space()
+        if baseline is not None:
+            limit = baseline + memory_limit_bytes
+            try:
+                resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+            except (ValueError, OSError) as e:
+                print(f"[FIT Pool] Could not set worker memory limit: {e}", file=sys.stderr)
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def _raise_timeout(signum, frame):
+    raise FitParseTimeout()
+
+
+def _parse_in_worker(source, filename, streaming, timeout, message_types=None, fast=False, bounded=False,
+                     job_id=None):
+    """Worker job: parse with an in-process alarm; always returns (data, error)"""
+    if _job_starts is not None and job_id is not None:
+        _job_starts.put((job_id, time.time()))  # The parent's deadline counts from here
+    use_alarm = timeout and hasattr(signal, 'setitimer')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return parse_fit_file_validated(source, streaming=streaming, filename=filename,
+                                        message_types=message_types, fast=fast, bounded=bounded)
+    except FitParseTimeout:
+        return None, f"Parsing took longer than {timeout:g} seconds"
+    except MemoryError:
+        return None, "FIT file needs more memory than the parser is allowed to use"
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _source_size(source):
+    """Size in bytes of a path, bytes-like object or seekable stream (None if unknown)"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return memoryview(source).nbytes
+    try:
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _picklable_source(source):
+    """Paths and bytes go to the worker as-is; streams are read into bytes"""
+    if isinstance(source, (str, os.PathLike, bytes)):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return bytes(source)
+    source.seek(0)
+    return source.read()
+
+
+class FitParsePool:
+    """Bounded pool of warm FIT parsing processes with timeouts and memory limits"""
+
+    def __init__(self, max_workers=2, timeout=60.0, memory_limit_mb=1024,
+                 inline_threshold_bytes=256 * 1024, streaming=True, warm=True, message_types=None,
+                 fast=False, bounded_min_bytes=0):
+        """
+        Args:
+            max_workers (int): Worker processes (0 = always parse inline)
+            timeout (float): Max seconds per parse (0 = no limit)
+            memory_limit_mb (int): Max extra address space per worker in MB (0 = no limit)
+            inline_threshold_bytes (int): Files smaller than this are parsed in the calling thread
+            streaming (bool): Use the streaming (columnar) parser
+            warm (bool): Start every worker as soon as the pool is created
+            message_types (list, optional): Only build these message types
+                                            (fit_parser.parse_fit_file_selective)
+            fast (bool): Decode record messages with the bulk decoder (fit_decoder)
+            bounded_min_bytes (int): Files at least this large use the bounded-memory parser
+                                     (fit_parser.parse_fit_file_bounded; 0 = never)
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.inline_threshold_bytes = inline_threshold_bytes
+        self.streaming = streaming
+        self.warm = warm
+        self.message_types = message_types
+        self.fast = fast
+        self.bounded_min_bytes = bounded_min_bytes
+
+        self._executor = None
+        self._job_starts = None    # Queue the workers report job starts on
+        self._started_at = {}      # job_id -> start time (drained from _job_starts)
+        self._lock = threading.Lock()
+        self.stats = {'inline': 0, 'pooled': 0, 'timeouts': 0, 'errors': 0, 'restarts': 0}
+
+    def _get_executor(self):
+        """Create the executor on first use (never at import time, see module docstring)"""
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a threaded web server is unsafe
+                context = multiprocessing.get_context('spawn')
+                self._job_starts = context.Queue()
+                self._started_at = {}
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self.memory_limit_mb * 1024 * 1024, self._job_starts)
+                )
+                if self.warm:
+                    for _ in range(self.max_workers):
+                        self._executor.submit(_warm_up)
+            return self._executor
+
+    def start(self):
+        """Start (and warm) the worker processes now instead of on the first large file"""
+        if self.max_workers:
+            self._get_executor()
+
+    def _restart(self, executor):
+        """Kill the workers of a hung or broken executor and start a fresh one on next use"""
+        with self._lock:
+            if self._executor is not executor:
+                return  # Someone else already restarted it
+            self._executor = None
+            self.stats['restarts'] += 1
+        # ProcessPoolExecutor cannot cancel a running job; terminate its processes directly
+        for process in list((getattr(executor, '_processes', None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+        print("[FIT Pool] Worker pool restarted", file=sys.stderr)
+
+    def _bounded(self, size):
+        """Whether a source of `size` bytes gets the bounded-memory parser"""
+        return bool(self.bounded_min_bytes) and size is not None and size >= self.bounded_min_bytes
+
+    def _job_started_at(self, job_id):
+        """Start time a worker reported for a job, or None while it is still queued"""
+        with self._lock:
+            job_starts = self._job_starts
+            while job_starts is not None:
+                try:
+                    started_id, started = job_starts.get_nowait()
+                except (queue.Empty, OSError, ValueError):
+                    break
+                self._started_at[started_id] = started
+            return self._started_at.get(job_id)
+
+    def _wait(self, future):
+        """future.result() with the parent-side deadline counted from the job's start
+
+        Raises:
+            FutureTimeoutError: The job ran `timeout` + grace seconds (its worker is hung)
+        """
+        if not self.timeout:
+            return future.result()
+        job_id = getattr(future, 'fit_job_id', None)
+        try:
+            while True:
+                started = self._job_started_at(job_id)
+                if started is None:
+                    # Still queued behind other jobs: waiting in line never counts as a timeout
+                    wait_seconds = JOB_START_POLL_SECONDS
+                else:
+                    wait_seconds = started + self.timeout + TIMEOUT_GRACE_SECONDS - time.time()
+                    if wait_seconds <= 0:
+                        raise FutureTimeoutError()
+                try:
+                    return future.result(timeout=wait_seconds)
+                except FutureTimeoutError:
+                    continue
+        finally:
+            with self._lock:
+                self._started_at.pop(job_id, None)
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def submit(self, source, filename=None):
+        """Submit a parse job to the pool (no inline fallback)
+
+        Args:
+            source: Path, bytes-like object or seekable binary stream
+            filename (str, optional): Original file name (extension check / metadata)
+
+        Returns:
+            Future: Resolves to (comprehensive_data, error_message)
+        """
+        self._count('pooled')
+        job_id = uuid.uuid4().hex
+        job = (_parse_in_worker, _picklable_source(source), filename, self.streaming, self.timeout,
+               self.message_types, self.fast, self._bounded(_source_size(source)), job_id)
+        executor = self._get_executor()
+        try:
+            future = executor.submit(*job)
+        except BrokenProcessPool:
+            # A worker died since the last job (e.g. killed by the OS): start a fresh pool once
+            self._restart(executor)
+            future = self._get_executor().submit(*job)
+        future.fit_job_id = job_id
+        return future
+
+    def result(self, future):
+        """Wait for a submitted job, enforcing the timeout from the parent side too
+
+        The parent-side deadline starts when a worker picks the job up, so jobs
+        queued behind others never time out; the pool is only restarted when a
+        worker outlives the in-worker alarm by TIMEOUT_GRACE_SECONDS.
+
+        Returns:
+            tuple: (comprehensive_data, error_message)
+        """
+        executor = self._executor
+        try:
+            data, error = self._wait(future)
+        except FutureTimeoutError:
+            self._count('timeouts')
+            self._restart(executor)
+            return None, f"Parsing took longer than {self.timeout:g} seconds"
+        except BrokenProcessPool:
+            self._count('errors')
+            self._restart(executor)
+            return None, "FIT parser worker crashed (file too large or corrupted?)"
+        except MemoryError:
+            # Raised while sending the result back (the parsed data did not fit in the limit)
+            self._count('errors')
+            return None, "FIT file needs more memory than the parser is allowed to use"
+        except Exception as e:
+            self._count('errors')
+            return None, f"FIT parser worker failed: {str(e)}"
+
+        if error and error.startswith('Parsing took longer'):
+            self._count('timeouts')
+        elif error:
+            self._count('errors')
+        return data, error
+
+    def parse(self, source, filename=None):
+        """Validate and parse a FIT file, in a worker process unless it is tiny
+
+        Args:
+            source: Path, bytes-like object or seekable binary stream
+            filename (str, optional): Original file name (extension check / metadata)
+
+        Returns:
+            tuple: (comprehensive_data (dict or None), error_message (str or None))
+        """
+        size = _source_size(source)
+        if not self.max_workers or (size is not None and size < self.inline_threshold_bytes):
+            self._count('inline')
+            return parse_fit_file_validated(source, streaming=self.streaming, filename=filename,
+                                            message_types=self.message_types, fast=self.fast,
+                                            bounded=self._bounded(size))
+        return self.result(self.submit(source, filename))
+
+    def get_stats(self):
+        """Return JSON-serializable pool counters and configuration"""
+        with self._lock:
+            stats = dict(self.stats)
+            running = self._executor is not None
+        stats.update({
+            'max_workers': self.max_workers,
+            'timeout_seconds': self.timeout,
+            'memory_limit_mb': self.memory_limit_mb,
+            'inline_threshold_bytes': self.inline_threshold_bytes,
+            'fast_decoder': self.fast,
+            'bounded_min_bytes': self.bounded_min_bytes,
+            'running': running
+        })
+        return stats
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def iter_fit_files(source):
+    """Yield (name, content_bytes_or_error) for every .fit file in a zip archive or directory
+
+    Args:
+        source: Directory path, zip file path, or a seekable binary stream with a zip archive
+
+    Yields:
+        tuple: (relative name, bytes) or (relative name, error message str)
+    """
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        for dirpath, _, filenames in os.walk(source):
+            for filename in sorted(filenames):
+                if not filename.lower().endswith('.fit'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, source)
+                if os.path.getsize(path) > MAX_FIT_FILE_SIZE:
+                    yield name, "FIT file is too large (max 50 MB)"
+                    continue
+                with open(path, 'rb') as f:
+                    yield name, f.read()
+        return
+
+    with zipfile.ZipFile(source) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or not name.lower().endswith('.fit') or name.startswith('__MACOSX/'):
+                continue
+            # Checked against the declared size before decompressing (zip bombs)
+            if info.file_size > MAX_FIT_FILE_SIZE:
+                yield name, "FIT file is too large (max 50 MB)"
+                continue
+            try:
+                yield name, archive.read(info)
+            except (zipfile.BadZipFile, OSError, RuntimeError) as e:
+                yield name, f"Could not extract from archive: {str(e)}"
+
+
+def bulk_import(source, store, pool=None, max_workers=None, max_in_flight=None, progress=None):
+    """Parse every FIT file in a zip archive or directory in parallel and save it to a store
+
+    Args:
+        source: Directory path, zip file path or seekable stream with a zip archive
+        store (LocalActivityStore): Destination for summaries and tracks
+        pool (FitParsePool, optional): Pool to use; a temporary one with one worker per core
+                                       is created (and shut down) when omitted
+        max_workers (int, optional): Workers for the temporary pool (default: CPU count)
+        max_in_flight (int, optional): Max files read into memory and queued at once
+                                       (default: 2 per worker)
+        progress (callable, optional): Called with the running report after each file
+
+    Returns:
+        dict: files, imported, failed, points, seconds, files_per_second, points_per_second,
+              activity_ids and errors ([{'file', 'error'}])
+    """
+    own_pool = pool is None
+    if own_pool:
+        # Only the Strava-format summary and track are stored: skip every other message type
+        pool = FitParsePool(max_workers=max_workers or os.cpu_count() or 1, inline_threshold_bytes=0,
+                            message_types=STRAVA_MESSAGE_TYPES, fast=True)
+    max_in_flight = max_in_flight or 2 * max(1, pool.max_workers)
+
+    start = time.perf_counter()
+    report = {'files': 0, 'imported': 0, 'failed': 0, 'points': 0, 'activity_ids': [], 'errors': []}
+    pending = {}
+
+    def record(name, content_hash, data, error):
+        save(name, content_hash, data, error)
+        if progress:
+            progress(report)
+
+    def save(name, content_hash, data, error):
+        if error or not data:
+            report['failed'] += 1
+            report['errors'].append({'file': name, 'error': error or 'Failed to parse FIT file'})
+            return
+        try:
+            activity_id = store.save(data['strava_format'], content_hash=content_hash, source_name=name)
+        except (OSError, ValueError, TypeError) as e:
+            report['failed'] += 1
+            report['errors'].append({'file': name, 'error': f"Could not save activity: {str(e)}"})
+            return
+        report['imported'] += 1
+        report['points'] += len(data['strava_format']['gps_track'])
+        report['activity_ids'].append(activity_id)
+
+    def collect(future):
+        name, content_hash = pending.pop(future)
+        record(name, content_hash, *pool.result(future))
+
+    try:
+        for name, content in iter_fit_files(source):
+            report['files'] += 1
+            if isinstance(content, str):
+                record(name, None, None, content)
+                continue
+
+            content_hash = hashlib.sha256(content).hexdigest()
+            if not pool.max_workers:
+                # Pool configured without workers: parse in this thread
+                record(name, content_hash, *pool.parse(content, filename=os.path.basename(name)))
+                continue
+            pending[pool.submit(content, filename=os.path.basename(name))] = (name, content_hash)
+
+            # Bound the number of files held in memory while workers catch up
+            while len(pending) >= max_in_flight:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+
+        while pending:
+            collect(next(iter(pending)))
+    except (zipfile.BadZipFile, OSError) as e:
+        archive_name = os.path.basename(source) if isinstance(source, str) else 'archive'
+        report['errors'].append({'file': archive_name, 'error': f"Could not read archive: {str(e)}"})
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+    seconds = time.perf_counter() - start
+    report['seconds'] = round(seconds, 3)
+    report['files_per_second'] = round(report['files'] / seconds, 2) if seconds else None
+    report['points_per_second'] = round(report['points'] / seconds) if seconds else None
+    return report
+
+
+def expand_fit_paths(patterns):
+    """FIT file paths from file paths, directories (searched recursively) and glob patterns
+
+    Args:
+        patterns (list): Paths, directories or globs ('exports/**/*.fit')
+
+    Returns:
+        list: Unique paths in the order given (sorted within each directory or glob)
+    """
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for dirpath, _, filenames in os.walk(pattern):
+                paths.extend(os.path.join(dirpath, filename) for filename in sorted(filenames)
+                             if filename.lower().endswith('.fit'))
+        elif glob.has_magic(pattern):
+            paths.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            paths.append(pattern)
+    return list(dict.fromkeys(paths))
+
+
+def batch_parse(paths, pool=None, max_workers=None, max_in_flight=None):
+    """Parse many FIT files in parallel, yielding each result as soon as it is ready
+
+    Workers receive paths, not file contents, so only the parse results cross
+    the process boundary.
+
+    Args:
+        paths (list): FIT file paths (see expand_fit_paths)
+        pool (FitParsePool, optional): Pool to use; a temporary one with one worker per core
+                                       is created (and shut down) when omitted
+        max_workers (int, optional): Workers for the temporary pool (default: CPU count)
+        max_in_flight (int, optional): Max files queued at once (default: 2 per worker)
+
+    Yields:
+        tuple: (path, comprehensive_data or None, error_message or None) in completion order
+    """
+    own_pool = pool is None
+    if own_pool:
+        pool = FitParsePool(max_workers=max_workers or os.cpu_count() or 1, inline_threshold_bytes=0,
+                            message_types=STRAVA_MESSAGE_TYPES, fast=True)
+    max_in_flight = max_in_flight or 2 * max(1, pool.max_workers)
+    pending = {}
+
+    try:
+        for path in paths:
+            if not pool.max_workers:
+                yield (path, *pool.parse(path, filename=os.path.basename(path)))
+                continue
+            pending[pool.submit(path, filename=os.path.basename(path))] = path
+
+            while len(pending) >= max_in_flight:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield (pending.pop(future), *pool.result(future))
+
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                yield (pending.pop(future), *pool.result(future))
+    finally:
+        if own_pool:
+            pool.shutdown()
+
@@ -0,0 +1,321 @@
+"""
+Bounded-Memory Aggregators for FIT Record Streams
+
+A multi-day ultra recorded at 1 Hz has hundreds of thousands of records.
+Holding all of them as a Track (plus raw_data and the split lists) is what
+makes a 50 MB upload expensive. The aggregators here consume the record
+stream chunk by chunk and keep only what their result needs:
+
+    SplitAccumulator      one row per split boundary (O(number of splits))
+    BestEffortAccumulator the points within the longest effort distance of the end
+    ElevationAccumulator  running altitude high/low
+    ZoneAccumulator       seconds per integer bpm / watt (zones applied at the end)
+    DecimatedTrack        every k-th point, k doubling to stay under a point budget
+
+Their results match the whole-track functions in fit_track (compute_splits,
+compute_best_efforts, zone_seconds) for the same records.
+
+USAGE:
+======
+    aggregator = BoundedActivityAggregator(max_track_points=10000)
+    for chunk in iter_record_chunks(fit_bytes, chunk_records=65536):   # fit_decoder
+        aggregator.update(chunk)
+    results = aggregator.results(zones=strava_format['zones'])
+    results['splits'], results['best_efforts'], results['track']   # track: decimated Track
+
+In fit_parser: parse_fit_file(path, bounded=True)
+"""
+import numpy as np
+
+from fit_track import (BEST_EFFORT_DISTANCES, TRACK_COLUMNS, ZONE_CHANNELS, Track, _splits_from_boundaries,
+                       epoch_to_iso, sample_durations, zone_upper_bounds)
+
+DEFAULT_SPLIT_DISTANCES = [1609.34, 1000.0]  # Miles, kilometers
+DEFAULT_TRACK_POINTS = 10000
+
+
+def _column(chunk, name):
+    """Column of a chunk Track, or NaNs when the chunk has none"""
+    values = getattr(chunk, name)
+    return values if values is not None else np.full(len(chunk), np.nan)
+
+
+class SplitAccumulator:
+    """compute_splits over a chunked track, keeping only the split boundary points"""
+
+    def __init__(self, split_distances=None):
+        self.split_distances = list(split_distances or DEFAULT_SPLIT_DISTANCES)
+        self._offset = 0                # Global index of the next chunk's first point
+        self._distance = np.nan         # Running max distance so far
+        self._hr_sum = 0.0
+        self._hr_count = 0
+        self._seen_distance = False
+        # Per split length: next target multiple, last boundary index and boundary rows
+        self._next = [1] * len(self.split_distances)
+        self._last = [0] * len(self.split_distances)
+        self._rows = [[] for _ in self.split_distances]
+
+    def update(self, chunk):
+        n = len(chunk)
+        if not n:
+            return
+        self._seen_distance = self._seen_distance or chunk.distance is not None
+
+        # Same rules as compute_splits: running max distance, missing = last known (0 at first)
+        distance = np.fmax.accumulate(np.concatenate(([self._distance], _column(chunk, 'distance'))))[1:]
+        filled = np.where(np.isnan(distance), 0.0, distance)
+        time, altitude = _column(chunk, 'time'), _column(chunk, 'altitude')
+        heartrate = _column(chunk, 'heartrate')
+        has_hr = ~np.isnan(heartrate)
+        hr_through = self._hr_sum + np.cumsum(np.where(has_hr, heartrate, 0.0))
+        count_through = self._hr_count + np.cumsum(has_hr)
+        hr_before = hr_through - np.where(has_hr, heartrate, 0.0)
+        count_before = count_through - has_hr
+
+        def boundary_rows(local):
+            return [(time[i], filled[i], altitude[i], hr_before[i], count_before[i], hr_through[i], count_through[i])
+                    for i in local.tolist()]
+
+        if self._offset == 0:
+            for rows in self._rows:
+                rows.extend(boundary_rows(np.array([0])))
+
+        for idx, split_distance in enumerate(self.split_distances):
+            last_target = int(filled[-1] // split_distance)
+            if last_target < self._next[idx]:
+                continue
+            targets = np.arange(self._next[idx], last_target + 1) * split_distance
+            candidates = np.searchsorted(filled, targets, side='left') + self._offset
+            # idx[k] = max(candidate[k], idx[k - 1] + 1), continuing from the previous boundary
+            chained = np.concatenate(([self._last[idx]], candidates))
+            steps = np.arange(len(chained))
+            boundaries = (np.maximum.accumulate(chained - steps) + steps)[1:]
+            # Boundaries pushed past this chunk are found again in the next one
+            boundaries = boundaries[boundaries < self._offset + n]
+            if len(boundaries):
+                self._rows[idx].extend(boundary_rows(boundaries - self._offset))
+                self._next[idx] += len(boundaries)
+                self._last[idx] = int(boundaries[-1])
+
+        if not np.isnan(distance[-1]):
+            self._distance = distance[-1]
+        self._hr_sum, self._hr_count = hr_through[-1], count_through[-1]
+        self._offset += n
+
+    def results(self):
+        """One list of Strava-format split dicts per split length"""
+        if not self._seen_distance:
+            return [[] for _ in self.split_distances]
+        results = []
+        for split_distance, rows in zip(self.split_distances, self._rows):
+            time, distance, altitude, hr_before, count_before, hr_through, count_through = (
+                np.array(values, dtype=np.float64) for values in zip(*rows)
+            ) if rows else [np.zeros(0)] * 7
+            results.append(_splits_from_boundaries(split_distance, time, distance, altitude,
+                                                   (hr_before, count_before), (hr_through, count_through)))
+        return results
+
+
+class BestEffortAccumulator:
+    """compute_best_efforts over a chunked track
+
+    Keeps the points within the longest effort distance of the latest point
+    (the only ones a future effort can start from), so memory depends on the
+    effort distance, not on the activity length.
+    """
+
+    def __init__(self, distances=None):
+        self.distances = list(distances or BEST_EFFORT_DISTANCES)
+        self._window = max(meters for _, meters in self.distances)
+        self._offset = 0
+        self._distance = np.zeros(0)
+        self._time = np.zeros(0)
+        self._index = np.zeros(0, dtype=np.int64)
+        self._best = {}  # name -> (elapsed, start position, end position, start time)
+
+    def update(self, chunk):
+        n = len(chunk)
+        if not n:
+            return
+        valid = ~np.isnan(_column(chunk, 'distance')) & ~np.isnan(_column(chunk, 'time'))
+        if valid.any():
+            previous_max = self._distance[-1] if len(self._distance) else -np.inf
+            new_distance = np.maximum.accumulate(np.concatenate(([previous_max], chunk.distance[valid])))[1:]
+            distance = np.concatenate((self._distance, new_distance))
+            time = np.concatenate((self._time, chunk.time[valid]))
+            index = np.concatenate((self._index, self._offset + np.flatnonzero(valid)))
+            first_new = len(self._distance)
+
+            for name, meters in self.distances:
+                starts = np.searchsorted(distance, distance[first_new:] - meters, side='right') - 1
+                ends = np.flatnonzero(starts >= 0)
+                if not len(ends):
+                    continue
+                elapsed = time[first_new + ends] - time[starts[ends]]
+                best = int(np.argmin(elapsed))
+                # Strictly faster only: ties keep the earliest effort, like np.argmin over the whole track
+                if name not in self._best or elapsed[best] < self._best[name][0]:
+                    start, end = int(starts[ends[best]]), first_new + int(ends[best])
+                    self._best[name] = (elapsed[best], int(index[start]), int(index[end]), time[start])
+
+            # Drop points no future effort can start from
+            keep_from = max(0, int(np.searchsorted(distance, distance[-1] - self._window, side='right')) - 1)
+            self._distance, self._time, self._index = distance[keep_from:], time[keep_from:], index[keep_from:]
+        self._offset += n
+
+    def results(self):
+        efforts = []
+        for name, meters in self.distances:
+            if name not in self._best:
+                continue
+            elapsed, start_index, end_index, start_time = self._best[name]
+            efforts.append({
+                'name': name,
+                'distance': meters,
+                'elapsed_time': int(round(elapsed)),
+                'moving_time': int(round(elapsed)),
+                'start_index': start_index,
+                'end_index': end_index,
+                'start_date': epoch_to_iso(start_time)
+            })
+        return efforts
+
+
+class ElevationAccumulator:
+    """Running altitude high and low"""
+
+    def __init__(self):
+        self.high = None
+        self.low = None
+
+    def update(self, chunk):
+        if chunk.altitude is None or not chunk.has('altitude'):
+            return
+        high, low = float(np.nanmax(chunk.altitude)), float(np.nanmin(chunk.altitude))
+        self.high = high if self.high is None else max(self.high, high)
+        self.low = low if self.low is None else min(self.low, low)
+
+
+class ZoneAccumulator:
+    """Seconds spent at each integer value of a channel (bpm, watts)
+
+    Zone boundaries often arrive after the records (or come from the athlete's
+    settings), so the histogram is kept and zones are applied at the end. It
+    is bounded by the channel's maximum value, not by the number of samples.
+    """
+
+    def __init__(self, column):
+        self.column = column
+        self.histogram = np.zeros(0)
+        self._last_time = np.nan
+        self._last_value = np.nan
+
+    def update(self, chunk):
+        if not len(chunk):
+            return
+        time, values = _column(chunk, 'time'), _column(chunk, self.column)
+        # The previous chunk's last sample lasts until this chunk's first one
+        time = np.concatenate(([self._last_time], time))
+        values = np.concatenate(([self._last_value], values))
+        self._add(values[:-1], sample_durations(time[:-1], time[-1]))
+        self._last_time, self._last_value = time[-1], values[-1]
+
+    def _add(self, values, durations):
+        valid = ~np.isnan(values) & (values >= 0) & (durations > 0)
+        if not valid.any():
+            return
+        counts = np.bincount(np.rint(values[valid]).astype(np.int64), weights=durations[valid])
+        if len(counts) > len(self.histogram):
+            counts[:len(self.histogram)] += self.histogram
+            self.histogram = counts
+        else:
+            self.histogram[:len(counts)] += counts
+
+    def zone_seconds(self, zones):
+        """Seconds per zone for zone dicts with 'min'/'max' (see fit_track.zone_seconds)"""
+        if not zones:
+            return []
+        zone_idx = np.searchsorted(zone_upper_bounds(zones), np.arange(len(self.histogram)), side='left')
+        return np.bincount(zone_idx, weights=self.histogram, minlength=len(zones)).tolist()
+
+
+class DecimatedTrack:
+    """Every `stride`-th point of the stream; the stride doubles whenever the budget is exceeded"""
+
+    def __init__(self, max_points=DEFAULT_TRACK_POINTS):
+        self.max_points = max(2, max_points)
+        self.stride = 1
+        self._offset = 0
+        self._index = [np.zeros(0, dtype=np.int64)]
+        self._columns = {name: [np.zeros(0)] for name in TRACK_COLUMNS}
+        self._kept = 0
+
+    def update(self, chunk):
+        n = len(chunk)
+        if not n:
+            return
+        keep = np.flatnonzero((self._offset + np.arange(n)) % self.stride == 0)
+        self._index.append(self._offset + keep)
+        for name, parts in self._columns.items():
+            parts.append(_column(chunk, name)[keep])
+        self._kept += len(keep)
+        self._offset += n
+
+        while self._kept > self.max_points:
+            self.stride *= 2
+            index = np.concatenate(self._index)
+            keep = index % self.stride == 0
+            self._index = [index[keep]]
+            for name, parts in self._columns.items():
+                self._columns[name] = [np.concatenate(parts)[keep]]
+            self._kept = int(keep.sum())
+
+    def to_track(self):
+        columns = {}
+        for name, parts in self._columns.items():
+            values = np.concatenate(parts)
+            if name == 'time' or not np.isnan(values).all():
+                columns[name] = values
+        return Track.from_columns(columns)
+
+
+class BoundedActivityAggregator:
+    """All bounded aggregators behind one update() per record chunk"""
+
+    def __init__(self, max_track_points=DEFAULT_TRACK_POINTS, split_distances=None):
+        self.record_count = 0
+        self.splits = SplitAccumulator(split_distances)
+        self.best_efforts = BestEffortAccumulator()
+        self.elevation = ElevationAccumulator()
+        self.zones = {name: ZoneAccumulator(column) for name, column in ZONE_CHANNELS.items()}
+        self.track = DecimatedTrack(max_track_points)
+
+    def update(self, records):
+        """Feed one chunk of record columns ({column: ndarray}, like RecordColumnBuilder.to_numpy())"""
+        chunk = Track.from_columns(records)
+        self.record_count += len(chunk)
+        for aggregator in (self.splits, self.best_efforts, self.elevation, self.track, *self.zones.values()):
+            aggregator.update(chunk)
+
+    def results(self, zones=None):
+        """
+        Args:
+            zones (dict, optional): {'heart_rate': [...], 'power': [...]} zone dicts
+
+        Returns:
+            dict: record_count, splits (one list per split distance), best_efforts, elev_high,
+                  elev_low, time_in_zones ({'heart_rate': [seconds], 'power': [seconds]}),
+                  track (decimated Track) and track_stride
+        """
+        zones = zones or {}
+        return {
+            'record_count': self.record_count,
+            'splits': self.splits.results(),
+            'best_efforts': self.best_efforts.results(),
+            'elev_high': self.elevation.high,
+            'elev_low': self.elevation.low,
+            'time_in_zones': {name: accumulator.zone_seconds(zones.get(name))
+                              for name, accumulator in self.zones.items()},
+            'track': self.track.to_track(),
+            'track_stride': self.track.stride
+        }
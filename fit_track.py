@@ -0,0 +1,833 @@
+"""
+Columnar GPS Track for FIT Activities
+
+A Track holds the per-second record stream of an activity as a structure of
+NumPy arrays (one float64 column per channel, NaN = missing) instead of a list
+of per-point dicts. Consumers work on whole columns; the dict view used by
+older code is only built on demand.
+
+COLUMNS:
+========
+    time        epoch seconds (UTC)
+    lat, lng    degrees
+    altitude    meters
+    distance    meters (cumulative)
+    speed       meters/second
+    heartrate   bpm
+    cadence     rpm / spm
+    watts       watts
+    temp        °C
+    grade       %
+
+A column that is absent from the file is None. Missing samples inside a
+present column are NaN; track.mask(name) gives the boolean "has value" mask.
+
+USAGE:
+======
+    track = Track.from_columns({'time': times, 'heartrate': hr, ...})
+
+    len(track)                      # number of points
+    track.heartrate                 # ndarray (no copy)
+    track.mask('heartrate')         # True where a heart rate sample exists
+    first_hour = track[:3600]       # zero-copy slice (views of every column)
+    track.to_dicts()                # [{'time': '2024-...', 'heartrate': 150.0, ...}, ...]
+    for point in track: ...         # same dicts, built lazily one at a time
+
+Downsampling (fixed point budgets for charts and LLM context):
+    keep = lttb_indices(elapsed, track.heartrate, 60)           # shape-preserving time series
+    keep = douglas_peucker_indices(track.lat, track.lng, 40)    # most significant route corners
+
+Best efforts and mean-maximal curves:
+    compute_best_efforts(track)             # [{'name': '5k', 'elapsed_time': 1234, ...}, ...]
+    compute_mean_max(track, 'watts')        # [{'duration': 5, 'value': 412.0}, ...]
+
+Work/recovery blocks from the power or speed stream (lap dicts, like strava_format['laps']):
+    detect_intervals(track)                 # [{'name': 'Interval 1', 'intensity': 'active', ...}, ...]
+
+Time in zones (zones as in strava_format['zones'], laps as (start_epoch, end_epoch)):
+    totals, per_lap = compute_time_in_zones(track, zones, [(lap_start, lap_end), ...])
+    totals['heart_rate']                    # [seconds in zone 1, zone 2, ...]
+"""
+import heapq
+from datetime import datetime, timezone
+
+import numpy as np
+
+TRACK_COLUMNS = ['time', 'lat', 'lng', 'altitude', 'distance', 'speed',
+                 'heartrate', 'cadence', 'watts', 'temp', 'grade']
+
+
+def epoch_to_iso(epoch_seconds):
+    """Convert epoch seconds to a naive UTC ISO string (the format fitparse datetimes produce)"""
+    return datetime.fromtimestamp(epoch_seconds, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class Track:
+    """Structure-of-arrays GPS/sensor track"""
+
+    __slots__ = TRACK_COLUMNS + ['_length', '_masks']
+
+    def __init__(self, length=0, **columns):
+        """
+        Args:
+            length (int): Number of points (used when no column is given)
+            **columns: Column name -> array-like (converted to float64 without copying when possible)
+        """
+        unknown = set(columns) - set(TRACK_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown track columns: {', '.join(sorted(unknown))}")
+
+        for name in TRACK_COLUMNS:
+            values = columns.get(name)
+            setattr(self, name, None if values is None else np.asarray(values, dtype=np.float64))
+
+        lengths = {len(values) for values in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Track columns have different lengths: {sorted(lengths)}")
+        self._length = lengths.pop() if lengths else length
+        self._masks = {}
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Build a Track from a {column: array} dict, ignoring None columns"""
+        return cls(**{name: values for name, values in columns.items() if values is not None})
+
+    @classmethod
+    def from_dicts(cls, points):
+        """Build a Track from the legacy list-of-dicts gps_track"""
+        columns = {}
+        for name in TRACK_COLUMNS:
+            if not any(name in point for point in points):
+                continue
+            if name == 'time':
+                values = [_iso_to_epoch(point.get('time')) for point in points]
+            else:
+                values = [point.get(name) for point in points]
+            columns[name] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        return cls(length=len(points), **columns)
+
+    @property
+    def columns(self):
+        """{name: ndarray} for the columns present in this track"""
+        return {name: getattr(self, name) for name in TRACK_COLUMNS if getattr(self, name) is not None}
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self.columns.values())
+
+    def __len__(self):
+        return self._length
+
+    def __bool__(self):
+        return self._length > 0
+
+    def __repr__(self):
+        return f"Track({self._length} points, columns={list(self.columns)})"
+
+    def has(self, name):
+        """True if the column exists and has at least one sample"""
+        return bool(self.mask(name).any())
+
+    def mask(self, name):
+        """Boolean array, True where the column has a value (computed once per column)"""
+        if name not in self._masks:
+            values = getattr(self, name)
+            self._masks[name] = np.zeros(self._length, dtype=bool) if values is None else ~np.isnan(values)
+        return self._masks[name]
+
+    def __getitem__(self, key):
+        """track[i] -> point dict, track[a:b] -> Track of views (no copy)"""
+        if isinstance(key, slice):
+            sliced = Track(length=len(range(*key.indices(self._length))),
+                           **{name: values[key] for name, values in self.columns.items()})
+            sliced._masks = {name: mask[key] for name, mask in self._masks.items()}
+            return sliced
+        return self._point(range(self._length)[key])
+
+    def _point(self, idx):
+        point = {}
+        for name, values in self.columns.items():
+            value = values[idx]
+            if value == value:  # NaN = missing
+                point[name] = epoch_to_iso(value) if name == 'time' else value.item()
+        return point
+
+    def __iter__(self):
+        """Yield legacy point dicts one at a time"""
+        names = list(self.columns)
+        # Plain Python lists: per-element ndarray indexing is far slower than list access
+        columns = [getattr(self, name).tolist() for name in names]
+        for row in zip(*columns):
+            point = {}
+            for name, value in zip(names, row):
+                if value == value:  # NaN = missing
+                    point[name] = epoch_to_iso(value) if name == 'time' else value
+            yield point
+
+    def to_dicts(self):
+        """Materialize the legacy list-of-dicts gps_track"""
+        return list(self)
+
+
+def _iso_to_epoch(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    parsed = datetime.fromisoformat(str(value).replace('Z', ''))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _cumulative_sum(values):
+    """Prefix sums of a column with NaN as 0, plus prefix counts of valid samples (both length n + 1)"""
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    return sums, counts
+
+
+def _split_boundaries(distance, split_distance_meters):
+    """Indices of the points that close each split (first point at or past k * split distance)
+
+    Matches the point-by-point rule of the original split loop: a split always
+    ends on a later point than the previous one, so a jump across several
+    boundaries in one sample closes one split per point.
+    """
+    if not len(distance) or distance[-1] < split_distance_meters:
+        return np.zeros(0, dtype=np.int64)
+
+    count = int(distance[-1] // split_distance_meters)
+    targets = np.arange(1, count + 1) * split_distance_meters
+    candidates = np.concatenate(([0], np.searchsorted(distance, targets, side='left')))
+
+    # idx[k] = max(candidate[k], idx[k - 1] + 1), vectorized as a running max
+    steps = np.arange(len(candidates))
+    indices = np.maximum.accumulate(candidates - steps) + steps
+    return indices[indices < len(distance)]
+
+
+def compute_splits(track, split_distances):
+    """Vectorized splits for one or more split lengths over a track
+
+    Boundaries are found with np.searchsorted on cumulative distance and the
+    per-split time, speed, elevation change and mean heart rate come from
+    differences of cumulative sums, so each split length costs O(n) NumPy work
+    regardless of how many splits there are.
+
+    Args:
+        track (Track): Track with distance (and optionally time, altitude, heartrate)
+        split_distances (list): Split lengths in meters, e.g. [1609.34, 1000.0]
+
+    Returns:
+        list: One list of Strava-format split dicts per requested split length
+    """
+    if track.distance is None or not len(track):
+        return [[] for _ in split_distances]
+
+    # Missing distance samples carry the last known distance (0 before the first one)
+    distance = np.fmax.accumulate(track.distance)
+    distance = np.where(np.isnan(distance), 0.0, distance)
+
+    time = track.time if track.time is not None else np.full(len(track), np.nan)
+    altitude = track.altitude if track.altitude is not None else np.full(len(track), np.nan)
+    hr_sums, hr_counts = _cumulative_sum(track.heartrate) if track.heartrate is not None else (None, None)
+
+    results = []
+    for split_distance_meters in split_distances:
+        boundaries = _split_boundaries(distance, split_distance_meters)
+        if hr_sums is not None:
+            hr_before = (hr_sums[boundaries], hr_counts[boundaries])
+            hr_through = (hr_sums[boundaries + 1], hr_counts[boundaries + 1])
+        else:
+            hr_before = hr_through = (np.zeros(len(boundaries)), np.zeros(len(boundaries)))
+        results.append(_splits_from_boundaries(
+            split_distance_meters, time[boundaries], distance[boundaries], altitude[boundaries], hr_before, hr_through
+        ))
+
+    return results
+
+
+def _splits_from_boundaries(split_distance_meters, time, distance, altitude, hr_before, hr_through):
+    """Strava-format split dicts from the track values at consecutive split boundary points
+
+    Args:
+        split_distance_meters (float): Split length
+        time, distance, altitude (ndarray): Values at each boundary point
+        hr_before (tuple): (HR sum, HR sample count) over all points before each boundary point
+        hr_through (tuple): The same sums including the boundary point itself
+
+    Returns:
+        list: One split per pair of consecutive boundaries
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        elapsed = time[1:] - time[:-1]
+        elapsed = np.where(np.isnan(elapsed), 0.0, elapsed)
+        average_speed = np.where(elapsed > 0, (distance[1:] - distance[:-1]) / elapsed, 0.0)
+        elevation = altitude[1:] - altitude[:-1]
+        elevation = np.where(np.isnan(elevation), 0.0, elevation)
+        # Mean HR over the inclusive point range [start, end]
+        hr_count = hr_through[1][1:] - hr_before[1][:-1]
+        hr_mean = (hr_through[0][1:] - hr_before[0][:-1]) / hr_count
+
+    splits = []
+    for idx, (seconds, speed, elevation_diff, count, avg_hr) in enumerate(zip(
+            elapsed.tolist(), average_speed.tolist(), elevation.tolist(), hr_count.tolist(), hr_mean.tolist())):
+        splits.append({
+            'distance': split_distance_meters,
+            'elapsed_time': int(seconds),
+            'moving_time': int(seconds),
+            'split': idx + 1,
+            'average_speed': speed,
+            'elevation_difference': elevation_diff,
+            'average_heartrate': avg_hr if count else None,
+            'pace_zone': 0
+        })
+    return splits
+
+
+def lttb_indices(x, y, max_points):
+    """Largest-Triangle-Three-Buckets downsampling of a series
+
+    Keeps the first and last point and, for every one of max_points - 2 equal
+    buckets in between, the point forming the largest triangle with the point
+    kept from the previous bucket and the mean of the next bucket. Peaks,
+    troughs and surges survive where plain decimation would skip them. One
+    NumPy pass per bucket, so the cost is O(n) for any budget.
+
+    Args:
+        x (ndarray): Increasing x values (e.g. elapsed seconds), no NaN
+        y (ndarray): Values at x, no NaN
+        max_points (int): Number of points to keep (at least 3 to do any work)
+
+    Returns:
+        ndarray: Sorted indices of the kept points
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    # Bucket edges over the interior points 1 .. n - 2
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    indices = np.empty(max_points, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], max(edges[bucket + 2], edges[bucket + 1] + 1)
+            next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        # Twice the triangle area (previous kept point, candidate, next bucket mean)
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        indices[bucket + 1] = previous
+    return indices
+
+
+def douglas_peucker_indices(lat, lng, max_points):
+    """Douglas-Peucker route simplification to a fixed point budget
+
+    Instead of a distance tolerance, segments are split in order of their
+    largest perpendicular deviation (a max-heap), so the max_points - 2 most
+    significant corners of the route are kept whatever its length or shape.
+    Distances use a local equirectangular projection, which is accurate to
+    well under a meter over the span of one activity.
+
+    Args:
+        lat (ndarray): Latitudes in degrees, no NaN
+        lng (ndarray): Longitudes in degrees, no NaN
+        max_points (int): Number of points to keep
+
+    Returns:
+        ndarray: Sorted indices of the kept points
+    """
+    n = len(lat)
+    if max_points >= n or max_points < 2:
+        return np.arange(n)
+
+    meters_per_degree = 6371000.0 * np.pi / 180.0
+    y = lat * meters_per_degree
+    x = lng * meters_per_degree * np.cos(np.radians(np.mean(lat)))
+
+    def farthest(start, end):
+        """(distance, index) of the point in (start, end) farthest from the chord start-end"""
+        if end - start < 2:
+            return 0.0, None
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        chord = np.hypot(dx, dy)
+        if chord > 0:
+            distances = np.abs(dx * py - dy * px) / chord
+        else:
+            distances = np.hypot(px, py)  # Loop back to the start point
+        offset = int(np.argmax(distances))
+        return float(distances[offset]), start + 1 + offset
+
+    kept = [0, n - 1]
+    distance, index = farthest(0, n - 1)
+    heap = [(-distance, 0, n - 1, index)]
+    while heap and len(kept) < max_points:
+        negative_distance, start, end, index = heapq.heappop(heap)
+        if index is None or negative_distance == 0:
+            break
+        kept.append(index)
+        for segment_start, segment_end in ((start, index), (index, end)):
+            distance, split = farthest(segment_start, segment_end)
+            if split is not None:
+                heapq.heappush(heap, (-distance, segment_start, segment_end, split))
+    return np.array(sorted(kept), dtype=np.int64)
+
+
+# Standard best-effort distances (meters), named as on Strava
+BEST_EFFORT_DISTANCES = [('400m', 400.0), ('1k', 1000.0), ('1 mile', 1609.34), ('5k', 5000.0), ('10k', 10000.0)]
+# Mean-maximal curve durations (seconds)
+MEAN_MAX_DURATIONS = [5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 5400, 7200]
+# Gaps between samples longer than this count as stopped (no power, no heart rate)
+MAX_SAMPLE_GAP_SECONDS = 10.0
+
+
+def compute_best_efforts(track, distances=None):
+    """Fastest time over each standard distance anywhere in the track
+
+    For every end point j the start point is the last one at least the target
+    distance behind it. That start only moves forward as j does (the classic
+    two-pointer sweep); here the whole sweep is done at once with
+    np.searchsorted on cumulative distance, so each distance costs O(n log n)
+    NumPy work instead of a Python loop.
+
+    Args:
+        track (Track): Track with distance and time
+        distances (list, optional): (name, meters) pairs, defaults to BEST_EFFORT_DISTANCES
+
+    Returns:
+        list: Strava-style best effort dicts (name, distance, elapsed_time, moving_time,
+              start_index, end_index, start_date) for the distances the track covers
+    """
+    if track.distance is None or track.time is None or not len(track):
+        return []
+
+    valid = track.mask('distance') & track.mask('time')
+    point_index = np.flatnonzero(valid)
+    if len(point_index) < 2:
+        return []
+    # Cumulative distance can dip on GPS noise; the running max keeps it sorted for searchsorted
+    distance = np.maximum.accumulate(track.distance[valid])
+    time = track.time[valid]
+
+    efforts = []
+    for name, meters in distances or BEST_EFFORT_DISTANCES:
+        if distance[-1] - distance[0] < meters:
+            continue
+        # starts[j] = last i with distance[i] <= distance[j] - meters (-1 = none yet)
+        starts = np.searchsorted(distance, distance - meters, side='right') - 1
+        ends = np.flatnonzero(starts >= 0)
+        elapsed = time[ends] - time[starts[ends]]
+        best = int(np.argmin(elapsed))
+        start, end = int(starts[ends[best]]), int(ends[best])
+        efforts.append({
+            'name': name,
+            'distance': meters,
+            'elapsed_time': int(round(elapsed[best])),
+            'moving_time': int(round(elapsed[best])),
+            'start_index': int(point_index[start]),
+            'end_index': int(point_index[end]),
+            'start_date': epoch_to_iso(time[start])
+        })
+    return efforts
+
+
+def _one_hz_series(time, values, fill):
+    """Resample a sample stream onto a 1 second grid (last value carried forward)
+
+    Grid seconds more than MAX_SAMPLE_GAP_SECONDS after the previous sample get `fill`.
+    """
+    grid = np.arange(time[0], time[-1] + 1.0)
+    previous = np.searchsorted(time, grid, side='right') - 1
+    series = values[previous]
+    return np.where(grid - time[previous] > MAX_SAMPLE_GAP_SECONDS, fill, series)
+
+
+def compute_mean_max(track, column, durations=None):
+    """Mean-maximal curve of one channel: the best average over every window length
+
+    The channel is resampled to 1 Hz, then every window of each duration is
+    averaged at once from a cumulative sum (O(n) per duration). Power treats
+    stopped time as 0 W; heart rate windows must be at least 90% covered.
+
+    Args:
+        track (Track): Track with time and the channel
+        column (str): 'watts' or 'heartrate' (any track column works)
+        durations (list, optional): Window lengths in seconds, defaults to MEAN_MAX_DURATIONS
+
+    Returns:
+        list: [{'duration': seconds, 'value': best average}] for the durations the track covers
+    """
+    values = getattr(track, column)
+    if values is None or track.time is None:
+        return []
+    valid = track.mask('time') & track.mask(column)
+    if valid.sum() < 2:
+        return []
+
+    time = track.time[valid]
+    order = np.argsort(time, kind='stable')
+    is_power = column == 'watts'
+    series = _one_hz_series(time[order], values[valid][order], 0.0 if is_power else np.nan)
+    sums, counts = _cumulative_sum(series)
+
+    curve = []
+    for duration in durations or MEAN_MAX_DURATIONS:
+        if duration > len(series):
+            break
+        window_sums = sums[duration:] - sums[:-duration]
+        window_counts = counts[duration:] - counts[:-duration]
+        if not is_power:
+            window_sums = np.where(window_counts >= 0.9 * duration, window_sums, -np.inf)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            best = int(np.argmax(window_sums / np.maximum(window_counts, 1)))
+        if not np.isfinite(window_sums[best]):
+            continue
+        curve.append({'duration': duration, 'value': float(window_sums[best] / window_counts[best])})
+    return curve
+
+
+def sample_durations(time, next_time=np.nan, max_gap=MAX_SAMPLE_GAP_SECONDS):
+    """Seconds each sample stands for: the gap to the following sample
+
+    Gaps longer than `max_gap` (pauses), non-increasing or missing times and
+    the last sample count as 0, so the durations of a continuous recording
+    add up to its elapsed time.
+
+    Args:
+        time (ndarray): Sample times in epoch seconds
+        next_time (float): Time of the sample after the last one, if known (chunked processing)
+        max_gap (float): Longest gap still counted (raise it for decimated tracks)
+    """
+    durations = np.diff(time, append=next_time)
+    with np.errstate(invalid='ignore'):
+        return np.where((durations > 0) & (durations <= max_gap), durations, 0.0)
+
+
+def zone_upper_bounds(zones):
+    """Inclusive upper bound of each zone ([{'min', 'max'}, ...]); the last zone is open-ended"""
+    bounds = []
+    for idx, zone in enumerate(zones):
+        upper = zone.get('max')
+        if upper is None and idx + 1 < len(zones):
+            upper = zones[idx + 1].get('min')
+        bounds.append(np.inf if upper is None else float(upper))
+    if bounds:
+        bounds[-1] = np.inf
+    return np.array(bounds)
+
+
+def zone_seconds(values, durations, zones):
+    """Seconds spent in each zone
+
+    Args:
+        values (ndarray): Channel samples (NaN = missing)
+        durations (ndarray): Seconds per sample (see sample_durations)
+        zones (list): Zone dicts with 'min'/'max' (e.g. strava_format['zones']['heart_rate'])
+
+    Returns:
+        list: Seconds per zone, in zone order
+    """
+    if not zones:
+        return []
+    valid = ~np.isnan(values)
+    zone_idx = np.searchsorted(zone_upper_bounds(zones), values[valid], side='left')
+    return np.bincount(zone_idx, weights=durations[valid], minlength=len(zones)).tolist()
+
+
+ZONE_CHANNELS = {'heart_rate': 'heartrate', 'power': 'watts'}  # strava_format['zones'] key -> Track column
+
+
+def compute_time_in_zones(track, zones, intervals=None, max_gap=MAX_SAMPLE_GAP_SECONDS):
+    """Seconds per heart rate and power zone for the whole track and per interval
+
+    Each sample is weighted by its duration (sample_durations) and binned with
+    one searchsorted per channel; per-interval totals come from a single
+    bincount over (interval, zone) pairs.
+
+    Args:
+        track (Track): Columnar track
+        zones (dict): {'heart_rate': [...], 'power': [...]} zone dicts with 'min'/'max'
+        intervals (list, optional): (start_epoch, end_epoch) per lap (end = the lap's last
+                                    timestamp, None = open-ended); a sample belongs to the
+                                    latest interval with start <= time <= end
+        max_gap (float): Longest sample gap counted (see sample_durations)
+
+    Returns:
+        tuple: ({'heart_rate': [seconds], 'power': [seconds]}, one such dict per interval);
+               channels without zones get []
+    """
+    intervals = intervals or []
+    totals = {name: [] for name in ZONE_CHANNELS}
+    per_interval = [{name: [] for name in ZONE_CHANNELS} for _ in intervals]
+    if not track or not any(zones.get(name) for name in ZONE_CHANNELS):
+        return totals, per_interval
+
+    durations = sample_durations(track.time, max_gap=max_gap)
+    interval_idx = None
+    if intervals:
+        starts = np.array([np.nan if start is None else start for start, _ in intervals], dtype=np.float64)
+        ends = np.array([np.inf if end is None else end for _, end in intervals], dtype=np.float64)
+        order = np.argsort(starts, kind='stable')  # NaN starts sort last and never match
+        position = np.searchsorted(starts[order], track.time, side='right') - 1
+        interval_idx = order[np.maximum(position, 0)]
+        with np.errstate(invalid='ignore'):
+            interval_idx = np.where((position >= 0) & (track.time <= ends[interval_idx]), interval_idx, -1)
+
+    for name, column in ZONE_CHANNELS.items():
+        channel_zones = zones.get(name)
+        if not channel_zones:
+            continue
+        values = getattr(track, column)
+        if values is None:
+            values = np.full(len(track), np.nan)
+        totals[name] = zone_seconds(values, durations, channel_zones)
+        if interval_idx is None:
+            continue
+        n_zones = len(channel_zones)
+        valid = ~np.isnan(values) & (interval_idx >= 0)
+        zone_idx = np.searchsorted(zone_upper_bounds(channel_zones), values[valid], side='left')
+        seconds = np.bincount(interval_idx[valid] * n_zones + zone_idx, weights=durations[valid],
+                              minlength=len(intervals) * n_zones).reshape(len(intervals), n_zones)
+        for lap_zones, row in zip(per_interval, seconds.tolist()):
+            lap_zones[name] = row
+
+    return totals, per_interval
+
+
+# Interval detection (detect_intervals)
+INTERVAL_SMOOTH_SECONDS = 20.0   # Centered moving-average window applied before segmentation
+MIN_INTERVAL_SECONDS = 30.0      # Shorter work/recovery blocks are merged into their neighbour
+MIN_INTERVAL_CONTRAST = 1.15     # Work level / recovery level below this = steady effort, no intervals
+# lap_trigger values of laps the device closed on its own (they say nothing about the workout)
+AUTO_LAP_TRIGGERS = {'distance', 'time', 'position_start', 'position_lap', 'position_waypoint',
+                     'position_marked', 'session_end'}
+
+
+def has_structured_laps(laps):
+    """True if the laps mark the workout's structure (manual laps or work/rest intensities)"""
+    return any(str(lap.get('intensity') or 'active').lower() != 'active'
+               or str(lap.get('lap_trigger') or '').lower() not in AUTO_LAP_TRIGGERS for lap in laps)
+
+
+def _moving_average(values, window):
+    """Centered moving average over `window` samples, ignoring NaN (NaN where a window has no data)"""
+    sums, counts = _cumulative_sum(values)
+    n = len(values)
+    half = window // 2
+    lo = np.clip(np.arange(n) - half, 0, n)
+    hi = np.clip(np.arange(n) + window - half, 0, n)
+    window_counts = counts[hi] - counts[lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_counts > 0, (sums[hi] - sums[lo]) / window_counts, np.nan)
+
+
+def _two_level_threshold(values, bins=256):
+    """Otsu threshold of a sample distribution (max between-class variance), linear time
+
+    Returns:
+        tuple: (threshold, low class mean, high class mean), or None for a flat signal
+    """
+    values = values[~np.isnan(values)]
+    if len(values) < 2:
+        return None
+    low, high = np.percentile(values, [1, 99])
+    if high <= low:
+        return None
+    counts, edges = np.histogram(np.clip(values, low, high), bins=bins, range=(low, high))
+    centers = (edges[:-1] + edges[1:]) / 2
+    weight = np.cumsum(counts)[:-1].astype(np.float64)
+    mass = np.cumsum(counts * centers)
+    rest = len(values) - weight
+    with np.errstate(invalid='ignore', divide='ignore'):
+        low_mean = mass[:-1] / weight
+        high_mean = (mass[-1] - mass[:-1]) / rest
+        between = np.where((weight > 0) & (rest > 0), weight * rest * (high_mean - low_mean) ** 2, -1.0)
+    k = int(np.argmax(between))
+    if between[k] <= 0:
+        return None
+    return float(edges[k + 1]), float(low_mean[k]), float(high_mean[k])
+
+
+def _merge_short_runs(starts, states, run_seconds, min_seconds):
+    """Absorb runs shorter than `min_seconds` into the previous run and join equal neighbours (one pass)
+
+    Returns:
+        tuple: (starts, states) of the merged runs
+    """
+    merged_starts, merged_states, merged_seconds = [], [], []
+    for start, state, seconds in zip(starts.tolist(), states.tolist(), run_seconds.tolist()):
+        if merged_states and (seconds < min_seconds or state == merged_states[-1]):
+            merged_seconds[-1] += seconds
+            continue
+        if merged_states and merged_seconds[-1] < min_seconds:
+            # A short leading run takes the state of the run after it
+            merged_states[-1] = state
+            merged_seconds[-1] += seconds
+            continue
+        merged_starts.append(start)
+        merged_states.append(state)
+        merged_seconds.append(seconds)
+    # Absorbing a short run can leave equal neighbours behind; one more pass joins them
+    keep = [0] + [idx for idx in range(1, len(merged_states)) if merged_states[idx] != merged_states[idx - 1]]
+    return np.array([merged_starts[idx] for idx in keep], dtype=np.int64), np.array([merged_states[idx] for idx in keep])
+
+
+def _segment_mean_max(values, starts):
+    """Per-segment mean and max of a column (NaN ignored; None where a segment has no data)"""
+    if values is None:
+        return [None] * len(starts), [None] * len(starts)
+    valid = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+    counts = np.add.reduceat(valid.astype(np.int64), starts)
+    maxima = np.fmax.reduceat(values, starts)
+    means = [float(total / count) if count else None for total, count in zip(sums.tolist(), counts.tolist())]
+    return means, [None if value != value else float(value) for value in maxima.tolist()]
+
+
+def detect_intervals(track, column=None, smooth_seconds=INTERVAL_SMOOTH_SECONDS,
+                     min_interval_seconds=MIN_INTERVAL_SECONDS, min_contrast=MIN_INTERVAL_CONTRAST):
+    """Find work and recovery blocks from the power or speed stream
+
+    Two-level change-point segmentation in linear time: the signal is
+    smoothed with a centered moving average (cumsum), split into a work and
+    a recovery level at the Otsu threshold of its distribution, and labelled
+    with hysteresis (a change point needs the signal to cross a band around
+    the threshold, so noise near it does not flip the state). Blocks shorter
+    than `min_interval_seconds` are merged into their neighbour. Windows and
+    durations are in seconds, so decimated tracks work too.
+
+    Args:
+        track (Track): Track with time and watts or speed (or distance)
+        column (str, optional): 'watts' or 'speed'; default watts when at least half the
+                                samples have power, falling back to speed when power
+                                gives no split (flat or unreliable power), else speed
+        smooth_seconds (float): Moving-average window
+        min_interval_seconds (float): Shortest work or recovery block kept
+        min_contrast (float): Min work / recovery level ratio for a structured workout
+
+    Returns:
+        list: Lap dicts in the strava_format['laps'] layout (intensity 'active' for work blocks,
+              'warmup' / 'recovery' / 'cooldown' otherwise, lap_trigger 'detected');
+              [] for steady efforts or tracks without a usable signal
+    """
+    if track.time is None or len(track) < 3:
+        return []
+    time = track.time
+    if column is None:
+        if track.has('watts') and track.mask('watts').mean() >= 0.5:
+            intervals = detect_intervals(track, 'watts', smooth_seconds, min_interval_seconds, min_contrast)
+            if intervals:
+                return intervals
+        return detect_intervals(track, 'speed', smooth_seconds, min_interval_seconds, min_contrast)
+    distance = np.fmax.accumulate(track.distance) if track.distance is not None else None
+    if column == 'speed' and track.speed is None:
+        if distance is None:
+            return []
+        with np.errstate(invalid='ignore', divide='ignore'):
+            signal = np.diff(distance, append=np.nan) / np.diff(time, append=np.nan)
+    else:
+        signal = getattr(track, column)
+        if signal is None:
+            return []
+
+    step = float(np.nanmedian(np.diff(time)))
+    if not step > 0:
+        return []
+    smooth = _moving_average(signal, max(1, int(round(smooth_seconds / step))))
+    levels = _two_level_threshold(smooth)
+    if levels is None:
+        return []
+    threshold, low_level, high_level = levels
+    if high_level <= 0 or (low_level > 0 and high_level / low_level < min_contrast):
+        return []
+
+    # Hysteresis: 1 above the upper band, 0 below the lower band, else the last state (forward fill)
+    upper = threshold + 0.25 * (high_level - threshold)
+    lower = threshold - 0.25 * (threshold - low_level)
+    with np.errstate(invalid='ignore'):
+        events = np.where(smooth >= upper, 1, np.where(smooth <= lower, 0, -1))
+    if events[0] < 0:
+        events[0] = 1 if smooth[0] > threshold else 0
+    last_event = np.maximum.accumulate(np.where(events >= 0, np.arange(len(events)), 0))
+    state = events[last_event]
+
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(state)) + 1))
+    boundary_times = np.append(time[starts], time[-1])
+    starts, states = _merge_short_runs(starts, state[starts], np.diff(boundary_times), min_interval_seconds)
+    if int(states.sum()) < 2:
+        return []  # A single hard block is a tempo effort, not intervals
+
+    # The band delays each change point; move it back to the threshold crossing before it
+    crossings = np.flatnonzero(np.diff(smooth > threshold)) + 1
+    if len(crossings) and len(starts) > 1:
+        previous = np.searchsorted(crossings, starts[1:], side='right') - 1
+        refined = np.where(previous >= 0, crossings[np.maximum(previous, 0)], starts[1:])
+        if np.all(np.diff(np.concatenate(([0], refined))) > 0):
+            starts = np.concatenate(([0], refined))
+
+    ends = np.append(starts[1:], len(time)) - 1
+    boundary_times = np.append(time[starts], time[-1])
+    elapsed = np.diff(boundary_times)
+    moving = np.add.reduceat(sample_durations(time), starts)
+    if distance is not None:
+        filled = np.where(np.isnan(distance), 0.0, distance)
+        block_distance = np.diff(np.append(filled[starts], filled[-1]))
+    else:
+        block_distance = np.zeros(len(starts))
+    if track.altitude is not None:
+        climb = np.diff(track.altitude, prepend=np.nan)
+        gain = np.add.reduceat(np.where(climb > 0, climb, 0.0), starts)
+    else:
+        gain = np.zeros(len(starts))
+
+    speed_values = track.speed if track.speed is not None else (signal if column == 'speed' else None)
+    _, max_speed = _segment_mean_max(speed_values, starts)
+    avg_hr, max_hr = _segment_mean_max(track.heartrate, starts)
+    avg_cadence, _ = _segment_mean_max(track.cadence, starts)
+    avg_watts, max_watts = _segment_mean_max(track.watts, starts)
+
+    laps = []
+    work_count = recovery_count = 0
+    for idx, start in enumerate(starts.tolist()):
+        if states[idx]:
+            work_count += 1
+            intensity, name = 'active', f"Interval {work_count}"
+        elif idx == 0:
+            intensity, name = 'warmup', 'Warm-up'
+        elif idx == len(starts) - 1:
+            intensity, name = 'cooldown', 'Cool-down'
+        else:
+            recovery_count += 1
+            intensity, name = 'recovery', f"Recovery {recovery_count}"
+        seconds = float(moving[idx]) or float(elapsed[idx])
+        laps.append({
+            'id': idx + 1,
+            'name': name,
+            'elapsed_time': round(float(elapsed[idx]), 1),
+            'moving_time': round(float(moving[idx]), 1),
+            'distance': round(float(block_distance[idx]), 1),
+            'start_index': epoch_to_iso(time[start]),
+            'end_index': epoch_to_iso(time[ends[idx]]),
+            'average_speed': round(float(block_distance[idx]) / seconds, 3) if seconds else 0,
+            'max_speed': max_speed[idx] or 0,
+            'average_heartrate': avg_hr[idx] and round(avg_hr[idx], 1),
+            'max_heartrate': max_hr[idx],
+            'average_cadence': avg_cadence[idx] and round(avg_cadence[idx], 1),
+            'average_watts': avg_watts[idx] and round(avg_watts[idx], 1),
+            'max_watts': max_watts[idx],
+            'total_elevation_gain': round(float(gain[idx]), 1),
+            'calories': 0,
+            'intensity': intensity,
+            'lap_trigger': 'detected'
+        })
+    return laps
@@ -0,0 +1,213 @@
+"""
+LLM Provider Routing with Failover and Hedged Requests
+
+Keeps rolling latency and error statistics per (provider, model) and routes
+analysis requests across the configured providers:
+
+- FAILOVER: if the primary provider raises an error, the next candidate is
+  tried immediately.
+- HEDGING: if the primary has not answered after `hedge_delay` seconds, the
+  same prompt is sent to a second candidate and whichever answers first wins.
+  The slower request is left to finish in the background (its result is only
+  used to update the stats).
+
+USAGE:
+======
+    router = LLMRouter(hedge_delay=8.0)
+    text, provider, model = router.route(
+        [('groq', 'llama-3.3-70b-versatile'), ('gemini', 'gemini-2.0-flash-exp')],
+        call_llm,              # call_llm(provider, model, system_prompt, prompt) -> str
+        system_prompt,
+        prompt
+    )
+    router.record_usage('groq', 'llama-3.3-70b-versatile', prompt_tokens=1800, cached_tokens=1536)
+    router.get_stats()         # JSON-serializable stats per provider/model
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class ProviderStats:
+    """Rolling latency/error window for one (provider, model) pair"""
+
+    def __init__(self, window_size=50):
+        self.samples = deque(maxlen=window_size)  # (latency_seconds, ok)
+        self.total_requests = 0
+        self.total_errors = 0
+        self.last_error = None
+        self.last_error_at = None
+        # Provider-reported token usage (cached_tokens = prompt tokens served from the prompt cache)
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+
+    def record(self, latency, ok, error=None):
+        self.samples.append((latency, ok))
+        self.total_requests += 1
+        if not ok:
+            self.total_errors += 1
+            self.last_error = str(error) if error else None
+            self.last_error_at = time.time()
+
+    def record_usage(self, prompt_tokens, cached_tokens, completion_tokens):
+        self.prompt_tokens += prompt_tokens or 0
+        self.cached_tokens += cached_tokens or 0
+        self.completion_tokens += completion_tokens or 0
+
+    def error_rate(self):
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def latency_percentile(self, percentile):
+        latencies = sorted(latency for latency, ok in self.samples if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(percentile / 100.0 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def to_dict(self):
+        return {
+            'window_requests': len(self.samples),
+            'total_requests': self.total_requests,
+            'total_errors': self.total_errors,
+            'error_rate': round(self.error_rate(), 3),
+            'p50_latency': self.latency_percentile(50),
+            'p95_latency': self.latency_percentile(95),
+            'last_error': self.last_error,
+            'last_error_at': self.last_error_at,
+            'prompt_tokens': self.prompt_tokens,
+            'cached_tokens': self.cached_tokens,
+            'completion_tokens': self.completion_tokens,
+            'cache_hit_ratio': round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else None
+        }
+
+
+class LLMRouter:
+    """Route LLM calls across providers with failover and hedging"""
+
+    def __init__(self, hedge_delay=8.0, hedging_enabled=True, failover_enabled=True,
+                 window_size=50, max_workers=8):
+        """
+        Args:
+            hedge_delay (float): Seconds to wait on a request before hedging to the next candidate
+            hedging_enabled (bool): Send a hedged request when the primary is slow
+            failover_enabled (bool): Try the next candidate when a request errors
+            window_size (int): Number of recent requests kept per provider/model
+            max_workers (int): Max concurrent LLM calls (including in-flight losers of a hedge)
+        """
+        self.hedge_delay = hedge_delay
+        self.hedging_enabled = hedging_enabled
+        self.failover_enabled = failover_enabled
+        self.window_size = window_size
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-router')
+
+    def _get_stats(self, provider, model):
+        key = (provider, model)
+        with self._lock:
+            if key not in self._stats:
+                self._stats[key] = ProviderStats(self.window_size)
+            return self._stats[key]
+
+    def _timed_call(self, call_fn, provider, model, system_prompt, prompt):
+        stats = self._get_stats(provider, model)
+        start = time.monotonic()
+        try:
+            result = call_fn(provider, model, system_prompt, prompt)
+        except Exception as e:
+            with self._lock:
+                stats.record(time.monotonic() - start, False, e)
+            raise
+        with self._lock:
+            stats.record(time.monotonic() - start, True)
+        return result
+
+    def order_candidates(self, candidates):
+        """Keep the first (user-selected) candidate first, sort fallbacks by health
+
+        Fallbacks with a lower recent error rate, then lower p95 latency, are tried first.
+        """
+        if len(candidates) <= 1:
+            return list(candidates)
+
+        def health_key(candidate):
+            stats = self._get_stats(*candidate)
+            with self._lock:
+                p95 = stats.latency_percentile(95)
+                return (stats.error_rate(), p95 if p95 is not None else 0.0)
+
+        primary, fallbacks = candidates[0], candidates[1:]
+        return [primary] + sorted(fallbacks, key=health_key)
+
+    def route(self, candidates, call_fn, system_prompt, prompt):
+        """Call the first candidate, hedging and failing over to the others
+
+        Args:
+            candidates (list): (provider, model) tuples, primary first
+            call_fn (callable): call_fn(provider, model, system_prompt, prompt) -> str
+            system_prompt (str): System instructions
+            prompt (str): User message
+
+        Returns:
+            tuple: (result, provider, model) from the first successful candidate
+
+        Raises:
+            Exception: The last error if every candidate failed
+        """
+        if not candidates:
+            raise ValueError("No LLM providers configured")
+
+        pending_candidates = self.order_candidates(candidates)
+        in_flight = {}
+        last_error = None
+
+        def launch_next():
+            provider, model = pending_candidates.pop(0)
+            future = self._executor.submit(self._timed_call, call_fn, provider, model, system_prompt, prompt)
+            in_flight[future] = (provider, model)
+
+        launch_next()
+
+        while in_flight:
+            can_hedge = self.hedging_enabled and pending_candidates
+            timeout = self.hedge_delay if can_hedge else None
+            done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # Nothing answered within the hedge delay - race another provider
+                print(f"[LLM Router] No response after {self.hedge_delay}s, hedging to {pending_candidates[0]}")
+                launch_next()
+                continue
+
+            for future in done:
+                provider, model = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    print(f"[LLM Router] {provider}/{model} failed: {e}")
+                    if self.failover_enabled and pending_candidates:
+                        launch_next()
+                    continue
+
+                if in_flight:
+                    losers = ', '.join(f"{p}/{m}" for p, m in in_flight.values())
+                    print(f"[LLM Router] {provider}/{model} won the hedge (still running: {losers})")
+                return result, provider, model
+
+        raise last_error
+
+    def record_usage(self, provider, model, prompt_tokens=0, cached_tokens=0, completion_tokens=0):
+        """Accumulate provider-reported token counts for a (provider, model) pair"""
+        stats = self._get_stats(provider, model)
+        with self._lock:
+            stats.record_usage(prompt_tokens, cached_tokens, completion_tokens)
+
+    def get_stats(self):
+        """Return JSON-serializable rolling stats keyed by 'provider/model'"""
+        with self._lock:
+            return {f"{provider}/{model}": stats.to_dict() for (provider, model), stats in self._stats.items()}
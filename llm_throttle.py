@@ -0,0 +1,214 @@
+"""
+Per-Provider Admission Control for LLM Calls
+
+In-process throttling in front of each LLM provider so bursts queue locally
+instead of triggering provider 429 storms that burn free-tier quota:
+
+- CONCURRENCY: a semaphore caps simultaneous calls per provider
+- REQUESTS PER MINUTE: token bucket refilled continuously
+- TOKENS PER MINUTE: token bucket charged with the estimated prompt size and
+  reconciled with the provider-reported usage after the call
+- BOUNDED WAIT: a request that cannot be admitted within `max_wait` seconds
+  raises ThrottleTimeout (the router then fails over to another provider)
+
+A limit of 0 means unlimited.
+
+USAGE:
+======
+    controller = AdmissionController(max_wait=30)
+    controller.configure('groq', max_concurrent=4, requests_per_minute=30, tokens_per_minute=12000)
+
+    with controller.admit('groq', estimated_tokens=2500) as ticket:
+        response = client.chat.completions.create(...)
+        ticket.actual_tokens = response.usage.total_tokens
+
+    controller.get_metrics()  # queue depth, in flight, waits, rejections per provider
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ThrottleTimeout(Exception):
+    """Raised when a request waits longer than the admission timeout"""
+
+
+class TokenBucket:
+    """Continuously refilled token bucket (capacity = one minute of budget)"""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        self.level = min(self.capacity, self.level + elapsed * self.per_minute / 60.0)
+        self.updated_at = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` can be taken (0 if available now). Caller holds the lock."""
+        if not self.per_minute:
+            return 0.0
+        self._refill(now)
+        # Requests larger than the whole bucket are admitted once the bucket is full
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60.0 / self.per_minute
+
+    def take(self, amount):
+        if self.per_minute:
+            self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta):
+        """Charge (positive) or refund (negative) tokens after the fact; may go into debt"""
+        if self.per_minute:
+            self.level = min(self.capacity, self.level - delta)
+
+
+class AdmissionTicket:
+    """Handle for an admitted request; set actual_tokens to reconcile the TPM bucket"""
+
+    def __init__(self, estimated_tokens):
+        self.estimated_tokens = estimated_tokens
+        self.actual_tokens = None
+        self.wait_seconds = 0.0
+
+
+class ProviderLimiter:
+    """Concurrency + RPM + TPM limits for one provider"""
+
+    def __init__(self, max_concurrent=0, requests_per_minute=0, tokens_per_minute=0):
+        self.max_concurrent = max_concurrent
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._semaphore = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+        self._request_bucket = TokenBucket(requests_per_minute)
+        self._token_bucket = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+
+    def acquire(self, estimated_tokens, max_wait):
+        """Block until admitted or raise ThrottleTimeout after max_wait seconds
+
+        Returns:
+            AdmissionTicket: Ticket for the admitted request
+        """
+        ticket = AdmissionTicket(estimated_tokens)
+        start = time.monotonic()
+        deadline = start + max_wait
+
+        with self._lock:
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+        holds_semaphore = False
+        try:
+            if self._semaphore is not None:
+                holds_semaphore = self._semaphore.acquire(timeout=max(0.0, deadline - time.monotonic()))
+                if not holds_semaphore:
+                    raise ThrottleTimeout(f"No free concurrency slot within {max_wait}s")
+
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    wait = max(self._request_bucket.wait_time(1, now),
+                               self._token_bucket.wait_time(estimated_tokens, now))
+                    if wait == 0.0:
+                        self._request_bucket.take(1)
+                        self._token_bucket.take(estimated_tokens)
+                        break
+                remaining = deadline - time.monotonic()
+                if wait > remaining:
+                    raise ThrottleTimeout(f"Rate limit budget not available within {max_wait}s")
+                time.sleep(min(wait, 0.25))
+        except ThrottleTimeout:
+            if holds_semaphore:
+                self._semaphore.release()
+            with self._lock:
+                self.queue_depth -= 1
+                self.rejected += 1
+            raise
+
+        ticket.wait_seconds = time.monotonic() - start
+        with self._lock:
+            self.queue_depth -= 1
+            self.in_flight += 1
+            self.admitted += 1
+            self.total_wait_seconds += ticket.wait_seconds
+        return ticket
+
+    def release(self, ticket):
+        with self._lock:
+            self.in_flight -= 1
+            if ticket.actual_tokens is not None:
+                self._token_bucket.adjust(ticket.actual_tokens - ticket.estimated_tokens)
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def get_metrics(self):
+        with self._lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'requests_per_minute': self.requests_per_minute,
+                'tokens_per_minute': self.tokens_per_minute,
+                'queue_depth': self.queue_depth,
+                'max_queue_depth': self.max_queue_depth,
+                'in_flight': self.in_flight,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'avg_wait_seconds': round(self.total_wait_seconds / self.admitted, 3) if self.admitted else 0.0,
+                'request_budget_left': round(self._request_bucket.level, 1) if self.requests_per_minute else None,
+                'token_budget_left': round(self._token_bucket.level) if self.tokens_per_minute else None
+            }
+
+
+class AdmissionController:
+    """Registry of per-provider limiters"""
+
+    def __init__(self, max_wait=30.0):
+        """
+        Args:
+            max_wait (float): Max seconds a request may queue before ThrottleTimeout
+        """
+        self.max_wait = max_wait
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def configure(self, provider, max_concurrent=0, requests_per_minute=0, tokens_per_minute=0):
+        with self._lock:
+            self._limiters[provider] = ProviderLimiter(max_concurrent, requests_per_minute, tokens_per_minute)
+
+    def _get_limiter(self, provider):
+        with self._lock:
+            if provider not in self._limiters:
+                self._limiters[provider] = ProviderLimiter()
+            return self._limiters[provider]
+
+    @contextmanager
+    def admit(self, provider, estimated_tokens=0):
+        """Context manager that holds an admission slot for the duration of a call
+
+        Raises:
+            ThrottleTimeout: If the request could not be admitted within max_wait
+        """
+        limiter = self._get_limiter(provider)
+        ticket = limiter.acquire(estimated_tokens, self.max_wait)
+        try:
+            yield ticket
+        finally:
+            limiter.release(ticket)
+
+    def get_metrics(self):
+        """Return JSON-serializable admission metrics keyed by provider"""
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {provider: limiter.get_metrics() for provider, limiter in limiters.items()}
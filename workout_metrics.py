@@ -0,0 +1,389 @@
+"""
+Deterministic Workout Metrics Engine
+
+Computes the numbers the analysis prompts used to ask the LLM to derive from
+raw JSON (unit conversions, pacing variability, HR drift, aerobic decoupling)
+locally with NumPy, and packs them into a small fact sheet that is sent to the
+model instead of the raw activity payload.
+
+Works on both Strava activity details and the Strava-compatible format
+produced by fit_parser (same keys: splits_standard, splits_metric, laps, ...).
+
+USAGE:
+======
+    from workout_metrics import build_fact_sheet
+
+    fact_sheet = build_fact_sheet(strava_activity)
+    fact_sheet = build_fact_sheet(fit_data['strava_format'])
+
+All fact sheet values are in US units (miles, feet, min/mile, °F) and are
+reproducible for the same input.
+"""
+import numpy as np
+
+from fit_track import has_structured_laps
+
+METERS_PER_MILE = 1609.34
+FEET_PER_METER = 3.28084
+
+# Descriptive fields copied as-is into the fact sheet
+DESCRIPTIVE_FIELDS = ['id', 'name', 'type', 'sport_type', 'start_date_local', 'description', 'workout_type']
+
+# strava_format zone channel -> fact sheet key
+ZONE_LABELS = [('heart_rate', 'hr'), ('power', 'power')]
+
+
+def format_duration(seconds):
+    """Format seconds as H:MM:SS (or M:SS under an hour)"""
+    if seconds is None:
+        return None
+    seconds = int(round(seconds))
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}:{m:02}:{s:02}" if h else f"{m}:{s:02}"
+
+
+def format_pace(seconds_per_mile):
+    """Format a pace in seconds per mile as M:SS"""
+    if seconds_per_mile is None or not np.isfinite(seconds_per_mile) or seconds_per_mile <= 0:
+        return None
+    return format_duration(seconds_per_mile)
+
+
+def _round(value, digits=1):
+    if value is None or not np.isfinite(value):
+        return None
+    if digits == 0:
+        return int(round(float(value)))
+    return round(float(value), digits)
+
+
+def _column(rows, key):
+    """Extract a float column from a list of dicts (missing/None -> NaN)"""
+    return np.array([row.get(key) if row.get(key) is not None else np.nan for row in rows], dtype=float)
+
+
+def _weighted_mean(values, weights):
+    mask = np.isfinite(values) & np.isfinite(weights) & (weights > 0)
+    if not mask.any():
+        return None
+    return float(np.average(values[mask], weights=weights[mask]))
+
+
+def compute_split_metrics(splits):
+    """Pacing and heart-rate metrics from Strava-style splits
+
+    Args:
+        splits (list): Split dicts with distance, moving_time (or elapsed_time),
+                       elevation_difference and average_heartrate
+
+    Returns:
+        dict: Per-split rows plus pacing CV, fade, HR drift and aerobic decoupling
+    """
+    if not splits:
+        return None
+
+    distance = _column(splits, 'distance')
+    moving_time = _column(splits, 'moving_time')
+    elapsed_time = _column(splits, 'elapsed_time')
+    moving_time = np.where(np.isfinite(moving_time) & (moving_time > 0), moving_time, elapsed_time)
+    elevation = _column(splits, 'elevation_difference')
+    heartrate = _column(splits, 'average_heartrate')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pace = moving_time / distance * METERS_PER_MILE  # seconds per mile
+        speed = distance / moving_time
+
+    valid = np.isfinite(pace) & (distance > 0)
+    if not valid.any():
+        return None
+
+    # Ignore the short remainder split (and GPS glitches) for variability stats
+    full = valid & (distance >= 0.5 * np.nanmedian(distance[valid]))
+
+    rows = []
+    for idx in range(len(splits)):
+        rows.append({
+            'split': idx + 1,
+            'miles': _round(distance[idx] / METERS_PER_MILE, 2),
+            'pace': format_pace(pace[idx]),
+            'avg_hr': _round(heartrate[idx], 0),
+            'elev_change_ft': _round(elevation[idx] * FEET_PER_METER, 0)
+        })
+
+    full_pace = pace[full]
+    pace_cv = float(np.std(full_pace) / np.mean(full_pace) * 100) if full_pace.size > 1 else None
+
+    # First vs second half by cumulative distance (split midpoints)
+    cumulative = np.cumsum(np.where(valid, distance, 0))
+    midpoints = cumulative - np.where(valid, distance, 0) / 2
+    first_half = valid & (midpoints < cumulative[-1] / 2)
+    second_half = valid & ~first_half
+
+    first_pace = _weighted_mean(pace[first_half], distance[first_half])
+    second_pace = _weighted_mean(pace[second_half], distance[second_half])
+    first_hr = _weighted_mean(heartrate[first_half], moving_time[first_half])
+    second_hr = _weighted_mean(heartrate[second_half], moving_time[second_half])
+
+    fade = (second_pace - first_pace) / first_pace * 100 if first_pace and second_pace else None
+    hr_drift = (second_hr - first_hr) / first_hr * 100 if first_hr and second_hr else None
+
+    # Aerobic decoupling (Pa:HR): drop in efficiency factor (speed / HR) from first to second half
+    decoupling = None
+    if first_hr and second_hr:
+        first_speed = _weighted_mean(speed[first_half], moving_time[first_half])
+        second_speed = _weighted_mean(speed[second_half], moving_time[second_half])
+        if first_speed and second_speed:
+            first_ef = first_speed / first_hr
+            second_ef = second_speed / second_hr
+            decoupling = (first_ef - second_ef) / first_ef * 100
+
+    fastest = int(np.nanargmin(np.where(full, pace, np.nan))) + 1 if full.any() else None
+    slowest = int(np.nanargmax(np.where(full, pace, np.nan))) + 1 if full.any() else None
+
+    return {
+        'splits': rows,
+        'pacing': {
+            'pace_cv_percent': _round(pace_cv, 1),
+            'fastest_split': fastest,
+            'fastest_pace': format_pace(pace[fastest - 1]) if fastest else None,
+            'slowest_split': slowest,
+            'slowest_pace': format_pace(pace[slowest - 1]) if slowest else None,
+            'first_half_pace': format_pace(first_pace),
+            'second_half_pace': format_pace(second_pace),
+            'fade_percent': _round(fade, 1),
+            'negative_split': bool(fade < 0) if fade is not None else None
+        },
+        'heart_rate': {
+            'first_half_avg_hr': _round(first_hr, 0),
+            'second_half_avg_hr': _round(second_hr, 0),
+            'hr_drift_percent': _round(hr_drift, 1),
+            'aerobic_decoupling_percent': _round(decoupling, 1)
+        }
+    }
+
+
+def compute_lap_metrics(laps):
+    """Per-lap rows plus work/recovery summaries from Strava/FIT laps
+
+    Args:
+        laps (list): Lap dicts (distance, moving_time, average_heartrate, intensity, ...)
+
+    Returns:
+        dict: Lap rows and pacing consistency of the work laps
+    """
+    if not laps:
+        return None
+
+    distance = _column(laps, 'distance')
+    moving_time = _column(laps, 'moving_time')
+    elapsed_time = _column(laps, 'elapsed_time')
+    moving_time = np.where(np.isfinite(moving_time) & (moving_time > 0), moving_time, elapsed_time)
+    heartrate = _column(laps, 'average_heartrate')
+    watts = _column(laps, 'average_watts')
+    intensity = np.array([str(lap.get('intensity') or 'active').lower() for lap in laps])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pace = moving_time / distance * METERS_PER_MILE
+
+    rows = []
+    for idx, lap in enumerate(laps):
+        row = {
+            'lap': idx + 1,
+            'intensity': str(intensity[idx]),
+            'miles': _round(distance[idx] / METERS_PER_MILE, 2),
+            'time': format_duration(moving_time[idx]) if np.isfinite(moving_time[idx]) else None,
+            'pace': format_pace(pace[idx]),
+            'avg_hr': _round(heartrate[idx], 0)
+        }
+        if np.isfinite(watts[idx]):
+            row['avg_watts'] = _round(watts[idx], 0)
+        for channel, key in ZONE_LABELS:
+            percent = _zone_percentages((lap.get('time_in_zones') or {}).get(channel))
+            if percent:
+                row[f'{key}_zone_pct'] = percent
+        rows.append(row)
+
+    work = (intensity == 'active') & np.isfinite(pace) & (distance > 0)
+    rest = ~(intensity == 'active') & np.isfinite(pace) & (distance > 0)
+    work_pace = pace[work]
+
+    summary = {
+        'work_laps': int(work.sum()),
+        'recovery_laps': int(rest.sum()),
+        'work_pace_cv_percent': _round(np.std(work_pace) / np.mean(work_pace) * 100, 1) if work_pace.size > 1 else None,
+        'work_avg_pace': format_pace(_weighted_mean(pace[work], distance[work])),
+        'work_avg_hr': _round(_weighted_mean(heartrate[work], moving_time[work]), 0),
+        'recovery_avg_pace': format_pace(_weighted_mean(pace[rest], distance[rest])),
+        'recovery_avg_hr': _round(_weighted_mean(heartrate[rest], moving_time[rest]), 0)
+    }
+
+    return {'laps': rows, 'lap_summary': summary}
+
+
+def compute_totals(activity):
+    """Whole-activity totals converted to US units"""
+    distance = activity.get('distance') or 0
+    moving_time = activity.get('moving_time') or 0
+    pace = moving_time / distance * METERS_PER_MILE if distance and moving_time else None
+
+    def feet(key):
+        value = activity.get(key)
+        return _round(value * FEET_PER_METER, 0) if value is not None else None
+
+    def fahrenheit(key):
+        value = activity.get(key)
+        return _round(value * 9 / 5 + 32, 0) if value is not None else None
+
+    totals = {
+        'distance_miles': _round(distance / METERS_PER_MILE, 2),
+        'moving_time': format_duration(moving_time),
+        'elapsed_time': format_duration(activity.get('elapsed_time')),
+        'avg_pace_per_mile': format_pace(pace),
+        'elevation_gain_ft': feet('total_elevation_gain'),
+        'elev_high_ft': feet('elev_high'),
+        'elev_low_ft': feet('elev_low'),
+        'avg_hr': _round(activity.get('average_heartrate'), 0) if activity.get('average_heartrate') else None,
+        'max_hr': _round(activity.get('max_heartrate'), 0) if activity.get('max_heartrate') else None,
+        'avg_cadence': _round(activity.get('average_cadence'), 0) if activity.get('average_cadence') else None,
+        'avg_watts': _round(activity.get('average_watts'), 0) if activity.get('average_watts') else None,
+        'normalized_watts': _round(activity.get('weighted_average_watts'), 0) if activity.get('weighted_average_watts') else None,
+        'calories': _round(activity.get('calories'), 0) if activity.get('calories') else None,
+        'avg_temp_f': fahrenheit('average_temp')
+    }
+    if activity.get('suffer_score') is not None:
+        totals['relative_effort'] = activity.get('suffer_score')
+
+    # Drop empty values to keep the fact sheet small
+    return {key: value for key, value in totals.items() if value is not None}
+
+
+def _zone_percentages(seconds):
+    """Share of the time per zone in percent, or None without any time in zones"""
+    seconds = np.asarray(seconds or [], dtype=float)
+    total = seconds.sum()
+    if not total:
+        return None
+    return [_round(value, 1) for value in seconds / total * 100]
+
+
+def compute_zone_metrics(activity):
+    """Time in heart rate / power zones for the whole activity
+
+    Args:
+        activity (dict): fit_parser strava_format with zones and time_in_zones
+
+    Returns:
+        dict: {'time_in_zones': {'hr': [rows], 'power': [rows]}} (empty without zone times);
+              rows are {'zone', 'range', 'time', 'percent'}
+    """
+    zones = activity.get('zones') or {}
+    time_in_zones = activity.get('time_in_zones') or {}
+
+    metrics = {}
+    for channel, key in ZONE_LABELS:
+        seconds = time_in_zones.get(channel) or []
+        percent = _zone_percentages(seconds)
+        if not percent:
+            continue
+        unit = 'bpm' if key == 'hr' else 'W'
+        rows = []
+        for idx, zone in enumerate(zones.get(channel) or []):
+            if idx >= len(seconds):
+                break
+            low, high = _round(zone.get('min') or 0, 0), zone.get('max')
+            last = high is None or idx == len(seconds) - 1
+            label = f"{low}+ {unit}" if last else f"{low}-{_round(high, 0)} {unit}"
+            rows.append({'zone': idx + 1, 'range': label, 'time': format_duration(seconds[idx]),
+                         'percent': percent[idx]})
+        metrics[key] = rows
+
+    return {'time_in_zones': metrics} if metrics else {}
+
+
+def _duration_label(seconds):
+    """Short label for a mean-max duration: 5s, 1m, 20m, 1h, 1h30m"""
+    if seconds < 60:
+        return f"{seconds}s"
+    h, m = divmod(seconds // 60, 60)
+    if not h:
+        return f"{m}m"
+    return f"{h}h{m:02}m" if m else f"{h}h"
+
+
+def compute_effort_metrics(activity):
+    """Best efforts and mean-maximal power/HR in US units
+
+    Args:
+        activity (dict): Activity with best_efforts (Strava detail or fit_parser) and,
+                         for FIT files, mean_max ({'watts': [...], 'heartrate': [...]})
+
+    Returns:
+        dict: best_efforts rows and mean_max_watts / mean_max_hr by duration label
+    """
+    metrics = {}
+
+    rows = []
+    for effort in activity.get('best_efforts') or []:
+        seconds = effort.get('moving_time') or effort.get('elapsed_time')
+        if not seconds or not effort.get('distance'):
+            continue
+        rows.append({
+            'name': effort.get('name'),
+            'time': format_duration(seconds),
+            'pace': format_pace(seconds / effort['distance'] * METERS_PER_MILE)
+        })
+    if rows:
+        metrics['best_efforts'] = rows
+
+    mean_max = activity.get('mean_max') or {}
+    for column, key in (('watts', 'mean_max_watts'), ('heartrate', 'mean_max_hr')):
+        curve = {_duration_label(point['duration']): _round(point['value'], 0) for point in mean_max.get(column) or []}
+        if curve:
+            metrics[key] = curve
+
+    return metrics
+
+
+def build_fact_sheet(activity, include_splits=True, include_laps=True):
+    """Build a compact, reproducible fact sheet for the LLM from an activity
+
+    Args:
+        activity (dict): Strava activity detail or fit_parser strava_format dict
+        include_splits (bool): Include per-split rows and pacing/HR metrics
+        include_laps (bool): Include per-lap rows and work/recovery summary
+
+    Returns:
+        dict: Fact sheet in US units
+    """
+    fact_sheet = {key: activity[key] for key in DESCRIPTIVE_FIELDS if activity.get(key) not in (None, '')}
+    fact_sheet['totals'] = compute_totals(activity)
+
+    if include_splits:
+        # Prefer mile splits; fall back to kilometer splits
+        split_metrics = compute_split_metrics(activity.get('splits_standard'))
+        split_unit = 'mile'
+        if split_metrics is None:
+            split_metrics = compute_split_metrics(activity.get('splits_metric'))
+            split_unit = 'kilometer'
+        if split_metrics:
+            fact_sheet['split_unit'] = split_unit
+            fact_sheet.update(split_metrics)
+
+    if include_laps:
+        laps = activity.get('laps') or []
+        # Auto (distance/time) laps say nothing about the workout: use the detected work/recovery
+        # blocks of FIT files instead when there are any
+        if not has_structured_laps(laps) and activity.get('detected_intervals'):
+            laps = activity['detected_intervals']
+            fact_sheet['lap_source'] = 'detected_intervals'
+        # A single auto-lap covering the whole activity adds nothing over the totals
+        if len(laps) > 1:
+            lap_metrics = compute_lap_metrics(laps)
+            if lap_metrics:
+                fact_sheet.update(lap_metrics)
+
+    fact_sheet.update(compute_effort_metrics(activity))
+    fact_sheet.update(compute_zone_metrics(activity))
+
+    return fact_sheet